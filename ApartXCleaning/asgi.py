@@ -2,6 +2,9 @@
 ASGI config for ApartXCleaning project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django, WebSocket connections to the channels routes in
+``tinder.routing``. In production it runs under gunicorn with Uvicorn
+workers, configured in ``gunicorn.conf.py``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -13,4 +16,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ApartXCleaning.settings")
 
-application = get_asgi_application()
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from tinder.middleware import JWTAuthMiddleware  # noqa: E402
+from tinder.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    "http": django_asgi_app,
+    "websocket": JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+})
@@ -16,6 +16,7 @@ ALLOWED_HOSTS = ['*']
 # ALLOWED_HOSTS = os.getenv("DJANGO_ALLOWED_HOSTS").split(" ")
 
 INSTALLED_APPS = [
+    "daphne",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -24,10 +25,12 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
 
     'rest_framework',
+    'django_filters',
     'phonenumber_field',
     'drf_yasg',
     'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
+    'channels',
 
     'tinder.apps.TinderConfig'
 ]
@@ -36,6 +39,8 @@ CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOW_ALL_ORIGINS = True
 
 MIDDLEWARE = [
+    "tinder.metrics.MetricsMiddleware",
+    "tinder.routers.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
 
@@ -55,10 +60,22 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly'
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'tinder.authentication.CachedJWTAuthentication',
     )
 }
 
+# Seconds an authenticated user stays cached between profile changes.
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# Request metrics served at /metrics (see tinder.metrics) to scrapes sending
+# "Authorization: Bearer <METRICS_TOKEN>"; without a token nobody can read them.
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+SLOW_REQUEST_THRESHOLD = float(os.getenv('SLOW_REQUEST_THRESHOLD', 1.0))
+
+# Seconds a list page stays in the response cache (see tinder.conditional).
+RESPONSE_CACHE_TIMEOUT = 300
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=5),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -78,11 +95,25 @@ SIMPLE_JWT = {
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
 
+    'TOKEN_REFRESH_SERIALIZER': 'tinder.serializers.TokenRefreshSerializer',
+    'TOKEN_VERIFY_SERIALIZER': 'tinder.serializers.TokenVerifySerializer',
+
     'SLIDING_TOKEN_REFRESH_EXP_CLAIM': 'refresh_exp',
     'SLIDING_TOKEN_LIFETIME': timedelta(minutes=30),
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# One-time codes for registration and login (see tinder.otp).
+OTP_BACKEND = os.getenv('OTP_BACKEND', 'tinder.otp.RedisOTPStore')
+OTP_CODE_TTL = 120
+OTP_MAX_ATTEMPTS = 5
+OTP_LOCKOUT = 900
+
+# Blacklisted refresh tokens are kept in Redis. Set TOKEN_BLACKLIST_AUDIT=1 to
+# also record issued and blacklisted tokens in the token_blacklist tables;
+# `manage.py prune_token_blacklist` writes them and prunes expired rows.
+TOKEN_BLACKLIST_AUDIT = os.getenv('TOKEN_BLACKLIST_AUDIT') == '1'
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -100,6 +131,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "ApartXCleaning.wsgi.application"
+ASGI_APPLICATION = "ApartXCleaning.asgi.application"
 
 DATABASES = {
     'default': {
@@ -109,19 +141,65 @@ DATABASES = {
         'PASSWORD': os.getenv("SQL_PASSWORD"),
         'HOST': os.getenv("SQL_HOST"),
         'PORT': os.getenv("SQL_PORT", '5432'),
+        # The app is served over ASGI, where Django runs each request's
+        # database work on a thread of its own, so a connection kept open
+        # past the request is never reused; pooling is pgbouncer's job (see
+        # docker-compose.yaml). Raise this for WSGI deployments.
+        'CONN_MAX_AGE': int(os.getenv("SQL_CONN_MAX_AGE", 0)),
+        'CONN_HEALTH_CHECKS': True,
+        # pgbouncer's transaction pooling can't keep a server-side cursor
+        # open across transactions.
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv("SQL_TRANSACTION_POOLING") == "1",
     }
 }
 
+# Read replicas: SQL_REPLICAS is a comma-separated list of replica hosts
+# (database files for SQLite), each reached with the primary's settings.
+# Under ``manage.py test`` a replica mirrors the primary's test database, so
+# tests see their writes wherever the read is routed; settings_test_replica
+# gives the routing tests a replica of their own. See tinder.routers.
+REPLICA_DATABASES = []
+for number, replica in enumerate(filter(None, os.getenv("SQL_REPLICAS", "").split(",")), 1):
+    alias = "replica_{}".format(number)
+    location = "NAME" if "sqlite3" in (DATABASES["default"]["ENGINE"] or "") else "HOST"
+    DATABASES[alias] = dict(DATABASES["default"], **{location: replica.strip()}, TEST={"MIRROR": "default"})
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ["tinder.routers.ReplicaRouter"]
+READ_YOUR_WRITES_WINDOW = int(os.getenv("READ_YOUR_WRITES_WINDOW", 5))
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
         "LOCATION": f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT')}/{os.getenv('REDIS_DB')}",
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CONNECTION_POOL_CLASS": "tinder.metrics.InstrumentedConnectionPool",
         }
     }
 }
 
+# redis.asyncio client for the async views (see tinder.aredis).
+ASYNC_REDIS_URL = CACHES["default"]["LOCATION"]
+ASYNC_REDIS_OPTIONS = {}
+
+# Set CHANNEL_LAYER=memory to run WebSockets without Redis (single process only).
+if os.getenv("CHANNEL_LAYER") == "memory":
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.pubsub.RedisPubSubChannelLayer",
+            "CONFIG": {
+                "hosts": [f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT')}/{os.getenv('REDIS_DB')}"],
+            },
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -153,15 +231,47 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Messages of chats whose order was completed this many days ago are moved
+# to gzip NDJSON segments under MESSAGE_ARCHIVE_ROOT by the archive_messages
+# command (see tinder.archive). Every web worker must see the same directory.
+MESSAGE_ARCHIVE_ROOT = os.getenv('MESSAGE_ARCHIVE_ROOT', os.path.join(BASE_DIR, 'archive'))
+MESSAGE_ARCHIVE_AFTER_DAYS = int(os.getenv('MESSAGE_ARCHIVE_AFTER_DAYS', 90))
+MESSAGE_ARCHIVE_SEGMENT_BYTES = 64 * 1024 * 1024
+# Seconds an archive part read back stays decompressed in the cache.
+MESSAGE_ARCHIVE_CACHE_TIMEOUT = 300
+
+# Rows fetched per query by the admin exports (see tinder.exports).
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+# Resized copies of uploaded images, rendered in a background thread pool.
+IMAGE_VARIANT_SIZES = (64, 256, 1024)
+IMAGE_VARIANT_FORMAT = 'WEBP'
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_WORKERS = 2
+CHAT_IMAGE_THUMBNAIL_SIZE = 320
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 PHONENUMBER_DEFAULT_REGION = 'KZ'
 
+# Dotted path to func(address) -> (lat, lon) | None, used for orders whose
+# adress_link has no coordinates.
+ORDER_GEOCODER = os.getenv('ORDER_GEOCODER')
+
 AUTH_USER_MODEL = 'tinder.CustomUser'
 
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = 'smtp.mail.ru'
 EMAIL_PORT = 2525
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 EMAIL_USE_TLS = True
 EMAIL_USE_SSL = False
+
+# Outbox worker (manage.py send_queued_mail)
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 30
+# Seconds before emails claimed by a worker that died are picked up again.
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 300
+EMAIL_OUTBOX_IDLE_TIMEOUT = 60
@@ -0,0 +1,49 @@
+"""
+Self-contained settings for ``manage.py loadtest``: SQLite, or the Postgres
+from the SQL_* variables when SQL_ENGINE is set, an in-process fake Redis,
+the in-memory channel layer and locmem email.
+
+    export DJANGO_SETTINGS_MODULE=ApartXCleaning.settings_loadtest
+    python manage.py migrate
+    python manage.py loadtest --scenarios 200 --concurrency 8
+"""
+
+import os
+import tempfile
+
+os.environ.setdefault("SECRET_KEY", "loadtest-only-" + "x" * 50)
+os.environ.setdefault("CHANNEL_LAYER", "memory")
+
+from .settings import *  # noqa: E402,F401,F403
+from .settings import BASE_DIR  # noqa: E402
+
+from fakeredis import FakeConnection  # noqa: E402
+from fakeredis.aioredis import FakeAsyncRedisConnection  # noqa: E402
+
+DEBUG = False
+
+if not os.getenv("SQL_ENGINE"):
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "loadtest.sqlite3",
+            # Virtual users write from several threads at once.
+            "OPTIONS": {"timeout": 30},
+        }
+    }
+
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "redis://loadtest:6379/0",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CONNECTION_POOL_KWARGS": {"connection_class": FakeConnection},
+        },
+    }
+}
+ASYNC_REDIS_URL = CACHES["default"]["LOCATION"]
+ASYNC_REDIS_OPTIONS = {"connection_class": FakeAsyncRedisConnection}
+
+EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+MEDIA_ROOT = os.path.join(tempfile.gettempdir(), "apartx-loadtest-media")
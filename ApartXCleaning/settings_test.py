@@ -0,0 +1,19 @@
+"""
+Settings for the test suite: the self-contained services of
+settings_loadtest (SQLite unless SQL_ENGINE is set, fakeredis, in-memory
+channel layer, locmem email) with media and the message archive in a
+throwaway directory.
+
+    python manage.py test --settings=ApartXCleaning.settings_test
+"""
+
+import os
+import tempfile
+
+from .settings_loadtest import *  # noqa: F401,F403
+
+_media = tempfile.mkdtemp(prefix="apartx-test-")
+
+MEDIA_ROOT = os.path.join(_media, "media")
+MESSAGE_ARCHIVE_ROOT = os.path.join(_media, "archive")
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
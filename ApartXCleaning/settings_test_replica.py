@@ -0,0 +1,17 @@
+"""
+settings_test with a second SQLite database as a read replica, for the
+routing tests in tinder.tests.test_routers. The replica is a database of its
+own, not a TEST MIRROR of the primary, so a read that reaches it sees only
+the rows written there.
+
+    python manage.py test tinder.tests.test_routers --settings=ApartXCleaning.settings_test_replica
+"""
+
+from .settings_test import *  # noqa: F401,F403
+from .settings_test import BASE_DIR, DATABASES
+
+DATABASES = dict(DATABASES, replica_1={
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": BASE_DIR / "loadtest-replica.sqlite3",
+})
+REPLICA_DATABASES = ["replica_1"]
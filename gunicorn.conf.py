@@ -0,0 +1,21 @@
+# Production server for ApartXCleaning.asgi:application:
+#
+#     gunicorn ApartXCleaning.asgi:application -c gunicorn.conf.py
+#
+# Each Uvicorn worker runs one event loop that serves HTTP (including the
+# async views in tinder.async_views) and the chat WebSockets concurrently,
+# so a few processes per core are enough.
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so a slow leak can't grow forever.
+max_requests = 10000
+max_requests_jitter = 1000
+accesslog = "-"
+errorlog = "-"
@@ -1,5 +1,13 @@
 from django.contrib import admin
-from .models import CustomUser, Order, Review
+from .models import CustomUser, Order, Review, OutgoingEmail
 
 
-admin.site.register([CustomUser, Order, Review])
\ No newline at end of file
+admin.site.register([CustomUser, Order, Review])
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    # Queued bodies carry one-time codes; staff only need delivery status.
+    exclude = ['body']
+    list_display = ['subject', 'status', 'attempts', 'send_after', 'expires_at', 'sent_at']
+    list_filter = ['status']
@@ -0,0 +1,164 @@
+import gzip
+import json
+import logging
+import os
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .images import release_image_blob
+from .models import ArchivedChat, ImageBlob, Message, MessageImage
+from . import unread, versions
+
+logger = logging.getLogger(__name__)
+
+# Cold storage for the messages of chats whose order was completed long ago
+# (see the archive_messages command). A segment file under
+# MESSAGE_ARCHIVE_ROOT is a series of gzip members, one per archived chat,
+# each holding that chat's messages as NDJSON; ArchivedChat rows say where
+# every member is, so reading a chat back decompresses only its own bytes.
+# Archived MessageImage rows are deleted but their ImageBlob references stay
+# counted until the chat itself is deleted.
+
+
+def part_cache_key(part_id):
+    return 'archive:part:{}'.format(part_id)
+
+
+def segment_path(name):
+    return os.path.join(settings.MESSAGE_ARCHIVE_ROOT, name)
+
+
+def encode_messages(messages):
+    """One gzip member of NDJSON for ``messages``, with their images prefetched."""
+    lines = [json.dumps({
+        'id': message.pk,
+        'chat': message.chat_id,
+        'sender': message.sender_id,
+        'text': message.text,
+        'is_read': message.is_read,
+        'timestamp': message.timestamp.isoformat(),
+        'images': [{'id': image.pk, 'image': image.image.name, 'blob': image.blob_id}
+                   for image in message.images.all()],
+    }, ensure_ascii=False) for message in messages]
+    return gzip.compress(''.join(line + '\n' for line in lines).encode('utf-8'))
+
+
+def read_part(part):
+    with open(segment_path(part.segment), 'rb') as segment:
+        segment.seek(part.offset)
+        data = segment.read(part.length)
+    return [json.loads(line) for line in gzip.decompress(data).decode('utf-8').splitlines() if line]
+
+
+class SegmentWriter:
+    """Appends gzip members to a segment, starting a new one past MESSAGE_ARCHIVE_SEGMENT_BYTES."""
+
+    def __init__(self):
+        self.name = None
+        self.file = None
+
+    def write(self, data):
+        """Write ``data`` durably; returns ``(segment, offset)``."""
+        if self.file is None or self.file.tell() >= settings.MESSAGE_ARCHIVE_SEGMENT_BYTES:
+            self.open()
+        offset = self.file.tell()
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.name, offset
+
+    def open(self):
+        self.close()
+        now = timezone.now()
+        self.name = '{:%Y/%m}/{:%Y%m%dT%H%M%S}-{}.ndjson.gz'.format(now, now, uuid.uuid4().hex[:8])
+        os.makedirs(os.path.dirname(segment_path(self.name)), exist_ok=True)
+        self.file = open(segment_path(self.name), 'ab')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def archive_chat(chat, writer):
+    """Move every message of ``chat`` into the archive; returns how many were moved."""
+    with transaction.atomic():
+        messages = list(Message.objects.filter(chat=chat).order_by('id').prefetch_related('images'))
+        if not messages:
+            return 0
+        data = encode_messages(messages)
+        # On disk before the rows go: a failure after this leaves unused
+        # bytes in the segment, never lost messages.
+        segment, offset = writer.write(data)
+        ArchivedChat.objects.create(chat=chat, segment=segment, offset=offset, length=len(data),
+                                    message_count=len(messages), first_message_id=messages[0].pk,
+                                    last_message_id=messages[-1].pk)
+        ids = [message.pk for message in messages]
+        # Unlinked so deleting the rows doesn't release the blobs the
+        # archive still refers to.
+        MessageImage.objects.filter(message_id__in=ids).update(blob=None)
+        Message.objects.filter(pk__in=ids).delete()
+        transaction.on_commit(partial(unread.chat_deleted, chat))
+        transaction.on_commit(partial(versions.bump_chat, chat, 'chats', 'messages'))
+    return len(messages)
+
+
+def read_part_cached(part):
+    """``read_part``, cached for MESSAGE_ARCHIVE_CACHE_TIMEOUT seconds; parts never change once written."""
+    key = part_cache_key(part.pk)
+    records = cache.get(key)
+    if records is None:
+        records = read_part(part)
+        cache.set(key, records, settings.MESSAGE_ARCHIVE_CACHE_TIMEOUT)
+    return records
+
+
+def archived_messages(chat_id, newest_first=False, past_id=None):
+    """
+    Yield the archived messages of a chat as unsaved Message instances,
+    oldest first or ``newest_first``, reading each part only when it is
+    reached. With ``past_id`` only the parts holding messages past that id
+    in that order are read. Images are attached by ``attach_images``.
+    """
+    parts = ArchivedChat.objects.filter(chat_id=chat_id)
+    if past_id is not None:
+        parts = parts.filter(**{'first_message_id__lt' if newest_first else 'last_message_id__gt': past_id})
+    for part in parts.order_by('-first_message_id' if newest_first else 'first_message_id'):
+        records = read_part_cached(part)
+        for record in reversed(records) if newest_first else records:
+            message = Message(id=record['id'], chat_id=record['chat'], sender_id=record['sender'],
+                              text=record['text'], is_read=record['is_read'],
+                              timestamp=parse_datetime(record['timestamp']))
+            message._archived_images = record['images']
+            yield message
+
+
+def attach_images(messages):
+    """Prefetch the images of the archived ones among ``messages``, with one query for their blobs."""
+    archived = [message for message in messages if hasattr(message, '_archived_images')]
+    blobs = ImageBlob.objects.in_bulk({image['blob'] for message in archived
+                                       for image in message._archived_images if image['blob'] is not None})
+    for message in archived:
+        message._prefetched_objects_cache = {'images': [
+            MessageImage(id=image['id'], message=message, image=image['image'], blob=blobs.get(image['blob']))
+            for image in message._archived_images
+        ]}
+
+
+def release_images(part):
+    """Drop the blob references held by an ArchivedChat row that was deleted."""
+    try:
+        records = read_part(part)
+    except OSError:
+        logger.exception('Could not read archive %s to release its images', part)
+        return
+    for record in records:
+        for image in record['images']:
+            if image['blob'] is not None:
+                release_image_blob(image['blob'])
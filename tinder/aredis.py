@@ -0,0 +1,20 @@
+import asyncio
+import weakref
+
+from django.conf import settings
+from redis import asyncio as aioredis
+
+from .metrics import InstrumentedAsyncConnection
+
+# redis.asyncio connections belong to the event loop that opened them, so
+# async views get one client per running loop rather than a module global.
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_redis():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        options = {'connection_class': InstrumentedAsyncConnection, **settings.ASYNC_REDIS_OPTIONS}
+        client = _clients[loop] = aioredis.Redis.from_url(settings.ASYNC_REDIS_URL, **options)
+    return client
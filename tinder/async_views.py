@@ -0,0 +1,163 @@
+import functools
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+
+from .authentication import CachedJWTAuthentication
+from .serializers import CustomUserSerializer
+from .unread import aget_counts
+from .versions import aget_versions
+from .views import ChatListView, MessageListView, OrderListView, UserProfileView
+
+# Async GET handlers for the read-heavy endpoints. Under an ASGI server a
+# request waiting on Postgres or Redis here doesn't hold a worker thread:
+# database reads go through Django's async ORM and the Redis keys these
+# views need (versions, unread counters) through redis.asyncio. Each one
+# reuses the matching DRF view for its permissions, throttles, queryset,
+# filters, pagination and serializer. They only render JSON: a request that
+# negotiates another renderer (such as the browsable API) is handed to the
+# sync view.
+
+
+def read_async(async_view, sync_view):
+    """
+    Serve GET and HEAD with ``async_view`` and every other method with the
+    DRF ``sync_view``.
+    """
+    async def view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return await async_view(request, *args, **kwargs)
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    return view
+
+
+def render(request, data, status=200):
+    """``data`` rendered the way DRF's Response renders it for ``request``."""
+    renderer = getattr(request, 'accepted_renderer', None) or JSONRenderer()
+    media_type = getattr(request, 'accepted_media_type', None) or renderer.media_type
+    content = renderer.render(data, media_type, {'request': request})
+    return HttpResponse(content, status=status, content_type=media_type)
+
+
+def error_response(exc, request):
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = render(request, data, status=exc.status_code)
+    if exc.status_code == 401:
+        response['WWW-Authenticate'] = CachedJWTAuthentication().authenticate_header(request)
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+def finalize(view, response):
+    # As APIView.finalize_response: Allow, and Vary: Accept added to any Vary.
+    headers = dict(view.default_response_headers)
+    vary = headers.pop('Vary', None)
+    if vary is not None:
+        patch_vary_headers(response, [vary])
+    for key, value in headers.items():
+        response[key] = value
+    return response
+
+
+def async_api_view(view_class):
+    """
+    Run the wrapped handler with a DRF Request and an instance of
+    ``view_class``, after the checks APIView.initial makes: content
+    negotiation, authentication with CachedJWTAuthentication, the view's
+    permission classes and its throttles. Requests for anything but JSON go
+    to the sync view. API errors are rendered the way DRF's exception
+    handler renders them.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(request, *args, **kwargs):
+            view = view_class(args=args, kwargs=kwargs, format_kwarg=None)
+            drf_request = view.initialize_request(request, *args, **kwargs)
+            try:
+                view.format_kwarg = view.get_format_suffix(**kwargs)
+                renderer, media_type = view.perform_content_negotiation(drf_request)
+                if renderer.format != 'json':
+                    return await sync_to_async(view_class.as_view())(request, *args, **kwargs)
+                drf_request.accepted_renderer, drf_request.accepted_media_type = renderer, media_type
+
+                authenticator = CachedJWTAuthentication()
+                drf_request.user = await authenticator.aauthenticate(request)
+                drf_request._authenticator = authenticator
+                view.request = drf_request
+                # Permission classes of these views don't query the database.
+                view.check_permissions(drf_request)
+                if view.get_throttles():
+                    await sync_to_async(view.check_throttles)(drf_request)
+                response = await func(drf_request, view, *args, **kwargs)
+            except exceptions.APIException as exc:
+                response = error_response(exc, drf_request)
+            return finalize(view, response)
+        return wrapper
+    return decorator
+
+
+async def conditional_list(request, view, serializer_context=None):
+    """ConditionalListMixin.list for a view whose queryset is fetched asynchronously."""
+    etag = view.build_etag(request, await aget_versions(view.get_version_keys()))
+    if view.is_not_modified(request, etag):
+        return view.add_validators(HttpResponseNotModified(), etag)
+
+    cache_key = view.get_response_cache_key(etag)
+    data = await cache.aget(cache_key) if view.cache_responses else None
+    if data is None:
+        data = await paginated_list(request, view, serializer_context)
+        if view.cache_responses:
+            await cache.aset(cache_key, data, settings.RESPONSE_CACHE_TIMEOUT)
+    return view.add_validators(render(request, data), etag)
+
+
+async def paginated_list(request, view, serializer_context=None):
+    # Filter backends may validate choices against the database.
+    queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+    paginator = view.paginator
+    page = paginator.paginate_rows([row async for row in paginator.get_page_queryset(queryset, request, view)])
+
+    context = {'request': request, 'format': None, 'view': view}
+    context.update(serializer_context or {})
+    serializer = view.get_serializer_class()(page, many=True, context=context)
+    return OrderedDict([
+        ('next', paginator.get_next_link()),
+        ('previous', paginator.get_previous_link()),
+        ('results', serializer.data),
+    ])
+
+
+@async_api_view(UserProfileView)
+async def profile(request, view):
+    # request.user comes from the auth cache; only its groups and permissions
+    # need the database.
+    await sync_to_async(prefetch_related_objects)([request.user], 'groups', 'user_permissions')
+    return render(request, CustomUserSerializer(request.user).data)
+
+
+@async_api_view(ChatListView)
+async def chat_list(request, view):
+    return await conditional_list(request, view, {'unread_counts': await aget_counts(request.user.pk)})
+
+
+@async_api_view(MessageListView)
+async def message_list(request, view):
+    if await sync_to_async(view.is_archived_chat)():
+        # Reading the archive is file and cache I/O; leave it to the sync view.
+        return await sync_to_async(MessageListView.as_view())(request._request)
+    return await conditional_list(request, view)
+
+
+@async_api_view(OrderListView)
+async def order_list(request, view):
+    return await conditional_list(request, view)
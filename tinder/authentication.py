@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+def user_cache_key(user_id):
+    return 'auth:user:{}'.format(user_id)
+
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def dump_user(user):
+    # Everything but the password hash, which has no business in the cache.
+    return {field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields if field.attname != 'password'}
+
+
+def load_user(user_model, values):
+    """A user from ``dump_user`` values; the password is deferred, so reading it queries the row."""
+    if not isinstance(values, dict):
+        return None
+    return user_model.from_db(router.db_for_read(user_model), list(values), list(values.values()))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user from the default (Redis)
+    cache instead of querying CustomUser on every request. Only active users
+    are cached, without their password hash; entries expire after
+    AUTH_USER_CACHE_TIMEOUT seconds and are dropped whenever the user row is
+    saved or deleted. Views that change the user save a freshly loaded row,
+    not ``request.user``.
+    """
+
+    def get_user(self, validated_token):
+        key = user_cache_key(self.get_user_id(validated_token))
+        user = load_user(self.user_model, cache.get(key))
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, dump_user(user), settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    async def aauthenticate(self, request):
+        """
+        ``authenticate`` for async views: the same checks, with the cache and
+        database lookups awaited. Raises NotAuthenticated without a token.
+        """
+        header = self.get_header(request)
+        raw_token = self.get_raw_token(header) if header is not None else None
+        if raw_token is None:
+            raise NotAuthenticated()
+        validated_token = self.get_validated_token(raw_token)
+
+        user_id = self.get_user_id(validated_token)
+        key = user_cache_key(user_id)
+        user = load_user(self.user_model, await cache.aget(key))
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            if not user.is_active:
+                raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+            await cache.aset(key, dump_user(user), settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .routers import read_from_primary
+from .versions import get_versions, version_key
+
+
+class ConditionalListMixin:
+    """
+    Conditional GET for list views, driven by the version counters in
+    ``tinder.versions`` rather than by the rows themselves.
+
+    ``version_resources`` names the shared resources the response depends on
+    and ``user_version_resources`` the per-user ones. The ETag covers those
+    versions, the requesting user and the full URL, so a matching
+    ``If-None-Match`` is answered with 304 after a single Redis round-trip.
+    There is no Last-Modified: HTTP dates have whole-second precision, and a
+    second write within the same second would go unnoticed. Views that set ``cache_responses`` also
+    keep the serialized page in the cache under the same ETag.
+    """
+    version_resources = ()
+    user_version_resources = ()
+    cache_responses = False
+
+    def get_version_keys(self):
+        user_id = self.request.user.pk
+        return ([version_key(resource) for resource in self.version_resources]
+                + [version_key(resource, user_id) for resource in self.user_version_resources])
+
+    def get_etag(self, request):
+        return self.build_etag(request, get_versions(self.get_version_keys()))
+
+    def build_etag(self, request, versions):
+        source = [type(self).__name__, request.user.pk, request.build_absolute_uri(),
+                  request.META.get('HTTP_ACCEPT', ''), versions]
+        # A replica may not have the write behind a fresh version yet; it
+        # mustn't serve (or cache) old rows under the new ETag.
+        if versions and time.time() - max(modified for _, modified in versions) < settings.READ_YOUR_WRITES_WINDOW:
+            read_from_primary()
+        return '"{}"'.format(hashlib.sha1(json.dumps(source).encode('utf-8')).hexdigest())
+
+    def is_not_modified(self, request, etag):
+        etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        return etag in etags or '*' in etags
+
+    def get_response_cache_key(self, etag):
+        return 'response:{}'.format(etag.strip('"'))
+
+    def add_validators(self, response, etag):
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        cache_key = self.get_response_cache_key(etag)
+
+        if self.is_not_modified(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(cache_key) if self.cache_responses else None
+            if data is not None:
+                response = Response(data)
+            else:
+                response = super().list(request, *args, **kwargs)
+                if self.cache_responses and response.status_code == status.HTTP_200_OK:
+                    cache.set(cache_key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+
+        return self.add_validators(response, etag)
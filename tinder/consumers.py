@@ -0,0 +1,25 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+
+def user_group(user_id):
+    return 'user_{}'.format(user_id)
+
+
+class MessageConsumer(AsyncJsonWebsocketConsumer):
+    group_name = None
+
+    async def connect(self):
+        user = self.scope['user']
+        if not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.group_name = user_group(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def message_created(self, event):
+        await self.send_json({'type': 'message.created', 'message': event['message']})
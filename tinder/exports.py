@@ -0,0 +1,137 @@
+import csv
+import datetime
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Message, Order, Review
+
+# Row-by-row exports for analysts, served by ExportView and the export_data
+# command. Rows are read in primary-key batches of EXPORT_CHUNK_SIZE rather
+# than through one server-side cursor (which pgbouncer's transaction pooling
+# rules out), so memory stays flat however large the date range.
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class Export:
+    def __init__(self, model, fields, date_field):
+        self.model = model
+        self.fields = fields
+        self.date_field = date_field
+
+    def get_queryset(self, since=None, until=None):
+        """Rows with ``since <= date_field < until``, reading from a replica if the request uses one."""
+        queryset = self.model.objects.using(router.db_for_read(self.model))
+        if since is not None:
+            queryset = queryset.filter(**{self.date_field + '__gte': since})
+        if until is not None:
+            queryset = queryset.filter(**{self.date_field + '__lt': until})
+        return queryset.values_list('pk', *self.fields)
+
+    def batches(self, queryset, size):
+        last = None
+        while True:
+            page = queryset if last is None else queryset.filter(pk__gt=last)
+            rows = list(page.order_by('pk')[:size])
+            if not rows:
+                return
+            yield [row[1:] for row in rows]
+            last = rows[-1][0]
+
+    async def abatches(self, queryset, size):
+        last = None
+        while True:
+            page = queryset if last is None else queryset.filter(pk__gt=last)
+            rows = [row async for row in page.order_by('pk')[:size]]
+            if not rows:
+                return
+            yield [row[1:] for row in rows]
+            last = rows[-1][0]
+
+
+EXPORTS = {
+    'orders': Export(Order, ('id', 'service', 'price', 'status', 'customer_id', 'executor_id', 'deadline',
+                             'completed_at', 'adress', 'latitude', 'longitude', 'proposal_count'), 'deadline'),
+    'reviews': Export(Review, ('id', 'reviewer_id', 'reviewee_id', 'order_id', 'rating', 'review_text',
+                               'created_at'), 'created_at'),
+    'messages': Export(Message, ('id', 'chat_id', 'sender_id', 'text', 'is_read', 'timestamp'), 'timestamp'),
+}
+
+
+def parse_bound(value):
+    """A ``since``/``until`` bound: an ISO date (midnight) or datetime. Raises ValueError."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError('Invalid date: {}'.format(value))
+        parsed = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _value(value):
+    # Full precision; DjangoJSONEncoder would cut datetimes to milliseconds.
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+def _csv_cell(value):
+    value = _value(value)
+    # Don't let a spreadsheet run user text as a formula.
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@', '\t', '\r'):
+        return "'" + value
+    return value
+
+
+class Encoder:
+    """Turns batches of rows into text chunks of one format."""
+
+    def __init__(self, fields, format):
+        self.fields = fields
+        self.format = format
+        self.writer = csv.writer(_Echo())
+
+    def header(self):
+        return self.writer.writerow(self.fields) if self.format == 'csv' else ''
+
+    def encode(self, rows):
+        if self.format == 'csv':
+            return ''.join(self.writer.writerow([_csv_cell(value) for value in row]) for row in rows)
+        return ''.join(json.dumps(dict(zip(self.fields, map(_value, row))), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+                       for row in rows)
+
+
+def stream(export, format, since=None, until=None, chunk_size=None):
+    return stream_queryset(export.get_queryset(since, until), export, format, chunk_size)
+
+
+def stream_queryset(queryset, export, format, chunk_size=None):
+    """``stream`` over a queryset built while the request was routed."""
+    encoder = Encoder(export.fields, format)
+    yield encoder.header()
+    for rows in export.batches(queryset, chunk_size or settings.EXPORT_CHUNK_SIZE):
+        yield encoder.encode(rows)
+
+
+async def astream(queryset, export, format, chunk_size=None):
+    """``stream_queryset`` for StreamingHttpResponse under ASGI."""
+    encoder = Encoder(export.fields, format)
+    yield encoder.header()
+    async for rows in export.abatches(queryset, chunk_size or settings.EXPORT_CHUNK_SIZE):
+        yield encoder.encode(rows)
@@ -0,0 +1,29 @@
+import django_filters
+from rest_framework.exceptions import ValidationError
+
+from .models import Order
+from . import geo
+
+
+class OrderFilter(django_filters.FilterSet):
+    near = django_filters.CharFilter(method='filter_near', label='near=<lat>,<lon>, with radius=<km>')
+
+    class Meta:
+        model = Order
+        fields = {
+            'status': ['exact', 'in'],
+            'deadline': ['gte', 'lte'],
+            'price': ['gte', 'lte'],
+            'customer': ['exact'],
+            'executor': ['exact', 'isnull'],
+        }
+
+    def filter_near(self, queryset, name, value):
+        try:
+            lat, lon = (float(part) for part in value.split(','))
+            radius = float(self.data.get('radius', 5))
+        except ValueError:
+            raise ValidationError({'near': 'Expected near=<lat>,<lon>&radius=<km>.'})
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 0 < radius <= 100):
+            raise ValidationError({'near': 'Coordinates or radius out of range.'})
+        return geo.filter_near(queryset, lat, lon, radius)
@@ -0,0 +1,119 @@
+import logging
+import math
+import re
+from urllib.parse import parse_qs, unquote, urlparse
+
+from django.conf import settings
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+_PAIR = r'(-?\d{1,3}(?:\.\d+)?)\s*,\s*(-?\d{1,3}(?:\.\d+)?)'
+
+
+def _pair(value, lon_first=False):
+    match = re.search(_PAIR, unquote(value or ''))
+    if match is None:
+        return None
+    first, second = float(match.group(1)), float(match.group(2))
+    lat, lon = (second, first) if lon_first else (first, second)
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return lat, lon
+    return None
+
+
+def parse_map_link(url):
+    """
+    Extract ``(latitude, longitude)`` from a Google Maps, Yandex Maps, 2GIS
+    or OpenStreetMap link, or return None. Yandex and 2GIS put longitude
+    first.
+    """
+    if not url:
+        return None
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    query = parse_qs(parsed.query)
+
+    if 'yandex' in host:
+        for key in ('pt', 'whatshere[point]', 'll'):
+            if key in query:
+                return _pair(query[key][0], lon_first=True)
+        return None
+    if '2gis' in host:
+        if 'm' in query:
+            return _pair(query['m'][0], lon_first=True)
+        return _pair(parsed.path, lon_first=True)
+    if 'openstreetmap' in host:
+        if 'mlat' in query and 'mlon' in query:
+            return _pair('{},{}'.format(query['mlat'][0], query['mlon'][0]))
+        match = re.search(r'map=\d+/(-?[\d.]+)/(-?[\d.]+)', parsed.fragment)
+        return _pair('{},{}'.format(*match.groups())) if match else None
+
+    match = re.search(r'@' + _PAIR, parsed.path)
+    if match:
+        return _pair(match.group(0)[1:])
+    for key in ('q', 'query', 'll', 'center', 'destination'):
+        if key in query:
+            return _pair(query[key][0])
+    return None
+
+
+def geocode(address):
+    """
+    Resolve a free-text address through the ``ORDER_GEOCODER`` callable, a
+    dotted path to ``func(address) -> (lat, lon) | None``. Unset by default.
+    It runs inside ``Order.save``, so a failing geocoder is logged and the
+    order is saved without coordinates rather than not at all.
+    """
+    geocoder = getattr(settings, 'ORDER_GEOCODER', None)
+    if not geocoder or not address:
+        return None
+    geocoder = import_string(geocoder)
+    try:
+        return geocoder(address)
+    except Exception:
+        logger.exception('Failed to geocode %r', address)
+        return None
+
+
+def locate(link, address):
+    return parse_map_link(link) or geocode(address)
+
+
+def bounding_box(lat, lon, radius_km):
+    """Latitude/longitude ranges that contain every point within ``radius_km``."""
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = max(lat - delta_lat, -90.0), min(lat + delta_lat, 90.0)
+    if min_lat == -90.0 or max_lat == 90.0:
+        return min_lat, max_lat, -180.0, 180.0
+    delta_lon = math.degrees(math.asin(min(math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat)), 1.0)))
+    min_lon, max_lon = lon - delta_lon, lon + delta_lon
+    if min_lon < -180.0 or max_lon > 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def distance_km(lat, lon, lat_field='latitude', lon_field='longitude'):
+    """Haversine distance from ``(lat, lon)`` to the row's coordinates, as an ORM expression."""
+    half_dlat = Radians(F(lat_field) - Value(lat)) / 2
+    half_dlon = Radians(F(lon_field) - Value(lon)) / 2
+    a = (Power(Sin(half_dlat), 2)
+         + Value(math.cos(math.radians(lat))) * Cos(Radians(F(lat_field))) * Power(Sin(half_dlon), 2))
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(a), output_field=FloatField())
+
+
+def filter_near(queryset, lat, lon, radius_km):
+    """
+    Rows within ``radius_km`` of ``(lat, lon)``, annotated with ``distance``.
+    The bounding box is an indexed range on (latitude, longitude); the exact
+    distance check only runs on the rows inside it.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    return (queryset
+            .filter(latitude__range=(min_lat, max_lat), longitude__range=(min_lon, max_lon))
+            .annotate(distance=distance_km(lat, lon))
+            .filter(distance__lte=radius_km))
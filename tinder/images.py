@@ -0,0 +1,160 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import F
+from PIL import Image, ImageOps
+
+from .authentication import invalidate_user
+from .models import ChatMember, CustomUser, ImageBlob, MessageImage
+from .storage import ContentAddressedStorage, chat_image_storage
+from . import versions
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix='image-variants')
+
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+AVATAR_VARIANT_DIRECTORY = 'user/avatar/variants'
+
+
+def make_variants(field_file, directory, sizes=None, crop=True, storage=default_storage, prefix=''):
+    """
+    Render ``field_file`` at each of ``sizes`` (square crops by default, or
+    fit inside the box with ``crop=False``) and save them under
+    ``directory``. Returns a ``{size: name}`` dict of the stored variants.
+    Names are ``prefix`` plus the SHA-256 of the source, so different
+    sources never share a file, and a variant already stored is reused.
+    """
+    sizes = sizes or settings.IMAGE_VARIANT_SIZES
+    image_format = settings.IMAGE_VARIANT_FORMAT
+
+    with field_file.open('rb') as f:
+        stem = prefix + ContentAddressedStorage.content_digest(f)
+        names = {size: '{}/{}_{}.{}'.format(directory, stem, size, EXTENSIONS[image_format]) for size in sizes}
+        missing = [size for size in sizes if not storage.exists(names[size])]
+        if not missing:
+            return {str(size): name for size, name in names.items()}
+        image = Image.open(f)
+        # Let the JPEG decoder downscale while reading; originals can be 10+ MP.
+        image.draft('RGB', (max(sizes) * 2, max(sizes) * 2))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA') or (image_format == 'JPEG' and image.mode == 'RGBA'):
+        image = image.convert('RGBA' if image_format != 'JPEG' and image.mode in ('LA', 'P') else 'RGB')
+
+    variants = {str(size): names[size] for size in sizes}
+    for size in missing:
+        if crop:
+            variant = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        else:
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.LANCZOS)
+        buffer = BytesIO()
+        variant.save(buffer, format=image_format, quality=settings.IMAGE_VARIANT_QUALITY)
+        variants[str(size)] = storage.save(names[size], ContentFile(buffer.getvalue()))
+    return variants
+
+
+def variant_urls(variants, request=None):
+    urls = {}
+    for size, name in variants.items():
+        url = default_storage.url(name)
+        urls[size] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def build_avatar_variants(user_id):
+    user = CustomUser.objects.filter(pk=user_id).first()
+    if user is None or not user.avatar:
+        return
+    # Prefixed with the user's pk, so only this row refers to them.
+    prefix = '{}_'.format(user_id)
+    variants = make_variants(user.avatar, AVATAR_VARIANT_DIRECTORY, prefix=prefix)
+    # Skip the write if the avatar was replaced while we were rendering.
+    if CustomUser.objects.filter(pk=user_id, avatar=user.avatar.name).update(avatar_variants=variants):
+        own = '{}/{}'.format(AVATAR_VARIANT_DIRECTORY, prefix)
+        for name in set(user.avatar_variants.values()) - set(variants.values()):
+            if name.startswith(own):
+                default_storage.delete(name)
+    invalidate_user(user_id)
+
+
+def acquire_image_blob(image):
+    """Take a reference on the stored file behind ``image`` and link the two."""
+    name = image.image.name
+    with transaction.atomic():
+        blob, created = ImageBlob.objects.select_for_update().get_or_create(
+            sha256=ContentAddressedStorage.digest(name),
+            defaults={'file': name, 'size': image.image.size},
+        )
+        ImageBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        MessageImage.objects.filter(pk=image.pk).update(blob=blob)
+    image.blob = blob
+    if created:
+        run_after_commit(build_blob_thumbnail, blob.pk)
+    return blob
+
+
+def release_image_blob(blob_id):
+    """Drop a reference; the file and its thumbnail go with the last one."""
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None or blob.ref_count == 0:
+            return
+        ImageBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') - 1)
+        if blob.ref_count > 1:
+            return
+    transaction.on_commit(partial(purge_image_blob, blob_id))
+
+
+def purge_image_blob(blob_id):
+    """
+    Delete a blob nobody references, files first. It runs under the row lock
+    an upload of the same content takes before reusing the file, so the two
+    can't interleave: either the upload's reference comes first and the blob
+    stays, or the file is gone before the upload checks for it.
+    """
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(pk=blob_id, ref_count=0).first()
+        if blob is None:
+            return
+        chat_image_storage().delete(blob.file)
+        if blob.thumbnail:
+            default_storage.delete(blob.thumbnail)
+        blob.delete()
+
+
+def build_blob_thumbnail(blob_id):
+    blob = ImageBlob.objects.filter(pk=blob_id).first()
+    if blob is None:
+        return
+    source = File(chat_image_storage().open(blob.file), name=blob.file)
+    size = settings.CHAT_IMAGE_THUMBNAIL_SIZE
+    thumbnail = make_variants(source, 'chat_images/thumbnails', sizes=(size,), crop=False)[str(size)]
+    ImageBlob.objects.filter(pk=blob_id).update(thumbnail=thumbnail)
+    # Message lists sent before the thumbnail existed show it as null; make
+    # their ETags stale in every chat that shows this image.
+    members = (ChatMember.objects.filter(chat__messages__images__blob_id=blob_id)
+               .values_list('user_id', flat=True).distinct())
+    versions.bump_users(list(members), 'chats', 'messages')
+
+
+def _run_in_background(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Background image job %s%r failed', func.__name__, args)
+    finally:
+        connections.close_all()
+
+
+def run_after_commit(func, *args):
+    """Run ``func(*args)`` on the image worker pool once the transaction commits."""
+    transaction.on_commit(lambda: _executor.submit(_run_in_background, func, *args))
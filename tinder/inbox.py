@@ -0,0 +1,27 @@
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Chat, Message
+
+# Chat.last_message points at the newest message of each chat, so the inbox
+# reads it with a join instead of a query per chat.
+
+
+def message_created(message):
+    # Conditional, so a message committed after a newer one can't move the
+    # pointer back.
+    (Chat.objects.filter(pk=message.chat_id)
+     .filter(Q(last_message__isnull=True) | Q(last_message_id__lt=message.pk))
+     .update(last_message=message, last_activity=message.timestamp))
+
+
+def refresh_last_message(chat_id):
+    """
+    Point the chat at its newest remaining message after a delete, and move
+    its last activity back to that message, or to when the chat was opened.
+    """
+    newest = Message.objects.filter(chat=OuterRef('pk')).order_by('-id')
+    Chat.objects.filter(pk=chat_id).update(
+        last_message=Subquery(newest.values('id')[:1]),
+        last_activity=Coalesce(Subquery(newest.values('timestamp')[:1]), F('created_at')),
+    )
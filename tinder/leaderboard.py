@@ -0,0 +1,167 @@
+from django.db.models import Count
+from django.db.models.functions import Lower, Trim
+from django_redis import get_redis_connection
+
+from .models import CustomUser, Order
+from .constants import ROLES
+
+# Sorted sets leaderboard:<role>:<metric>[:<city>] hold user ids scored by
+# the metric, so ranked listings are a ZREVRANGE instead of a table sort.
+# A set is either complete or missing: updates skip sets that don't exist,
+# and top() rebuilds a missing one from the database (after a Redis flush,
+# say) when it is next read.
+METRICS = ('rating', 'completed_orders')
+
+# ZADD/ZINCRBY only if the set exists; members whose score drops to zero
+# are removed, as rebuild() would leave them out.
+UPDATE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local score = tonumber(ARGV[3])
+if ARGV[1] == 'incr' then
+    score = tonumber(redis.call('ZINCRBY', KEYS[1], ARGV[3], ARGV[2]))
+else
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2])
+end
+if score <= 0 then
+    redis.call('ZREM', KEYS[1], ARGV[2])
+end
+return nil
+"""
+
+
+def leaderboard_key(role, metric, city=None):
+    key = 'leaderboard:{}:{}'.format(role, metric)
+    if city:
+        key = '{}:{}'.format(key, normalize_city(city))
+    return key
+
+
+def normalize_city(city):
+    return (city or '').strip().lower()
+
+
+def rating_score(rating_sum, rating_count):
+    # Average first, number of reviews as the tie-breaker.
+    return rating_sum / rating_count + min(rating_count, 10 ** 6) / 10 ** 7
+
+
+def _keys(user, metric, role=None, city=None):
+    role = role if role is not None else user.role
+    city = city if city is not None else user.city
+    if not role:
+        return []
+    keys = [leaderboard_key(role, metric)]
+    if city:
+        keys.append(leaderboard_key(role, metric, city))
+    return keys
+
+
+def update_rating(user_id):
+    user = CustomUser.objects.filter(pk=user_id).only('role', 'city', 'rating_sum', 'rating_count').first()
+    if user is None or not user.role:
+        return
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for key in _keys(user, 'rating'):
+        if user.rating_count:
+            pipe.eval(UPDATE_SCRIPT, 1, key, 'set', user.pk, rating_score(user.rating_sum, user.rating_count))
+        else:
+            pipe.zrem(key, user.pk)
+    pipe.execute()
+
+
+def order_completed(order, amount=1):
+    users = CustomUser.objects.filter(pk__in=[order.customer_id, order.executor_id]).only('role', 'city')
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for user in users:
+        if (user.role == 'Executor') == (user.pk == order.executor_id):
+            for key in _keys(user, 'completed_orders'):
+                pipe.eval(UPDATE_SCRIPT, 1, key, 'incr', user.pk, amount)
+    pipe.execute()
+
+
+def sync_user(user, previous_role, previous_city):
+    """Move ``user`` to the right leaderboards after a role or city change."""
+    if (previous_role, normalize_city(previous_city)) == (user.role, normalize_city(user.city)):
+        return
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for metric in METRICS:
+        for key in _keys(user, metric, previous_role, previous_city or ''):
+            pipe.zrem(key, user.pk)
+    if user.role:
+        completed = Order.objects.filter(status='completed', **{
+            'executor' if user.role == 'Executor' else 'customer': user}).count()
+        rating_sum, rating_count = CustomUser.objects.values_list('rating_sum', 'rating_count').get(pk=user.pk)
+        if rating_count:
+            for key in _keys(user, 'rating'):
+                pipe.eval(UPDATE_SCRIPT, 1, key, 'set', user.pk, rating_score(rating_sum, rating_count))
+        if completed:
+            for key in _keys(user, 'completed_orders'):
+                pipe.eval(UPDATE_SCRIPT, 1, key, 'set', user.pk, completed)
+    pipe.execute()
+
+
+def top(role, metric, city=None, limit=50):
+    conn = get_redis_connection("default")
+    key = leaderboard_key(role, metric, city)
+    ids = conn.zrevrange(key, 0, limit - 1)
+    if ids:
+        return [int(user_id) for user_id in ids]
+    # Missing, or empty: an empty sorted set doesn't exist in Redis, so an
+    # empty leaderboard is looked up in the database on every read.
+    scores = board_scores(role, metric, city)
+    if scores:
+        store(conn.pipeline(transaction=False), key, scores).execute()
+    return sorted(scores, key=lambda user_id: (scores[user_id], str(user_id)), reverse=True)[:limit]
+
+
+def board_scores(role, metric, city=None):
+    """The scores of one leaderboard, computed from the database."""
+    users = CustomUser.objects.filter(role=role)
+    if city:
+        users = users.annotate(city_key=Lower(Trim('city'))).filter(city_key=normalize_city(city))
+    if metric == 'rating':
+        return {pk: rating_score(rating_sum, rating_count) for pk, rating_sum, rating_count
+                in users.filter(rating_count__gt=0).values_list('pk', 'rating_sum', 'rating_count')}
+    field = 'executor' if role == 'Executor' else 'customer'
+    return dict(Order.objects.filter(status='completed', **{field + '__in': users.values('pk')})
+                .values_list(field + '_id').annotate(total=Count('id')).order_by())
+
+
+def store(pipe, key, scores):
+    """Queue commands on ``pipe`` that replace the set at ``key`` with ``scores`` in one step."""
+    pipe.delete(key + ':rebuild')
+    pipe.zadd(key + ':rebuild', scores)
+    pipe.rename(key + ':rebuild', key)
+    return pipe
+
+
+def rebuild():
+    """Recompute every leaderboard from the database, swapping each set in atomically."""
+    boards = {}
+
+    def add(user, metric, score):
+        for key in _keys(user, metric):
+            boards.setdefault(key, {})[user.pk] = score
+
+    users = CustomUser.objects.exclude(role='').only('role', 'city', 'rating_sum', 'rating_count')
+    completed = {role: dict(Order.objects.filter(status='completed')
+                            .values_list('executor_id' if role == 'Executor' else 'customer_id')
+                            .annotate(total=Count('id')).order_by())
+                 for role, _ in ROLES}
+    for user in users.iterator():
+        if user.rating_count:
+            add(user, 'rating', rating_score(user.rating_sum, user.rating_count))
+        if completed.get(user.role, {}).get(user.pk):
+            add(user, 'completed_orders', completed[user.role][user.pk])
+
+    conn = get_redis_connection("default")
+    stale = set(key.decode() for key in conn.scan_iter(match='leaderboard:*', count=1000)) - set(boards)
+    pipe = conn.pipeline(transaction=False)
+    for key, scores in boards.items():
+        store(pipe, key, scores)
+    for key in stale:
+        pipe.delete(key)
+    pipe.execute()
+    return len(boards)
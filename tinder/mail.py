@@ -0,0 +1,86 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import smtp_timer
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+
+def queue_mail(subject, message, recipient_list, from_email=None, expires_in=None):
+    """
+    Store an email in the outbox instead of sending it inline. The
+    ``send_queued_mail`` worker delivers it over a long-lived connection.
+    An email that is still unsent ``expires_in`` seconds from now is dropped,
+    which keeps one-time codes from arriving after they stopped working.
+    """
+    expires_at = timezone.now() + timedelta(seconds=expires_in) if expires_in else None
+    return OutgoingEmail.objects.create(subject=subject, body=message, to=list(recipient_list),
+                                        from_email=from_email or settings.EMAIL_HOST_USER or '',
+                                        expires_at=expires_at)
+
+
+def expire_queued_mail():
+    """Give up on unsent emails past their expiry, clearing their bodies."""
+    return (OutgoingEmail.objects.filter(status__in=['pending', 'sending'], expires_at__lte=timezone.now())
+            .update(status='expired', body=''))
+
+
+def claim_queued_mail(batch_size):
+    """
+    Mark up to ``batch_size`` due emails as sending and return them. The
+    claim commits before any email is sent, so no row lock is held across
+    SMTP round trips. A claim lapses after EMAIL_OUTBOX_CLAIM_TIMEOUT seconds,
+    so emails held by a worker that died are picked up again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(OutgoingEmail.objects.select_for_update(skip_locked=True)
+                      .filter(status__in=['pending', 'sending'], send_after__lte=now)
+                      .order_by('send_after', 'id')[:batch_size])
+        OutgoingEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            status='sending', send_after=now + timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT))
+    return emails
+
+
+def send_queued_mail(connection, batch_size=None):
+    """
+    Send one batch of due emails over ``connection`` and return how many were
+    picked up. Failed emails are retried with exponential backoff until
+    ``EMAIL_OUTBOX_MAX_ATTEMPTS`` is reached or they expire. The body of an
+    email is cleared once it is sent or given up on.
+    """
+    expire_queued_mail()
+    emails = claim_queued_mail(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not emails:
+        return 0
+    with smtp_timer():
+        connection.open()
+    for email in emails:
+        message = EmailMessage(email.subject, email.body, email.from_email or None, email.to,
+                               connection=connection)
+        try:
+            with smtp_timer():
+                message.send()
+        except Exception as exc:
+            logger.warning('Failed to send email %s: %s', email.pk, exc)
+            connection.close()
+            email.attempts += 1
+            email.last_error = str(exc)
+            delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (email.attempts - 1)
+            email.send_after = timezone.now() + timedelta(seconds=delay)
+            if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                email.status, email.body = 'failed', ''
+            elif email.expires_at is not None and email.send_after >= email.expires_at:
+                email.status, email.body = 'expired', ''
+            else:
+                email.status = 'pending'
+            email.save(update_fields=['attempts', 'last_error', 'status', 'send_after', 'body'])
+        else:
+            OutgoingEmail.objects.filter(pk=email.pk).update(status='sent', sent_at=timezone.now(), body='')
+    return len(emails)
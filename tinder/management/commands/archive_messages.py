@@ -0,0 +1,48 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from tinder.archive import SegmentWriter, archive_chat
+from tinder.models import Chat, Message
+
+
+class Command(BaseCommand):
+    help = ('Move the messages of chats whose order was completed more than --days days ago into '
+            'gzip NDJSON segments under MESSAGE_ARCHIVE_ROOT, one chat per transaction. /messages/?chat=<id> '
+            'reads them back. Run it again later to archive messages sent after the first run.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.MESSAGE_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--limit', type=int, default=None, help='Archive at most this many chats.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived.')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative.')
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        chats = (Chat.objects.filter(order__status='completed', order__completed_at__lte=cutoff)
+                 .filter(Exists(Message.objects.filter(chat=OuterRef('pk'))))
+                 .order_by('pk'))
+        if options['limit'] is not None:
+            chats = chats[:options['limit']]
+
+        if options['dry_run']:
+            chat_ids = list(chats.values_list('pk', flat=True))
+            messages = Message.objects.filter(chat_id__in=chat_ids).count()
+            self.stdout.write('Would archive {} messages from {} chats.'.format(messages, len(chat_ids)))
+            return
+
+        writer = SegmentWriter()
+        archived_chats = archived_messages = 0
+        try:
+            for chat in chats.iterator():
+                moved = archive_chat(chat, writer)
+                if moved:
+                    archived_chats += 1
+                    archived_messages += moved
+        finally:
+            writer.close()
+        self.stdout.write('Archived {} messages from {} chats.'.format(archived_messages, archived_chats))
@@ -0,0 +1,132 @@
+import statistics
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from tinder.models import Chat, ChatMember, CustomUser, Message, Order
+from tinder.views import MessageListView
+
+BENCH_DOMAIN = '@bench.apartx.local'
+
+
+class Command(BaseCommand):
+    help = ('Seed synthetic chats and messages, then print the query plan and latency of '
+            'the /messages/ inbox query. Run it against a scratch database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=1_000)
+        parser.add_argument('--chats', type=int, default=10_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--deep-page', type=int, default=100,
+                            help='Also time the page reached after following this many next links.')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded data and exit.')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = CustomUser.objects.filter(email__endswith=BENCH_DOMAIN).delete()
+            self.stdout.write('Deleted {} rows.'.format(deleted))
+            return
+
+        if not CustomUser.objects.filter(email__endswith=BENCH_DOMAIN).exists():
+            self.seed(options)
+
+        user = (CustomUser.objects.filter(email__endswith=BENCH_DOMAIN, role='Customer')
+                .order_by('id').first())
+        chats = ChatMember.objects.filter(user=user).count()
+        messages = Message.objects.filter(chat__in=ChatMember.objects.filter(user=user).values('chat_id')).count()
+        self.stdout.write('Database: {} ({})'.format(connection.vendor, connection.settings_dict['NAME']))
+        self.stdout.write('Messages in table: {}; probe user has {} chats, {} messages.'.format(
+            Message.objects.count(), chats, messages))
+
+        view = MessageListView(request=SimpleNamespace(user=user))
+        queryset = view.get_queryset().order_by('-timestamp', '-id')[:51]
+        self.stdout.write('\nQuery:\n{}\n'.format(queryset.query))
+        if connection.vendor == 'postgresql':
+            plan = queryset.explain(analyze=True, buffers=True)
+        else:
+            plan = queryset.explain()
+        self.stdout.write('Plan:\n{}\n'.format(plan))
+
+        self.time_page('first page', user, '/messages/', options['repeat'])
+        url = '/messages/'
+        for _ in range(options['deep_page']):
+            response = self.get(user, url)
+            if not response.data['next']:
+                break
+            url = response.data['next']
+        self.time_page('deep page', user, url, options['repeat'])
+
+    def get(self, user, url):
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user=user)
+        response = MessageListView.as_view()(request)
+        response.render()
+        return response
+
+    def time_page(self, label, user, url, repeat):
+        timings = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                self.get(user, url)
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write('{}: {} queries, min {:.2f} ms, median {:.2f} ms, p95 {:.2f} ms'.format(
+            label, len(queries), timings[0], statistics.median(timings),
+            timings[int(len(timings) * 0.95) - 1 if len(timings) > 1 else 0]))
+
+    def seed(self, options):
+        batch_size = options['batch_size']
+        half = max(options['users'] // 2, 1)
+        now = timezone.now()
+        self.stdout.write('Seeding {} users, {} chats, {} messages...'.format(
+            half * 2, options['chats'], options['messages']))
+
+        with transaction.atomic():
+            CustomUser.objects.bulk_create([
+                CustomUser(email='{}{}{}'.format(role.lower(), i, BENCH_DOMAIN), password='!', role=role)
+                for role in ('Customer', 'Executor') for i in range(half)
+            ], batch_size=batch_size)
+            customers = list(CustomUser.objects.filter(email__endswith=BENCH_DOMAIN, role='Customer')
+                             .order_by('id').values_list('id', flat=True))
+            executors = list(CustomUser.objects.filter(email__endswith=BENCH_DOMAIN, role='Executor')
+                             .order_by('id').values_list('id', flat=True))
+
+            Order.objects.bulk_create([
+                Order(service='Cleaning', price=10000, customer_id=customer, deadline=now, adress='-')
+                for customer in customers
+            ], batch_size=batch_size)
+            orders = dict(Order.objects.filter(customer_id__in=customers).values_list('customer_id', 'id'))
+
+            pairs = [(customers[i % half], executors[(i * 7 + i // half) % half]) for i in range(options['chats'])]
+            Chat.objects.bulk_create([
+                Chat(order_id=orders[customer], customer_id=customer, executor_id=executor)
+                for customer, executor in pairs
+            ], batch_size=batch_size)
+            chats = list(Chat.objects.filter(customer_id__in=customers)
+                         .order_by('id').values_list('id', 'customer_id', 'executor_id'))
+            ChatMember.objects.bulk_create([
+                ChatMember(chat_id=chat, user_id=user)
+                for chat, customer, executor in chats for user in (customer, executor)
+            ], batch_size=batch_size, ignore_conflicts=True)
+
+        for start in range(0, options['messages'], batch_size):
+            stop = min(start + batch_size, options['messages'])
+            with transaction.atomic():
+                Message.objects.bulk_create([
+                    Message(chat_id=chats[i % len(chats)][0], sender_id=chats[i % len(chats)][1 + i % 2],
+                            text='Benchmark message {}'.format(i))
+                    for i in range(start, stop)
+                ], batch_size=batch_size)
+            self.stdout.write('  {} / {}'.format(stop, options['messages']))
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from tinder.images import build_avatar_variants
+from tinder.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Render resized avatar variants for users that are missing them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render variants for every user with an avatar.')
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.exclude(avatar='').exclude(avatar__isnull=True)
+        if not options['all']:
+            users = users.filter(avatar_variants={})
+        done = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            try:
+                build_avatar_variants(user_id)
+            except (OSError, ValueError) as exc:
+                self.stderr.write('User {}: {}'.format(user_id, exc))
+            else:
+                done += 1
+        self.stdout.write('Rendered avatar variants for {} users.'.format(done))
@@ -0,0 +1,38 @@
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tinder.images import acquire_image_blob
+from tinder.models import ImageBlob, MessageImage
+from tinder.storage import chat_image_storage
+
+
+class Command(BaseCommand):
+    help = ('Move chat images saved before content addressing to their SHA-256 names, '
+            'link them to shared blobs and delete the duplicate files.')
+
+    def handle(self, *args, **options):
+        storage = chat_image_storage()
+        moved = reclaimed = 0
+        for image in MessageImage.objects.filter(blob__isnull=True).iterator(chunk_size=500):
+            old_name = image.image.name
+            if not old_name or not storage.exists(old_name):
+                self.stderr.write('MessageImage {}: file {!r} is missing, skipped.'.format(image.pk, old_name))
+                continue
+            size = storage.size(old_name)
+            with storage.open(old_name) as f, transaction.atomic():
+                content = File(f, name=old_name)
+                # As in MessageImage.save: keep a blob of this content from
+                # being purged while its file is reused.
+                ImageBlob.objects.lock(storage.content_digest(content))
+                new_name = storage.save(old_name, content)
+                if new_name != old_name:
+                    MessageImage.objects.filter(pk=image.pk).update(image=new_name)
+                    image.image.name = new_name
+                acquire_image_blob(image)
+            if new_name != old_name and not MessageImage.objects.filter(image=old_name).exists():
+                storage.delete(old_name)
+                if MessageImage.objects.filter(image=new_name).exclude(pk=image.pk).exists():
+                    reclaimed += size
+            moved += 1
+        self.stdout.write('Linked {} images, reclaimed {} bytes.'.format(moved, reclaimed))
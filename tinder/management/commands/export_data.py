@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tinder import exports
+
+
+class Command(BaseCommand):
+    help = ('Write every orders, reviews or messages row as NDJSON or CSV, optionally only those dated within '
+            '--since/--until, fetching --chunk-size rows at a time. Archived messages are not included.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='ndjson')
+        parser.add_argument('--since', help='ISO date or datetime, inclusive.')
+        parser.add_argument('--until', help='ISO date or datetime, exclusive.')
+        parser.add_argument('--output', help='File to write; stdout by default.')
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive.')
+        try:
+            since, until = (exports.parse_bound(options[key]) if options[key] else None for key in ('since', 'until'))
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        chunks = exports.stream(exports.EXPORTS[options['name']], options['format'], since, until,
+                                options['chunk_size'])
+        if options['output'] is None:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for chunk in chunks:
+                output.write(chunk)
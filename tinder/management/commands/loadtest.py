@@ -0,0 +1,196 @@
+import datetime
+import io
+import math
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import Client
+from django.urls import resolve
+from django.utils import timezone
+from PIL import Image
+
+from tinder.models import OutgoingEmail
+
+LOADTEST_DOMAIN = '@loadtest.apartx.local'
+PERCENTILES = (50, 95, 99)
+
+
+class ScenarioFailed(Exception):
+    pass
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, endpoint, elapsed, ok):
+        with self.lock:
+            self.timings[endpoint].append(elapsed)
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+def percentile(sorted_values, p):
+    return sorted_values[max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)]
+
+
+class VirtualUser:
+    """One user of the API, driven through Django's test client."""
+
+    def __init__(self, recorder, email, phone_number):
+        self.recorder = recorder
+        self.client = Client()
+        self.email = email
+        self.phone_number = phone_number
+        self.id = None
+        self.headers = {}
+
+    def request(self, method, path, expected=(200, 201), **kwargs):
+        endpoint = '{} /{}'.format(method.upper(), resolve(path.split('?')[0]).route)
+        started = time.perf_counter()
+        response = getattr(self.client, method)(path, headers=self.headers, **kwargs)
+        self.recorder.add(endpoint, time.perf_counter() - started, response.status_code in expected)
+        if response.status_code not in expected:
+            raise ScenarioFailed('{} returned {}: {}'.format(endpoint, response.status_code,
+                                                             response.content[:200]))
+        return response.json() if response.content else None
+
+    def last_code(self, subject):
+        email = OutgoingEmail.objects.filter(subject=subject, to=[self.email]).order_by('-id').first()
+        if email is None:
+            raise ScenarioFailed('No "{}" email for {}'.format(subject, self.email))
+        return email.body.split()[-1]
+
+    def use_token(self, token):
+        self.headers = {'Authorization': 'Bearer {}'.format(token['access'])}
+
+    def register(self, avatar, role):
+        avatar.seek(0)
+        self.request('post', '/request-register/', data={
+            'email': self.email, 'password': 'loadtest', 'first_name': 'Load', 'last_name': 'Test',
+            'phone_number': self.phone_number, 'avatar': avatar,
+        })
+        data = self.request('post', '/confirm-register/', data={
+            'email': self.email, 'code': self.last_code('Confirmation code'),
+        })
+        self.use_token(data['token'])
+        self.request('patch', '/select-role/', data={'role': role}, content_type='application/json')
+        self.id = self.request('get', '/profile/')['id']
+
+    def login(self):
+        self.headers = {}
+        self.request('post', '/request-login/', data={'email': self.email, 'password': 'loadtest'})
+        data = self.request('post', '/confirm-login/', data={
+            'email': self.email, 'code': self.last_code('Login code'),
+        })
+        self.use_token(data['token'])
+
+
+class Command(BaseCommand):
+    help = ('Drive register -> login -> order -> proposal -> chat -> review flows through the API '
+            'from several threads and report latency percentiles and throughput per endpoint. '
+            'Meant for ApartXCleaning.settings_loadtest or a scratch database; it creates real rows.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', type=int, default=50,
+                            help='Number of customer/executor pairs to run through the flow.')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--messages', type=int, default=10, help='Chat messages per scenario.')
+        parser.add_argument('--reads', type=int, default=5, help='Feed and inbox reads per scenario.')
+
+    def handle(self, *args, **options):
+        if options['scenarios'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--scenarios and --concurrency must be positive.')
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (256, 256), (200, 120, 40)).save(buffer, 'PNG')
+        avatar_bytes = buffer.getvalue()
+        run = uuid.uuid4().hex[:8]
+        # Phone numbers are unique; give each run its own block of them.
+        phone_base = random.randrange(10_000_000 - 2 * options['scenarios'])
+
+        recorder = Recorder()
+        failures = []
+
+        def scenario(number):
+            try:
+                self.run_scenario(recorder, run, number, avatar_bytes, phone_base + 2 * number, options)
+            except ScenarioFailed as exc:
+                failures.append(str(exc))
+            finally:
+                close_old_connections()
+
+        self.stdout.write('Running {} scenarios with {} threads...'.format(
+            options['scenarios'], options['concurrency']))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for future in as_completed([pool.submit(scenario, n) for n in range(options['scenarios'])]):
+                future.result()
+        elapsed = time.perf_counter() - started
+
+        self.report(recorder, elapsed)
+        if failures:
+            self.stdout.write(self.style.WARNING('{} scenarios failed; first: {}'.format(
+                len(failures), failures[0])))
+
+    def run_scenario(self, recorder, run, number, avatar_bytes, phone, options):
+        customer = VirtualUser(recorder, 'c-{}-{}{}'.format(run, number, LOADTEST_DOMAIN), '+7701{:07d}'.format(phone))
+        executor = VirtualUser(recorder, 'e-{}-{}{}'.format(run, number, LOADTEST_DOMAIN),
+                               '+7701{:07d}'.format(phone + 1))
+        for user, role in ((customer, 'Customer'), (executor, 'Executor')):
+            avatar = io.BytesIO(avatar_bytes)
+            avatar.name = 'avatar.png'
+            user.register(avatar, role)
+            user.login()
+
+        order = customer.request('post', '/orders/', data={
+            'service': 'Cleaning', 'price': 15000, 'adress': 'Abay 10',
+            'deadline': (timezone.now() + datetime.timedelta(days=3)).isoformat(),
+        })
+        for _ in range(options['reads']):
+            executor.request('get', '/orders/?ordering=deadline&limit=20')
+        executor.request('post', '/proposals/', data={'order': order['id'], 'maid': executor.id})
+        customer.request('get', '/proposals/')
+
+        chat = customer.request('post', '/chats/', data={'user_id': executor.id, 'order_id': order['id']})
+        last_message = None
+        for i in range(options['messages']):
+            sender = customer if i % 2 == 0 else executor
+            last_message = sender.request('post', '/messages/', data={
+                'chat': chat['id'], 'sender': sender.id, 'text': 'Message {}'.format(i),
+            })
+        for _ in range(options['reads']):
+            executor.request('get', '/chats/')
+            executor.request('get', '/messages/?limit=20')
+        if last_message is not None:
+            executor.request('post', '/chats/{}/read/'.format(chat['id']), data={'message_id': last_message['id']})
+
+        customer.request('post', '/reviews/', data={
+            'reviewer': customer.id, 'reviewee': executor.id, 'order': order['id'],
+            'rating': 1 + number % 5, 'review_text': 'Load test review',
+        })
+        customer.request('get', '/reviews/?user_id={}'.format(executor.id))
+        customer.request('get', '/users/?ordering=rating&limit=20')
+
+    def report(self, recorder, elapsed):
+        header = '{:<34} {:>7} {:>6} {:>9} {:>9} {:>9} {:>8}'.format(
+            'endpoint', 'count', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s')
+        self.stdout.write('\n' + header)
+        self.stdout.write('-' * len(header))
+        total = 0
+        for endpoint in sorted(recorder.timings):
+            timings = sorted(recorder.timings[endpoint])
+            total += len(timings)
+            self.stdout.write('{:<34} {:>7} {:>6} {:>9.1f} {:>9.1f} {:>9.1f} {:>8.1f}'.format(
+                endpoint, len(timings), recorder.errors[endpoint],
+                *(percentile(timings, p) * 1000 for p in PERCENTILES), len(timings) / elapsed))
+        self.stdout.write('-' * len(header))
+        self.stdout.write('{} requests in {:.1f} s: {:.1f} req/s overall'.format(total, elapsed, total / elapsed))
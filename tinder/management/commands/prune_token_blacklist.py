@@ -0,0 +1,82 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django_redis import get_redis_connection
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+from tinder.models import CustomUser
+from tinder.tokens import AUDIT_QUEUE, blacklist_key
+
+
+class Command(BaseCommand):
+    help = ('Write queued refresh-token audit records to the token_blacklist tables and delete '
+            'expired rows in batches. --import-db copies tokens still blacklisted in the database '
+            'into the Redis blacklist, once, when switching over from the database blacklist.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--import-db', action='store_true')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['import_db']:
+            self.stdout.write('Imported {} blacklisted tokens into Redis.'.format(self.import_db(batch_size)))
+        self.stdout.write('Wrote {} audit records.'.format(self.drain_audit_queue(batch_size)))
+        self.stdout.write('Deleted {} expired tokens.'.format(self.prune(batch_size)))
+
+    def import_db(self, batch_size):
+        conn = get_redis_connection("default")
+        now = aware_utcnow()
+        rows = (BlacklistedToken.objects.filter(token__expires_at__gt=now)
+                .values_list('token__jti', 'token__expires_at'))
+        imported = 0
+        pipe = conn.pipeline(transaction=False)
+        for jti, expires_at in rows.iterator(chunk_size=batch_size):
+            pipe.set(blacklist_key(jti), 1, ex=max(int((expires_at - now).total_seconds()), 1))
+            imported += 1
+            if imported % batch_size == 0:
+                pipe.execute()
+        pipe.execute()
+        return imported
+
+    def drain_audit_queue(self, batch_size):
+        conn = get_redis_connection("default")
+        written = 0
+        while True:
+            records = [json.loads(record) for record in conn.lrange(AUDIT_QUEUE, 0, batch_size - 1)]
+            if not records:
+                return written
+            users = set(CustomUser.objects.filter(pk__in={record['user_id'] for record in records})
+                        .values_list('pk', flat=True))
+            with transaction.atomic():
+                OutstandingToken.objects.bulk_create([
+                    OutstandingToken(jti=record['jti'],
+                                     user_id=record['user_id'] if record['user_id'] in users else None,
+                                     token=record['token'],
+                                     created_at=record['created_at'] and datetime_from_epoch(record['created_at']),
+                                     expires_at=datetime_from_epoch(record['expires_at']))
+                    for record in records
+                ], ignore_conflicts=True)
+                blacklisted = [record['jti'] for record in records if record['blacklisted']]
+                BlacklistedToken.objects.bulk_create([
+                    BlacklistedToken(token_id=token_id)
+                    for token_id in OutstandingToken.objects.filter(jti__in=blacklisted).values_list('id', flat=True)
+                ], ignore_conflicts=True)
+            # New records are pushed on the right, so trimming the head
+            # only drops the ones written above.
+            conn.ltrim(AUDIT_QUEUE, len(records), -1)
+            written += len(records)
+
+    def prune(self, batch_size):
+        deleted = 0
+        while True:
+            ids = list(OutstandingToken.objects.filter(expires_at__lte=aware_utcnow())
+                       .values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            with transaction.atomic():
+                BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from tinder import leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Recompute the Redis leaderboards (rating, completed orders) from the database.'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilt {} leaderboards.'.format(leaderboard.rebuild()))
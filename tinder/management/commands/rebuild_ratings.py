@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from tinder.models import CustomUser, Review
+from tinder.ratings import RATING_FIELDS, STARS, stars_expression
+
+
+class Command(BaseCommand):
+    help = 'Recompute the rating aggregates on users from the reviews table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        # Out-of-range ratings count as the nearest star, as in tinder.ratings.
+        aggregates = {
+            'rating_sum': Sum('stars'),
+            'rating_count': Count('id'),
+        }
+        for star in STARS:
+            aggregates['stars_{}'.format(star)] = Count('id', filter=Q(stars=star))
+        rows = (Review.objects.annotate(stars=stars_expression())
+                .values('reviewee_id').annotate(**aggregates).order_by())
+
+        users = []
+        for row in rows.iterator():
+            user = CustomUser(pk=row.pop('reviewee_id'))
+            for field, value in row.items():
+                setattr(user, field, value or 0)
+            users.append(user)
+
+        with transaction.atomic():
+            CustomUser.objects.update(**{field: 0 for field in RATING_FIELDS})
+            CustomUser.objects.bulk_update(users, RATING_FIELDS, batch_size=options['batch_size'])
+        self.stdout.write('Rebuilt ratings for {} users.'.format(len(users)))
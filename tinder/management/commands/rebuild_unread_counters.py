@@ -0,0 +1,34 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django_redis import get_redis_connection
+
+from tinder.models import Message
+from tinder.unread import unread_key
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the per-user, per-chat unread counters in Redis from the messages table, '
+            'e.g. after a Redis flush. Messages created while it runs may be counted twice or not at all.')
+
+    def handle(self, *args, **options):
+        counts = defaultdict(dict)
+        rows = (Message.objects.filter(is_read=False)
+                .values('chat_id', 'chat__customer_id', 'chat__executor_id', 'sender_id')
+                .annotate(unread=Count('id'))
+                .order_by())
+        for row in rows.iterator():
+            for user_id in {row['chat__customer_id'], row['chat__executor_id']} - {row['sender_id']}:
+                user_counts = counts[user_id]
+                user_counts[row['chat_id']] = user_counts.get(row['chat_id'], 0) + row['unread']
+
+        conn = get_redis_connection("default")
+        pipe = conn.pipeline(transaction=False)
+        for key in conn.scan_iter(match=unread_key('*'), count=1000):
+            pipe.delete(key)
+        for user_id, user_counts in counts.items():
+            pipe.hset(unread_key(user_id), mapping=user_counts)
+        pipe.execute()
+
+        self.stdout.write('Rebuilt unread counters for {} users.'.format(len(counts)))
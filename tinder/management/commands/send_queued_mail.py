@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from tinder.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = ('Deliver queued emails. The mail connection stays open between batches and '
+            'is closed after EMAIL_OUTBOX_IDLE_TIMEOUT seconds without mail.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send all due emails and exit.')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to wait when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        connection = get_connection(fail_silently=False)
+        last_sent = time.monotonic()
+        try:
+            while True:
+                # Replace a database connection that was dropped or outlived
+                # CONN_MAX_AGE, as Django does between requests.
+                close_old_connections()
+                if send_queued_mail(connection, options['batch_size']):
+                    last_sent = time.monotonic()
+                    continue
+                if options['once']:
+                    break
+                if time.monotonic() - last_sent > settings.EMAIL_OUTBOX_IDLE_TIMEOUT:
+                    connection.close()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
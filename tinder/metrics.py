@@ -0,0 +1,316 @@
+import atexit
+import contextvars
+import hmac
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import redis
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django_redis import get_redis_connection
+from redis.asyncio import connection as async_connection
+
+logger = logging.getLogger(__name__)
+
+# Request metrics in the Prometheus text format. Each process adds its
+# samples up in memory and folds them into one Redis hash at most every
+# METRICS_FLUSH_INTERVAL seconds, so /metrics shows the totals of every
+# worker whichever one serves the scrape, and a request pays no Redis
+# round-trip for its own metrics.
+
+METRICS_KEY = 'metrics'
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS = {
+    'apartx_http_requests_total': ('counter', 'HTTP requests by view, method and status.'),
+    'apartx_http_request_duration_seconds': ('histogram', 'HTTP request latency by view.'),
+    'apartx_db_queries_total': ('counter', 'SQL queries run while serving a view.'),
+    'apartx_db_query_seconds_total': ('counter', 'Time spent in SQL queries while serving a view.'),
+    'apartx_redis_commands_total': ('counter', 'Redis commands sent while serving a view.'),
+    'apartx_redis_seconds_total': ('counter', 'Time spent on Redis commands while serving a view.'),
+    'apartx_smtp_seconds_total': ('counter', 'Time spent sending email, by view or "worker".'),
+}
+
+
+class RequestStats:
+    __slots__ = ('sql_count', 'sql_time', 'redis_count', 'redis_time', 'smtp_time')
+
+    def __init__(self):
+        self.sql_count = self.redis_count = 0
+        self.sql_time = self.redis_time = self.smtp_time = 0.0
+
+
+# Set for the duration of a request. asgiref copies the context into the
+# threads sync_to_async runs on, so queries made there are counted too.
+current_stats = contextvars.ContextVar('request_stats', default=None)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = defaultdict(float)
+        self.last_flush = time.monotonic()
+
+    def add(self, name, labels, value=1):
+        field = '{}|{}'.format(name, ','.join('{}="{}"'.format(k, v) for k, v in labels))
+        with self.lock:
+            self.pending[field] += value
+
+    def observe(self, name, labels, value):
+        for bucket in DURATION_BUCKETS:
+            if value <= bucket:
+                self.add(name + '_bucket', labels + (('le', bucket_label(bucket)),))
+        self.add(name + '_bucket', labels + (('le', '+Inf'),))
+        self.add(name + '_sum', labels, value)
+        self.add(name + '_count', labels)
+
+    def due(self):
+        return bool(self.pending) and time.monotonic() - self.last_flush >= settings.METRICS_FLUSH_INTERVAL
+
+    def flush(self, force=False):
+        with self.lock:
+            if not self.pending or not (force or self.due()):
+                return
+            pending, self.pending = self.pending, defaultdict(float)
+            self.last_flush = time.monotonic()
+        token = current_stats.set(None)
+        try:
+            pipe = get_redis_connection("default").pipeline(transaction=False)
+            for field, value in pending.items():
+                pipe.hincrbyfloat(METRICS_KEY, field, value)
+            pipe.execute()
+        except redis.RedisError:
+            logger.exception('Could not flush request metrics')
+            with self.lock:
+                for field, value in pending.items():
+                    self.pending[field] += value
+        finally:
+            current_stats.reset(token)
+
+
+registry = Registry()
+atexit.register(registry.flush, force=True)
+
+
+def sql_timer(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.sql_time += time.perf_counter() - started
+        stats.sql_count += 1
+
+
+def install_sql_timer(sender, connection, **kwargs):
+    # connection_created fires on every reconnect of the same wrapper.
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_timer)
+
+
+class InstrumentedConnection(redis.Connection):
+    """Counts commands and times round-trips for the current request."""
+
+    def send_command(self, *args, **kwargs):
+        stats = current_stats.get()
+        if stats is not None:
+            stats.redis_count += 1
+        return super().send_command(*args, **kwargs)
+
+    def pack_commands(self, commands):
+        commands = list(commands)
+        stats = current_stats.get()
+        if stats is not None:
+            stats.redis_count += len(commands)
+        return super().pack_commands(commands)
+
+    def send_packed_command(self, command, check_health=True):
+        with redis_timer():
+            return super().send_packed_command(command, check_health)
+
+    def read_response(self, *args, **kwargs):
+        with redis_timer():
+            return super().read_response(*args, **kwargs)
+
+
+class InstrumentedConnectionPool(redis.ConnectionPool):
+    def __init__(self, connection_class=InstrumentedConnection, **kwargs):
+        super().__init__(connection_class=connection_class, **kwargs)
+
+
+class InstrumentedAsyncConnection(async_connection.Connection):
+    async def send_command(self, *args, **kwargs):
+        stats = current_stats.get()
+        if stats is not None:
+            stats.redis_count += 1
+        return await super().send_command(*args, **kwargs)
+
+    def pack_commands(self, commands):
+        commands = list(commands)
+        stats = current_stats.get()
+        if stats is not None:
+            stats.redis_count += len(commands)
+        return super().pack_commands(commands)
+
+    async def send_packed_command(self, command, check_health=True):
+        with redis_timer():
+            return await super().send_packed_command(command, check_health)
+
+    async def read_response(self, *args, **kwargs):
+        with redis_timer():
+            return await super().read_response(*args, **kwargs)
+
+
+@contextmanager
+def redis_timer():
+    stats = current_stats.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.redis_time += time.perf_counter() - started
+
+
+@contextmanager
+def smtp_timer():
+    """Time an SMTP exchange, for the current request or as "worker" outside one."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stats = current_stats.get()
+        if stats is not None:
+            stats.smtp_time += elapsed
+        else:
+            registry.add('apartx_smtp_seconds_total', (('view', 'worker'),), elapsed)
+            registry.flush()
+
+
+class MetricsMiddleware:
+    """
+    Record count, latency, SQL, Redis and SMTP time per URL name, and log
+    requests slower than SLOW_REQUEST_THRESHOLD seconds.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        registry.flush()
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.record(request, response, stats, time.perf_counter() - started)
+        if registry.due():
+            await sync_to_async(registry.flush, thread_sensitive=False)()
+        return response
+
+    def record(self, request, response, stats, duration):
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unmatched'
+        labels = (('view', view),)
+        registry.add('apartx_http_requests_total',
+                     labels + (('method', request.method), ('status', response.status_code)))
+        registry.observe('apartx_http_request_duration_seconds', labels, duration)
+        registry.add('apartx_db_queries_total', labels, stats.sql_count)
+        registry.add('apartx_db_query_seconds_total', labels, stats.sql_time)
+        registry.add('apartx_redis_commands_total', labels, stats.redis_count)
+        registry.add('apartx_redis_seconds_total', labels, stats.redis_time)
+        registry.add('apartx_smtp_seconds_total', labels, stats.smtp_time)
+
+        if duration >= settings.SLOW_REQUEST_THRESHOLD:
+            logger.warning(
+                'Slow request: %s %s -> %s in %.3fs (%d SQL queries, %.3fs; %d Redis commands, %.3fs; SMTP %.3fs)',
+                request.method, request.get_full_path(), response.status_code, duration,
+                stats.sql_count, stats.sql_time, stats.redis_count, stats.redis_time, stats.smtp_time)
+
+
+def bucket_label(bucket):
+    return '{}'.format(bucket)
+
+
+def split_le(labels):
+    """``'view="x",le="0.5"'`` -> ``('view="x"', '0.5')``."""
+    rest, _, le = labels.rpartition('le=')
+    return rest.rstrip(','), le.strip('"')
+
+
+def render_histogram(metric, samples):
+    buckets = defaultdict(dict)
+    for labels, value in samples.get(metric + '_bucket', ()):
+        rest, le = split_le(labels)
+        buckets[rest][le] = value
+    sums = dict(samples.get(metric + '_sum', ()))
+    counts = dict(samples.get(metric + '_count', ()))
+
+    lines = []
+    for labels in sorted(set(buckets) | set(counts)):
+        prefix = labels + ',' if labels else ''
+        # Buckets are stored cumulatively; one never hit holds the count of
+        # the bucket below it, which is 0 below the fastest request.
+        cumulative = 0.0
+        for le in [bucket_label(bucket) for bucket in DURATION_BUCKETS] + ['+Inf']:
+            cumulative = buckets[labels].get(le, cumulative)
+            lines.append('{}_bucket{{{}le="{}"}} {}'.format(metric, prefix, le, repr(cumulative)))
+        lines.append('{}_sum{{{}}} {}'.format(metric, labels, repr(sums.get(labels, 0.0))))
+        lines.append('{}_count{{{}}} {}'.format(metric, labels, repr(counts.get(labels, cumulative))))
+    return lines
+
+
+def render():
+    samples = defaultdict(list)
+    for field, value in get_redis_connection("default").hgetall(METRICS_KEY).items():
+        name, labels = field.decode().split('|', 1)
+        samples[name].append((labels, float(value)))
+
+    lines = []
+    for metric, (kind, description) in METRICS.items():
+        names = ([metric + '_bucket', metric + '_sum', metric + '_count'] if kind == 'histogram' else [metric])
+        if not any(name in samples for name in names):
+            continue
+        lines.append('# HELP {} {}'.format(metric, description))
+        lines.append('# TYPE {} {}'.format(metric, kind))
+        if kind == 'histogram':
+            lines.extend(render_histogram(metric, samples))
+            continue
+        for labels, value in sorted(samples[metric]):
+            lines.append('{}{{{}}} {}'.format(metric, labels, repr(value)))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; requires ``Bearer METRICS_TOKEN``, and is closed while that is unset."""
+    expected = 'Bearer {}'.format(settings.METRICS_TOKEN)
+    if not settings.METRICS_TOKEN or not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+        return HttpResponseForbidden()
+    registry.flush(force=True)
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
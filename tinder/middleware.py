@@ -0,0 +1,42 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .authentication import CachedJWTAuthentication
+
+
+@database_sync_to_async
+def get_user(raw_token):
+    authentication = CachedJWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates WebSocket connections with the same SimpleJWT access token
+    as the REST API. Browsers can't set headers on a WebSocket handshake, so
+    the token is also accepted as ``?token=<access>``.
+    """
+
+    async def __call__(self, scope, receive, send):
+        raw_token = self.get_raw_token(scope)
+        user = await get_user(raw_token) if raw_token else AnonymousUser()
+        return await super().__call__(dict(scope, user=user), receive, send)
+
+    def get_raw_token(self, scope):
+        header = dict(scope.get('headers', [])).get(b'authorization')
+        if header:
+            try:
+                return JWTAuthentication().get_raw_token(header)
+            except AuthenticationFailed:
+                return None
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token')
+        return token[0].encode() if token else None
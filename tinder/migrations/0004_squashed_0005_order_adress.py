@@ -0,0 +1,44 @@
+# 0004 and 0005 add Order.adress as a CharField without max_length, which
+# only PostgreSQL can create. They stay as they were for databases that
+# already ran them; fresh databases run this squash instead, which gives the
+# column the max_length that 0012 sets everywhere.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    replaces = [
+        ("tinder", "0004_order_adress_order_adress_link"),
+        ("tinder", "0005_alter_order_adress_alter_order_adress_link"),
+    ]
+
+    dependencies = [
+        ("tinder", "0003_chat_message_messageimage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="adress",
+            field=models.CharField(default="Алалыкина 12", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="adress_link",
+            field=models.URLField(
+                blank=True,
+                default="https://2gis.kz/karaganda/geo/70000001039962960",
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="adress",
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="adress_link",
+            field=models.URLField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0005_alter_order_adress_alter_order_adress_link"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chat",
+            index=models.Index(fields=["customer", "id"], name="chat_customer_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="chat",
+            index=models.Index(fields=["executor", "id"], name="chat_executor_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["timestamp", "id"], name="message_timestamp_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["chat", "timestamp", "id"], name="message_chat_timestamp_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["reviewee", "id"], name="review_reviewee_id_idx"
+            ),
+        ),
+    ]
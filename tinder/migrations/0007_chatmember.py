@@ -0,0 +1,61 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_chat_members(apps, schema_editor):
+    Chat = apps.get_model("tinder", "Chat")
+    ChatMember = apps.get_model("tinder", "ChatMember")
+    members = []
+    for chat in Chat.objects.values("id", "customer_id", "executor_id").iterator():
+        members.append(ChatMember(chat_id=chat["id"], user_id=chat["customer_id"]))
+        members.append(ChatMember(chat_id=chat["id"], user_id=chat["executor_id"]))
+    ChatMember.objects.bulk_create(members, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0006_keyset_pagination_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChatMember",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "chat",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="members",
+                        to="tinder.chat",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chat_memberships",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="chatmember",
+            constraint=models.UniqueConstraint(
+                fields=("user", "chat"), name="chatmember_user_chat_uniq"
+            ),
+        ),
+        migrations.RunPython(create_chat_members, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0007_chatmember"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chatmember",
+            name="read_up_to",
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0009_outgoingemail"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="avatar_variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+import tinder.storage
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0010_customuser_avatar_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha256", models.CharField(max_length=64, unique=True)),
+                ("file", models.CharField(max_length=255)),
+                ("thumbnail", models.CharField(blank=True, max_length=255)),
+                ("size", models.PositiveBigIntegerField(default=0)),
+                ("ref_count", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="messageimage",
+            name="image",
+            field=models.ImageField(
+                storage=tinder.storage.chat_image_storage, upload_to="chat_images/"
+            ),
+        ),
+        migrations.AddField(
+            model_name="messageimage",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="message_images",
+                to="tinder.imageblob",
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:24
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0011_imageblob"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="adress",
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="latitude",
+            field=models.FloatField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(-90),
+                    django.core.validators.MaxValueValidator(90),
+                ],
+            ),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="longitude",
+            field=models.FloatField(
+                blank=True,
+                null=True,
+                validators=[
+                    django.core.validators.MinValueValidator(-180),
+                    django.core.validators.MaxValueValidator(180),
+                ],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["latitude", "longitude"], name="order_lat_lon_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:25
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Greatest, Least
+
+
+def backfill_ratings(apps, schema_editor):
+    CustomUser = apps.get_model("tinder", "CustomUser")
+    Review = apps.get_model("tinder", "Review")
+    # Ratings were not validated before this migration; out-of-range ones
+    # count as the nearest star, as tinder.ratings does from now on.
+    reviews = Review.objects.annotate(stars=Least(Greatest(F("rating"), Value(1)), Value(5)))
+    aggregates = {"rating_sum": Sum("stars"), "rating_count": Count("id")}
+    for star in range(1, 6):
+        aggregates["stars_{}".format(star)] = Count("id", filter=Q(stars=star))
+    for row in reviews.values("reviewee_id").annotate(**aggregates).order_by():
+        CustomUser.objects.filter(pk=row.pop("reviewee_id")).update(**row)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0013_order_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="rating_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="stars_1",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="stars_2",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="stars_3",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="stars_4",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="stars_5",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name="review",
+            name="rating",
+            field=models.IntegerField(
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(5),
+                ]
+            ),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
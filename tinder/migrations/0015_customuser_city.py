@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0014_customuser_rating_aggregates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="city",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
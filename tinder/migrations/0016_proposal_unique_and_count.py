@@ -0,0 +1,39 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:46
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_proposals(apps, schema_editor):
+    Proposal = apps.get_model("tinder", "Proposal")
+    first = Proposal.objects.values("order_id", "maid_id").annotate(first=Min("id")).order_by().values_list("first", flat=True)
+    Proposal.objects.exclude(pk__in=first).delete()
+
+
+def backfill_proposal_counts(apps, schema_editor):
+    Order = apps.get_model("tinder", "Order")
+    Proposal = apps.get_model("tinder", "Proposal")
+    for row in Proposal.objects.values("order_id").annotate(count=Count("id")).order_by():
+        Order.objects.filter(pk=row["order_id"]).update(proposal_count=row["count"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0015_customuser_city"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="proposal_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(remove_duplicate_proposals, migrations.RunPython.noop),
+        migrations.RunPython(backfill_proposal_counts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="proposal",
+            constraint=models.UniqueConstraint(
+                fields=("order", "maid"), name="proposal_order_maid_uniq"
+            ),
+        ),
+    ]
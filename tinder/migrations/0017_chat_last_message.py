@@ -0,0 +1,42 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db.models import OuterRef, Subquery
+
+
+def point_chats_at_last_message(apps, schema_editor):
+    Chat = apps.get_model("tinder", "Chat")
+    Message = apps.get_model("tinder", "Message")
+    newest = Message.objects.filter(chat=OuterRef("pk")).order_by("-id")
+    Chat.objects.filter(pk__in=Message.objects.values("chat_id")).update(
+        last_message=Subquery(newest.values("id")[:1]),
+        last_activity=Subquery(newest.values("timestamp")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0016_proposal_unique_and_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chat",
+            name="last_activity",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="chat",
+            name="last_message",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="tinder.message",
+            ),
+        ),
+        migrations.RunPython(point_chats_at_last_message, migrations.RunPython.noop),
+    ]
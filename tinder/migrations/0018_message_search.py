@@ -0,0 +1,70 @@
+from django.db import migrations
+
+# See tinder.search. Postgres gets a generated tsvector column with a GIN
+# index; SQLite, used in tests, an FTS5 index kept current by triggers.
+#
+# SQLite drops a table's triggers when Django remakes it, which it does for
+# most AlterField/RemoveField operations. A later migration that changes
+# tinder_message must run SQLITE_TRIGGERS again (and the 'rebuild' insert)
+# after its schema change; tinder.tests.test_search checks they exist.
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE tinder_message ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text, ''))) STORED
+    """,
+    "CREATE INDEX message_search_vector_idx ON tinder_message USING GIN (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS message_search_vector_idx",
+    "ALTER TABLE tinder_message DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER tinder_message_fts_insert AFTER INSERT ON tinder_message BEGIN
+        INSERT INTO tinder_message_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER tinder_message_fts_delete AFTER DELETE ON tinder_message BEGIN
+        INSERT INTO tinder_message_fts(tinder_message_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER tinder_message_fts_update AFTER UPDATE OF text ON tinder_message BEGIN
+        INSERT INTO tinder_message_fts(tinder_message_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO tinder_message_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE tinder_message_fts USING fts5(text, content='tinder_message', content_rowid='id')",
+    *SQLITE_TRIGGERS,
+    "INSERT INTO tinder_message_fts(tinder_message_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS tinder_message_fts_insert",
+    "DROP TRIGGER IF EXISTS tinder_message_fts_delete",
+    "DROP TRIGGER IF EXISTS tinder_message_fts_update",
+    "DROP TABLE IF EXISTS tinder_message_fts",
+]
+
+
+def run_for_vendor(postgres, sqlite):
+    def run(apps, schema_editor):
+        statements = {"postgresql": postgres, "sqlite": sqlite}.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0017_chat_last_message"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD),
+                             run_for_vendor(POSTGRES_BACKWARD, SQLITE_BACKWARD)),
+    ]
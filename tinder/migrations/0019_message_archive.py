@@ -0,0 +1,55 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def stamp_completed_orders(apps, schema_editor):
+    # When they were completed isn't recorded; count from now.
+    Order = apps.get_model("tinder", "Order")
+    Order.objects.filter(status="completed").update(completed_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0018_message_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="completed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="ArchivedChat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("segment", models.CharField(max_length=255)),
+                ("offset", models.PositiveBigIntegerField()),
+                ("length", models.PositiveBigIntegerField()),
+                ("message_count", models.PositiveIntegerField()),
+                ("first_message_id", models.BigIntegerField()),
+                ("last_message_id", models.BigIntegerField()),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "chat",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archives",
+                        to="tinder.chat",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(stamp_completed_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.2 on 2026-10-18 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0019_message_archive"),
+    ]
+
+    operations = [
+        # Added without auto_now_add first, so existing reviews stay null
+        # rather than all getting the time of the migration.
+        migrations.AddField(
+            model_name="review",
+            name="created_at",
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="review",
+            name="created_at",
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+    ]
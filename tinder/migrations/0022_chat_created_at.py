@@ -0,0 +1,30 @@
+# Generated by Django 4.2.2 on 2026-10-18 11:27
+
+from django.db import migrations, models
+import django.utils.timezone
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_created_at(apps, schema_editor):
+    # Chats have no record of when they were opened; their first message is
+    # the closest one, and last_activity for chats without messages.
+    Chat = apps.get_model("tinder", "Chat")
+    Message = apps.get_model("tinder", "Message")
+    first = Message.objects.filter(chat=OuterRef("pk")).order_by("id").values("timestamp")[:1]
+    Chat.objects.update(created_at=Coalesce(Subquery(first), F("last_activity")))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0021_outgoingemail_expires_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chat",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tinder", "0022_chat_created_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chat",
+            index=models.Index(
+                fields=["last_activity", "id"], name="chat_last_activity_id_idx"
+            ),
+        ),
+    ]
@@ -1,8 +1,12 @@
-from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from phonenumber_field.modelfields import PhoneNumberField
 from django.conf import settings
 
+from .storage import ContentAddressedStorage, chat_image_storage
+
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, 
@@ -25,20 +29,50 @@ class CustomUserManager(BaseUserManager):
         return superuser
 
 
-class CustomUser(AbstractBaseUser, PermissionsMixin):
+class ProtectedFieldsMixin:
+    """
+    For models whose PROTECTED_FIELDS are only changed by UPDATE queries
+    (counters and pointers kept up to date elsewhere): saving an existing
+    instance leaves those columns out of its UPDATE, so an instance loaded
+    before such an UPDATE doesn't roll it back. A row deleted in the
+    meantime is inserted again with every column, as a plain save() would.
+    """
+    PROTECTED_FIELDS = ()
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if update_fields is None and not self._state.adding:
+            values = [(field, model, value) for field, model, value in values
+                      if field.name not in self.PROTECTED_FIELDS]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+
+class CustomUser(ProtectedFieldsMixin, AbstractBaseUser, PermissionsMixin):
     ROLES = [
     ('Customer', 'Заказчик'),
     ('Executor', 'Исполнитель')
     ]
+    RATING_FIELDS = ('rating_sum', 'rating_count', 'stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5')
+    PROTECTED_FIELDS = RATING_FIELDS
 
     email = models.EmailField(unique=True, blank=False)
     first_name = models.CharField(max_length=30, blank=True, null=True)
     last_name = models.CharField(max_length=30, blank=True, null=True)
     avatar = models.ImageField(upload_to='user/avatar', blank=True, null=True)
+    avatar_variants = models.JSONField(default=dict, blank=True)
     phone_number = PhoneNumberField(unique=True, blank=True, null=True)
+    city = models.CharField(max_length=100, blank=True)
 
     role = models.CharField(choices=ROLES, blank=True, max_length=255)
 
+    # Aggregates of received reviews, kept up to date by tinder.ratings.
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
     is_verified = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
@@ -53,14 +87,14 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     def get_full_name(self):
         return f'{self.first_name} {self.last_name}'
-    
+
     class Meta:
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
         unique_together = ('email',)
 
 
-class Order(models.Model):
+class Order(ProtectedFieldsMixin, models.Model):
     STATUS_CHOICES = [
         ('active', 'Active'),
         ('in_progress', 'In progress'),
@@ -74,26 +108,85 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     deadline = models.DateTimeField()
     adress_link = models.URLField(blank=True, null=True)
-    adress = models.CharField(blank=False, null=False)
+    adress = models.CharField(max_length=255, blank=False, null=False)
+    latitude = models.FloatField(blank=True, null=True,
+                                 validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(blank=True, null=True,
+                                  validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    # Maintained by tinder.proposals so order lists don't count per row.
+    proposal_count = models.PositiveIntegerField(default=0)
+    # When status last became 'completed'; tinder.archive moves the chats
+    # of orders completed long enough ago out of the hot tables.
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    PROTECTED_FIELDS = ('proposal_count',)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='order_lat_lon_idx'),
+            models.Index(fields=['status', 'deadline', 'id'], name='order_status_deadline_idx'),
+            models.Index(fields=['status', 'price', 'id'], name='order_status_price_idx'),
+            models.Index(fields=['customer', 'status'], name='order_customer_status_idx'),
+            models.Index(fields=['executor', 'status'], name='order_executor_status_idx'),
+        ]
 
 
 class Proposal(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='proposals')
     maid = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='proposals')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'maid'], name='proposal_order_maid_uniq'),
+        ]
+
 
 class Review(models.Model):
     reviewer = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='given_reviews')
     reviewee = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='received_reviews')
     review_text = models.TextField()
-    rating = models.IntegerField()
+    rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
+    # Unknown (null) for reviews written before it was added.
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['reviewee', 'id'], name='review_reviewee_id_idx'),
+        ]
 
 
-class Chat(models.Model):
+class Chat(ProtectedFieldsMixin, models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='chats')
     customer = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='customer_chats')
     executor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='executor_chats')
+    created_at = models.DateTimeField(default=timezone.now)
+    # Newest message and when it was sent (or when the chat was opened),
+    # maintained by tinder.inbox.
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_activity = models.DateTimeField(default=timezone.now)
+
+    PROTECTED_FIELDS = ('last_message', 'last_activity')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', 'id'], name='chat_customer_id_idx'),
+            models.Index(fields=['executor', 'id'], name='chat_executor_id_idx'),
+            # The inbox's (-last_activity, -id) keyset order, read backwards.
+            models.Index(fields=['last_activity', 'id'], name='chat_last_activity_id_idx'),
+        ]
+
+
+class ChatMember(models.Model):
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='chat_memberships')
+    # Id of the newest message in the chat this member has read.
+    read_up_to = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'chat'], name='chatmember_user_chat_uniq'),
+        ]
 
 
 class Message(models.Model):
@@ -103,7 +196,93 @@ class Message(models.Model):
     is_read = models.BooleanField(default=False)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='message_timestamp_id_idx'),
+            models.Index(fields=['chat', 'timestamp', 'id'], name='message_chat_timestamp_id_idx'),
+        ]
+
+
+class ImageBlobManager(models.Manager):
+    def lock(self, sha256):
+        """Lock the blob with this digest, if there is one, until the transaction ends."""
+        return list(self.select_for_update().filter(sha256=sha256).values_list('pk', flat=True))
+
+
+class ImageBlob(models.Model):
+    """One stored chat image file, shared by every MessageImage with the same content."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.CharField(max_length=255)
+    thumbnail = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+
+    objects = ImageBlobManager()
+
+    def __str__(self) -> str:
+        return self.file
+
 
 class MessageImage(models.Model):
     message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='chat_images/')
+    image = models.ImageField(upload_to='chat_images/', storage=chat_image_storage)
+    blob = models.ForeignKey(ImageBlob, on_delete=models.PROTECT, null=True, blank=True,
+                             related_name='message_images')
+
+    def save(self, *args, **kwargs):
+        if not self.image or self.image._committed:
+            return super().save(*args, **kwargs)
+        # The storage reuses the file of a blob with the same content. Lock
+        # that blob until the new reference is taken (tinder.images), so it
+        # can't be purged in between.
+        with transaction.atomic():
+            ImageBlob.objects.lock(ContentAddressedStorage.content_digest(self.image))
+            super().save(*args, **kwargs)
+
+
+class ArchivedChat(models.Model):
+    """
+    Where archived messages of a chat are: ``length`` bytes at ``offset`` in
+    the segment file, one gzip member of NDJSON. A chat archived more than
+    once has a row per run.
+    """
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='archives')
+    segment = models.CharField(max_length=255)
+    offset = models.PositiveBigIntegerField()
+    length = models.PositiveBigIntegerField()
+    message_count = models.PositiveIntegerField()
+    first_message_id = models.BigIntegerField()
+    last_message_id = models.BigIntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return '{}@{}'.format(self.segment, self.offset)
+
+
+class OutgoingEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('expired', 'Expired'),
+    ]
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    send_after = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'send_after'], name='outgoingemail_queue_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return '{} -> {}'.format(self.subject, ', '.join(self.to))
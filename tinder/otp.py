@@ -0,0 +1,167 @@
+import secrets
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+
+# One-time codes for registration and login. A code lives in a single record
+# per (purpose, email) together with its expiry and an optional payload.
+# Wrong guesses are counted per (purpose, email), not per code, so asking for
+# a new code doesn't reset them: OTP_MAX_ATTEMPTS of them within OTP_LOCKOUT
+# seconds burn the record and lock the email out of that purpose for
+# OTP_LOCKOUT seconds. Issuing and verifying are one round-trip each.
+
+VALID = 'valid'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+MISSING = 'missing'
+LOCKED = 'locked'
+
+# KEYS: record, lock, failures. ARGV: code, expires at, record ttl, payload, max attempts.
+ISSUE_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 or tonumber(redis.call('GET', KEYS[3]) or 0) >= tonumber(ARGV[5]) then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 'code', ARGV[1], 'expires', ARGV[2])
+if ARGV[4] ~= '' then
+    redis.call('HSET', KEYS[1], 'payload', ARGV[4])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# KEYS: record, lock, failures. ARGV: code, now, max attempts, lockout.
+VERIFY_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return {'locked'}
+end
+local record = redis.call('HMGET', KEYS[1], 'code', 'expires', 'payload')
+if not record[1] then
+    return {'missing'}
+end
+if tonumber(record[2]) < tonumber(ARGV[2]) then
+    return {'expired', record[3]}
+end
+if record[1] ~= ARGV[1] then
+    local failures = redis.call('INCR', KEYS[3])
+    redis.call('EXPIRE', KEYS[3], ARGV[4])
+    if failures >= tonumber(ARGV[3]) then
+        redis.call('DEL', KEYS[1], KEYS[3])
+        redis.call('SET', KEYS[2], 1, 'EX', ARGV[4])
+        return {'locked'}
+    end
+    return {'invalid'}
+end
+redis.call('DEL', KEYS[1], KEYS[3])
+return {'valid', record[3]}
+"""
+
+
+def generate_code():
+    return str(100000 + secrets.randbelow(900000))
+
+
+class RedisOTPStore:
+    def keys(self, purpose, email):
+        return ('otp:{}:{}'.format(purpose, email), 'otp:lock:{}:{}'.format(purpose, email),
+                'otp:fail:{}:{}'.format(purpose, email))
+
+    def issue(self, purpose, email, code, expires, ttl, max_attempts, payload=None):
+        conn = get_redis_connection("default")
+        return bool(conn.eval(ISSUE_SCRIPT, 3, *self.keys(purpose, email), code, expires, ttl, payload or '',
+                              max_attempts))
+
+    def verify(self, purpose, email, code, now, max_attempts, lockout):
+        conn = get_redis_connection("default")
+        result = conn.eval(VERIFY_SCRIPT, 3, *self.keys(purpose, email), code, now, max_attempts, lockout)
+        status = result[0].decode()
+        payload = result[1].decode() if len(result) > 1 and result[1] is not None else None
+        return status, payload
+
+
+class MemoryOTPStore:
+    """Process-local store with the same semantics, for tests and local runs."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = {}
+        self.lockouts = {}
+        # (purpose, email) -> (failed attempts, forgotten at)
+        self.failures = {}
+
+    def failed_attempts(self, key):
+        count, deadline = self.failures.get(key, (0, 0))
+        return count if deadline > time.time() else 0
+
+    def issue(self, purpose, email, code, expires, ttl, max_attempts, payload=None):
+        key = (purpose, email)
+        now = time.time()
+        with self.lock:
+            if self.lockouts.get(key, 0) > now or self.failed_attempts(key) >= max_attempts:
+                return False
+            self.records[key] = {'code': code, 'expires': expires, 'payload': payload, 'deadline': now + ttl}
+            return True
+
+    def verify(self, purpose, email, code, now, max_attempts, lockout):
+        key = (purpose, email)
+        with self.lock:
+            if self.lockouts.get(key, 0) > time.time():
+                return LOCKED, None
+            record = self.records.get(key)
+            if record is None or record['deadline'] <= time.time():
+                self.records.pop(key, None)
+                return MISSING, None
+            if record['expires'] < now:
+                return EXPIRED, record['payload']
+            if record['code'] != code:
+                failures = self.failed_attempts(key) + 1
+                self.failures[key] = (failures, time.time() + lockout)
+                if failures >= max_attempts:
+                    del self.records[key]
+                    del self.failures[key]
+                    self.lockouts[key] = time.time() + lockout
+                    return LOCKED, None
+                return INVALID, None
+            del self.records[key]
+            self.failures.pop(key, None)
+            return VALID, record['payload']
+
+
+def normalize_email(email):
+    # Foo@x.kz and foo@x.kz share one code and one failure count.
+    return email.strip().lower()
+
+
+@lru_cache(maxsize=None)
+def _load_store(path):
+    return import_string(path)()
+
+
+def get_store():
+    return _load_store(settings.OTP_BACKEND)
+
+
+def issue(purpose, email, payload=None, ttl=None):
+    """
+    Issue a new code for ``email``, replacing any earlier one, and return it;
+    None while the email is locked out. ``payload`` is kept until ``ttl``
+    seconds (default OTP_CODE_TTL), even after the code itself expires.
+    """
+    code = generate_code()
+    code_ttl = settings.OTP_CODE_TTL
+    issued = get_store().issue(purpose, normalize_email(email), code, time.time() + code_ttl, ttl or code_ttl,
+                               settings.OTP_MAX_ATTEMPTS, payload)
+    return code if issued else None
+
+
+def verify(purpose, email, code):
+    """
+    Check ``code`` and, if it matches, consume it. Returns ``(status,
+    payload)``; the payload comes with VALID and EXPIRED.
+    """
+    return get_store().verify(purpose, normalize_email(email), str(code).strip(), time.time(),
+                              settings.OTP_MAX_ATTEMPTS, settings.OTP_LOCKOUT)
@@ -0,0 +1,265 @@
+import base64
+import datetime
+import itertools
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds datetimes to milliseconds, which would make
+    # a cursor skip rows that share the truncated timestamp.
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a fixed ordering that ends in a unique field.
+
+    ``?after=<cursor>`` returns the rows that follow the cursor row in
+    ``ordering`` and ``?before=<cursor>`` the rows that precede it. A cursor
+    holds the values of every ordering field of its row, so any page is one
+    range scan over an index on those fields, no matter how deep it is.
+
+    Views may offer other orderings as ``keyset_orderings``, a dict from
+    ``?ordering=`` values to field tuples; each must end in a unique field.
+    """
+    ordering = ('-id',)
+    ordering_query_param = 'ordering'
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 200
+    after_query_param = 'after'
+    before_query_param = 'before'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_rows(list(self.get_page_queryset(queryset, request, view)))
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        Return the lazy, sliced queryset for the requested page. It fetches
+        one extra row, which ``paginate_rows`` uses to detect further pages.
+        """
+        self.request = request
+        self.limit = self.get_page_size(request)
+        ordering = self.get_ordering(request, view)
+        self.fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in ordering]
+        self.descending = [name.startswith('-') for name in ordering]
+
+        after = self.decode_cursor(request, self.after_query_param)
+        before = self.decode_cursor(request, self.before_query_param)
+        self.backwards = before is not None and after is None
+        self.cursor = before if self.backwards else after
+
+        descending = [desc != self.backwards for desc in self.descending]
+        if self.cursor is not None:
+            queryset = queryset.filter(self.get_seek_condition(self.cursor, descending))
+        order_by = [('-' if desc else '') + field.attname for field, desc in zip(self.fields, descending)]
+        return queryset.order_by(*order_by)[:self.limit + 1]
+
+    def paginate_with_rows(self, queryset, get_rows, request, view=None):
+        """
+        ``paginate_queryset`` over ``queryset`` plus instances of the same
+        model held in memory (such as archived messages), merged in the same
+        ordering with the same cursors. ``get_rows(cursor, descending)``
+        returns those rows in page order, ``descending`` giving the direction
+        of each ordering field; only as many as a page can use are taken.
+        """
+        page = list(self.get_page_queryset(queryset, request, view))
+        descending = [desc != self.backwards for desc in self.descending]
+        rows = get_rows(self.cursor, descending)
+        if self.cursor is not None:
+            rows = (row for row in rows if self.row_follows(row, self.cursor, descending))
+        merged = page + list(itertools.islice(rows, self.limit + 1))
+        # Stable sorts, least significant field first.
+        for field, desc in reversed(list(zip(self.fields, descending))):
+            merged.sort(key=lambda row: getattr(row, field.attname), reverse=desc)
+        return self.paginate_rows(merged[:self.limit + 1])
+
+    def row_follows(self, row, values, descending):
+        """The in-memory counterpart of ``get_seek_condition``."""
+        for field, value, desc in zip(self.fields, values, descending):
+            own = getattr(row, field.attname)
+            if own != value:
+                return own < value if desc else own > value
+        return False
+
+    def get_ordering(self, request, view):
+        choices = getattr(view, 'keyset_orderings', None) or {}
+        return choices.get(request.query_params.get(self.ordering_query_param), self.ordering)
+
+    def paginate_rows(self, rows):
+        self.has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if self.backwards:
+            rows.reverse()
+        self.page = rows
+        return rows
+
+    def get_seek_condition(self, values, descending):
+        """
+        ``(f1, f2, ...) > (v1, v2, ...)`` in ordering terms, spelled out as
+        an OR of equal prefixes. The leading bound is repeated on its own so
+        the planner can turn it into an index range.
+        """
+        condition = Q()
+        prefix = {}
+        for field, value, desc in zip(self.fields, values, descending):
+            step = Q(**prefix) & Q(**{'%s__%s' % (field.attname, 'lt' if desc else 'gt'): value})
+            condition = condition | step if condition else step
+            prefix[field.attname] = value
+        bound = Q(**{'%s__%s' % (self.fields[0].attname, 'lte' if descending[0] else 'gte'): values[0]})
+        return bound & condition
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request, param):
+        encoded = request.query_params.get(param)
+        if encoded is None:
+            return None
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if not isinstance(raw, list) or len(raw) != len(self.fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(self.fields, raw)]
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row):
+        values = [getattr(row, field.attname) for field in self.fields]
+        encoded = base64.urlsafe_b64encode(json.dumps(values, cls=CursorEncoder).encode('utf-8'))
+        return encoded.decode('ascii')
+
+    def build_link(self, param, row):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.after_query_param)
+        url = remove_query_param(url, self.before_query_param)
+        return replace_query_param(url, param, self.encode_cursor(row))
+
+    def get_next_link(self):
+        if not self.page or not (self.backwards or self.has_more):
+            return None
+        return self.build_link(self.after_query_param, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.page or not (self.has_more if self.backwards else self.cursor is not None):
+            return None
+        return self.build_link(self.before_query_param, self.page[0])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': param,
+                'required': False,
+                'in': 'query',
+                'description': description,
+                'schema': {'type': schema_type},
+            }
+            for param, description, schema_type in (
+                (self.after_query_param, 'Cursor of the row to continue after.', 'string'),
+                (self.before_query_param, 'Cursor of the row to page back from.', 'string'),
+                (self.page_size_query_param, 'Number of results to return per page.', 'integer'),
+            )
+        ]
+
+
+class SearchPagination(BasePagination):
+    """
+    Limit/offset pages for ranked search results, which have no ordering a
+    cursor could seek on. Offsets past ``max_offset`` aren't served: every
+    page costs the rows before it.
+    """
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    offset_query_param = 'offset'
+    max_offset = 1000
+
+    def get_window(self, request):
+        """``(offset, limit)`` to fetch; the one extra row tells whether a next page exists."""
+        self.request = request
+        try:
+            self.limit = min(max(int(request.query_params[self.page_size_query_param]), 1), self.max_page_size)
+        except (KeyError, ValueError):
+            self.limit = self.page_size
+        try:
+            self.offset = max(int(request.query_params.get(self.offset_query_param, 0)), 0)
+        except ValueError:
+            self.offset = 0
+        if self.offset > self.max_offset:
+            raise NotFound('Offset is past the last page served.')
+        return self.offset, self.limit + 1
+
+    def paginate_rows(self, rows):
+        self.has_more = len(rows) > self.limit
+        self.page = rows[:self.limit]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_more or self.offset + self.limit > self.max_offset:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.offset_query_param,
+                                   self.offset + self.limit)
+
+    def get_previous_link(self):
+        if self.offset == 0:
+            return None
+        url = self.request.build_absolute_uri()
+        previous = max(self.offset - self.limit, 0)
+        if previous == 0:
+            return remove_query_param(url, self.offset_query_param)
+        return replace_query_param(url, self.offset_query_param, previous)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class MessagePagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
+
+
+class InboxPagination(KeysetPagination):
+    ordering = ('-last_activity', '-id')
+
+
+class OrderProposalPagination(KeysetPagination):
+    # Unique within one order, so a page of an order's proposals is a range
+    # scan of the proposal_order_maid_uniq index.
+    ordering = ('maid',)
@@ -0,0 +1,43 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Order, Proposal
+from . import versions
+
+# Order.proposal_count mirrors the number of Proposal rows per order. Single
+# proposals adjust it by one from the model signals; bulk submissions can't
+# tell which rows ON CONFLICT DO NOTHING skipped, so they recount the orders
+# they touched while holding those orders' row locks.
+
+BULK_LIMIT = 100
+
+
+def adjust_count(order_id, delta):
+    Order.objects.filter(pk=order_id).update(proposal_count=F('proposal_count') + delta)
+
+
+def recount(order_ids):
+    counts = (Proposal.objects.filter(order=OuterRef('pk')).order_by()
+              .values('order').annotate(count=Count('id')).values('count'))
+    Order.objects.filter(pk__in=order_ids).update(
+        proposal_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0)))
+
+
+def submit(maid_id, order_ids):
+    """
+    Propose ``maid_id`` on every order in ``order_ids`` in one transaction.
+    Orders the maid already proposed on are left as they are. Returns the ids
+    of the orders that exist; the others are ignored.
+    """
+    with transaction.atomic():
+        # Locked in id order, so concurrent submissions can't deadlock.
+        order_ids = list(Order.objects.select_for_update().filter(pk__in=set(order_ids))
+                         .order_by('pk').values_list('pk', flat=True))
+        Proposal.objects.bulk_create([Proposal(order_id=order_id, maid_id=maid_id) for order_id in order_ids],
+                                     ignore_conflicts=True)
+        recount(order_ids)
+        transaction.on_commit(partial(versions.bump_resource, 'orders'))
+    return order_ids
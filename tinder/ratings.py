@@ -0,0 +1,44 @@
+from django.db.models import F, Value
+from django.db.models.functions import Greatest, Least
+
+from .authentication import invalidate_user
+from .models import CustomUser
+
+STARS = range(1, 6)
+RATING_FIELDS = CustomUser.RATING_FIELDS
+
+# Review.rating is only validated by the serializer, so rows written around
+# it may hold anything. They count as the nearest star everywhere, so adding
+# and removing a review always moves the aggregates by the same amount.
+
+
+def stars(rating):
+    return min(max(rating, STARS[0]), STARS[-1])
+
+
+def stars_expression(field='rating'):
+    """``stars`` as an ORM expression over ``field``."""
+    return Least(Greatest(F(field), Value(STARS[0])), Value(STARS[-1]))
+
+
+def apply_rating(user_id, rating, sign=1):
+    """Add (``sign=1``) or remove (``sign=-1``) one review's rating in a single UPDATE."""
+    rating = stars(rating)
+    field = 'stars_{}'.format(rating)
+    updates = {
+        'rating_sum': F('rating_sum') + sign * rating,
+        'rating_count': F('rating_count') + sign,
+        field: F(field) + sign,
+    }
+    CustomUser.objects.filter(pk=user_id).update(**updates)
+    invalidate_user(user_id)
+
+
+def average(user):
+    if not user.rating_count:
+        return None
+    return round(user.rating_sum / user.rating_count, 2)
+
+
+def histogram(user):
+    return {star: getattr(user, 'stars_{}'.format(star)) for star in STARS}
@@ -0,0 +1,26 @@
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .consumers import user_group
+from .serializers import MessageSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def broadcast_message(message):
+    """
+    Push a newly created message to every participant of its chat. Delivery
+    is best effort: clients that miss it still get it from ``/messages/``.
+    """
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    event = {'type': 'message.created', 'message': MessageSerializer(message).data}
+    chat = message.chat
+    try:
+        for user_id in {chat.customer_id, chat.executor_id}:
+            async_to_sync(layer.group_send)(user_group(user_id), event)
+    except Exception:
+        logger.exception('Failed to broadcast message %s', message.pk)
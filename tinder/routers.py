@@ -0,0 +1,131 @@
+import contextvars
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .authentication import CachedJWTAuthentication
+
+# Read replicas. ReplicaRoutingMiddleware picks one of REPLICA_DATABASES for
+# each GET/HEAD request and ReplicaRouter sends that request's reads to it;
+# everything else (writes, unsafe requests, management commands, WebSocket
+# consumers) uses the primary. A user whose request wrote to the database
+# is pinned to the primary for READ_YOUR_WRITES_WINDOW seconds, so the next
+# page they load shows their change even if the replicas are behind.
+#
+# To try it locally, point SQL_REPLICAS at a copy of a SQLite database:
+#
+#     SQL_ENGINE=django.db.backends.sqlite3 SQL_DATABASE=primary.sqlite3 \
+#     SQL_REPLICAS=replica.sqlite3 python manage.py runserver
+#
+# tinder.tests.test_routers runs against two SQLite databases with
+# --settings=ApartXCleaning.settings_test_replica.
+
+
+class RoutingState:
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+
+# Shared by reference with the threads sync_to_async runs the request on, so
+# a write made there is seen by the middleware.
+current_state = contextvars.ContextVar('db_routing', default=None)
+
+
+def pin_key(user_id):
+    return 'db:pin:{}'.format(user_id)
+
+
+def pin_primary(user_id):
+    """Send ``user_id``'s reads to the primary for READ_YOUR_WRITES_WINDOW seconds."""
+    cache.set(pin_key(user_id), 1, settings.READ_YOUR_WRITES_WINDOW)
+
+
+def read_from_primary():
+    """Send the rest of the current request's reads to the primary."""
+    state = current_state.get()
+    if state is not None:
+        state.replica = None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current_state.get()
+        if state is None or state.replica is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = current_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        user_id = self.get_user_id(request)
+        state = RoutingState()
+        if self.may_use_replica(request) and not (user_id is not None and cache.get(pin_key(user_id))):
+            state.replica = random.choice(settings.REPLICA_DATABASES)
+        token = current_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_state.reset(token)
+        if state.wrote and user_id is not None:
+            pin_primary(user_id)
+        return response
+
+    async def __acall__(self, request):
+        user_id = self.get_user_id(request)
+        state = RoutingState()
+        if self.may_use_replica(request) and not (user_id is not None and await cache.aget(pin_key(user_id))):
+            state.replica = random.choice(settings.REPLICA_DATABASES)
+        token = current_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_state.reset(token)
+        if state.wrote and user_id is not None:
+            await cache.aset(pin_key(user_id), 1, settings.READ_YOUR_WRITES_WINDOW)
+        return response
+
+    def may_use_replica(self, request):
+        # Session-authenticated requests (the admin) always read from the
+        # primary: telling whether they're pinned would cost a session lookup.
+        return (bool(settings.REPLICA_DATABASES) and request.method in SAFE_METHODS
+                and settings.SESSION_COOKIE_NAME not in request.COOKIES)
+
+    def get_user_id(self, request):
+        """The user id in the request's access token, checked without a database query."""
+        authentication = CachedJWTAuthentication()
+        header = authentication.get_header(request)
+        try:
+            raw_token = authentication.get_raw_token(header) if header is not None else None
+            if raw_token is None:
+                return None
+            return authentication.get_user_id(authentication.get_validated_token(raw_token))
+        except (AuthenticationFailed, InvalidToken):
+            return None
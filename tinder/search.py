@@ -0,0 +1,101 @@
+import html
+import re
+
+from django.db import connections, router
+
+from .models import ChatMember, Message
+
+# Full-text search over Message.text. On Postgres the 0018 migration adds a
+# generated tsvector column, tinder_message.search_vector, with a GIN index;
+# on SQLite it adds the FTS5 table tinder_message_fts, kept in step with
+# tinder_message by triggers. Neither is declared on the model, so the ORM
+# never writes them. Other databases fall back to an unranked, unindexed
+# case-insensitive match of every word.
+
+# No stemming: messages mix Russian, Kazakh and English.
+TS_CONFIG = 'simple'
+SNIPPET_WORDS = 12
+# Stand-ins for the highlight tags while the snippet is still raw text.
+START, STOP = '\x02', '\x03'
+HEADLINE_OPTIONS = 'StartSel="{}", StopSel="{}", MinWords={}, MaxWords={}'.format(
+    START, STOP, SNIPPET_WORDS // 2, SNIPPET_WORDS * 2)
+
+POSTGRES_SEARCH = """
+    SELECT page.id, page.rank, ts_headline(%(config)s, page.text, page.query, %(headline)s) AS snippet
+    FROM (
+        SELECT m.id, m.text, q.query, ts_rank(m.search_vector, q.query) AS rank
+        FROM tinder_message m, websearch_to_tsquery(%(config)s, %(query)s) AS q(query)
+        WHERE m.search_vector @@ q.query
+          AND m.chat_id IN (SELECT chat_id FROM tinder_chatmember WHERE user_id = %(user_id)s)
+        ORDER BY rank DESC, m.id DESC
+        LIMIT %(limit)s OFFSET %(offset)s
+    ) AS page
+    ORDER BY page.rank DESC, page.id DESC
+"""
+
+SQLITE_SEARCH = """
+    SELECT m.id, -bm25(tinder_message_fts) AS rank,
+           snippet(tinder_message_fts, 0, %(start)s, %(stop)s, '…', %(words)s) AS snippet
+    FROM tinder_message_fts JOIN tinder_message m ON m.id = tinder_message_fts.rowid
+    WHERE tinder_message_fts MATCH %(query)s
+      AND m.chat_id IN (SELECT chat_id FROM tinder_chatmember WHERE user_id = %(user_id)s)
+    ORDER BY rank DESC, m.id DESC
+    LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+
+def fts5_query(query):
+    # Every word as a quoted string, so user input can't use FTS5 syntax.
+    return ' '.join('"{}"'.format(word.replace('"', '""')) for word in re.findall(r'\w+', query))
+
+
+def search_messages(user_id, query, limit, offset=0):
+    """
+    Messages in ``user_id``'s chats matching ``query``, best match first.
+    Each has ``rank`` and ``snippet``: HTML-escaped text around the matches,
+    with the matched words wrapped in ``<mark>``.
+    """
+    connection = connections[router.db_for_read(Message)]
+    params = {'user_id': user_id, 'limit': limit, 'offset': offset}
+    if connection.vendor == 'postgresql':
+        sql = POSTGRES_SEARCH
+        params.update(config=TS_CONFIG, query=query, headline=HEADLINE_OPTIONS)
+    elif connection.vendor == 'sqlite':
+        query = fts5_query(query)
+        if not query:
+            return []
+        sql = SQLITE_SEARCH
+        params.update(query=query, start=START, stop=STOP, words=SNIPPET_WORDS)
+    else:
+        return fallback_search(connection.alias, user_id, query, limit, offset)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    messages = Message.objects.using(connection.alias).in_bulk([row[0] for row in rows])
+    results = []
+    for message_id, rank, snippet in rows:
+        message = messages.get(message_id)
+        if message is None:
+            continue
+        message.rank = rank
+        message.snippet = html.escape(snippet).replace(START, '<mark>').replace(STOP, '</mark>')
+        results.append(message)
+    return results
+
+
+def fallback_search(alias, user_id, query, limit, offset=0):
+    words = re.findall(r'\w+', query)
+    if not words:
+        return []
+    messages = Message.objects.using(alias).filter(
+        chat_id__in=ChatMember.objects.using(alias).filter(user_id=user_id).values('chat_id'))
+    for word in words:
+        messages = messages.filter(text__icontains=word)
+    pattern = re.compile('|'.join(re.escape(word) for word in words), re.IGNORECASE)
+    results = list(messages.order_by('-id')[offset:offset + limit])
+    for message in results:
+        message.rank = 0.0
+        message.snippet = pattern.sub(lambda match: '<mark>{}</mark>'.format(match.group(0)), html.escape(message.text))
+    return results
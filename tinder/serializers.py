@@ -1,7 +1,16 @@
 from rest_framework import serializers
+from django.core.files.storage import default_storage
 from .models import CustomUser, Order, Proposal, Review, Chat, Message, MessageImage
 from .constants import ROLES
+from . import proposals, ratings, unread
+from .images import variant_urls
 from rest_framework.exceptions import NotFound
+from rest_framework.validators import UniqueTogetherValidator
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import UntypedToken
+from .tokens import RefreshToken, is_blacklisted
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -49,6 +58,31 @@ class LoginConfirmSerializer(serializers.Serializer):
     email = serializers.EmailField()
     code = serializers.CharField()
 
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # A refresh token is good for one rotation; whoever loses the
+            # race to blacklist it gets the same error as a replayed token.
+            if not refresh.rotate():
+                raise TokenError('Token is blacklisted')
+            data['refresh'] = str(refresh)
+
+        return data
+
+
+class TokenVerifySerializer(jwt_serializers.TokenVerifySerializer):
+    def validate(self, attrs):
+        token = UntypedToken(attrs['token'])
+        if api_settings.BLACKLIST_AFTER_ROTATION and is_blacklisted(token.get(api_settings.JTI_CLAIM)):
+            raise serializers.ValidationError('Token is blacklisted')
+        return {}
+
+
 class RoleSelectionSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
@@ -61,26 +95,62 @@ class RoleSelectionSerializer(serializers.ModelSerializer):
 
 
 class CustomUserSerializer(serializers.ModelSerializer):
+    avatar_variants = serializers.SerializerMethodField()
+    rating = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
+
     class Meta:
         model = CustomUser
         fields = '__all__'
+        read_only_fields = ratings.RATING_FIELDS
+        # Not in responses: request.user comes from the auth cache, which
+        # doesn't hold the hash.
+        extra_kwargs = {'password': {'write_only': True}}
+
+    def get_rating(self, obj):
+        return ratings.average(obj)
+
+    def get_rating_histogram(self, obj):
+        return ratings.histogram(obj)
+
+    def get_avatar_variants(self, obj):
+        return variant_urls(obj.avatar_variants, self.context.get('request'))
 
 
 class OrderSerializer(serializers.ModelSerializer):
+    distance = serializers.SerializerMethodField()
+
     class Meta:
         model = Order
         fields = '__all__'
-        read_only_fields = ('customer',)
+        read_only_fields = ('customer', 'proposal_count')
+
+    def get_distance(self, obj):
+        return getattr(obj, 'distance', None)
 
     def create(self, validated_data):
         validated_data['customer'] = self.context['request'].user
         return super().create(validated_data)
 
+    def update(self, instance, validated_data):
+        # Re-locate the order from its new address unless coordinates were sent too.
+        moved = 'adress' in validated_data or 'adress_link' in validated_data
+        if moved and 'latitude' not in validated_data and 'longitude' not in validated_data:
+            validated_data['latitude'] = validated_data['longitude'] = None
+        return super().update(instance, validated_data)
+
 
 class ProposalSerializer(serializers.ModelSerializer):
     class Meta:
         model = Proposal
         fields = '__all__'
+        # DRF doesn't derive this from Meta.constraints.
+        validators = [UniqueTogetherValidator(queryset=Proposal.objects.all(), fields=('order', 'maid'))]
+
+
+class ProposalBulkSerializer(serializers.Serializer):
+    orders = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1,
+                                   max_length=proposals.BULK_LIMIT)
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -90,23 +160,56 @@ class ReviewSerializer(serializers.ModelSerializer):
 
 
 class MessageImageSerializer(serializers.ModelSerializer):
+    thumbnail = serializers.SerializerMethodField()
+
     class Meta:
         model = MessageImage
         fields = '__all__'
+        read_only_fields = ('blob',)
+
+    def get_thumbnail(self, obj):
+        if obj.blob is None or not obj.blob.thumbnail:
+            return None
+        url = default_storage.url(obj.blob.thumbnail)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
 
 class MessageSerializer(serializers.ModelSerializer):
-    images = MessageImageSerializer(many=True)
+    images = MessageImageSerializer(many=True, read_only=True)
     class Meta:
         model = Message
         fields = '__all__'
 
+class MessageSearchResultSerializer(serializers.ModelSerializer):
+    snippet = serializers.CharField(read_only=True)
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Message
+        fields = ('id', 'chat', 'sender', 'timestamp', 'snippet', 'rank')
+
+
+class ChatReadSerializer(serializers.Serializer):
+    message_id = serializers.IntegerField(min_value=1)
+
+
 class ChatSerializer(serializers.ModelSerializer):
     user_id = serializers.IntegerField(write_only=True)
     order_id = serializers.IntegerField(write_only=True)
+    unread_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Chat
-        fields = ('id', 'user_id', 'order_id')
+        fields = ('id', 'user_id', 'order_id', 'unread_count')
+
+    def get_unread_count(self, obj):
+        counts = self.context.get('unread_counts')
+        if counts is not None:
+            return counts.get(obj.pk, 0)
+        request = self.context.get('request')
+        if request is None:
+            return 0
+        return unread.get_count(request.user.pk, obj.pk)
 
     def create(self, validated_data):
         request = self.context.get("request")
@@ -129,3 +232,45 @@ class ChatSerializer(serializers.ModelSerializer):
             return chat
         else:
             raise serializers.ValidationError("Error occurred during chat creation.")
+
+
+class ChatCounterpartSerializer(serializers.ModelSerializer):
+    avatar_variants = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CustomUser
+        fields = ('id', 'first_name', 'last_name', 'avatar', 'avatar_variants')
+
+    def get_avatar_variants(self, obj):
+        return variant_urls(obj.avatar_variants, self.context.get('request'))
+
+
+class ChatOrderSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Order
+        fields = ('id', 'service', 'status', 'price', 'deadline')
+
+
+class LastMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Message
+        fields = ('id', 'sender', 'text', 'is_read', 'timestamp')
+
+
+class InboxSerializer(serializers.ModelSerializer):
+    counterpart = serializers.SerializerMethodField()
+    order = ChatOrderSummarySerializer(read_only=True)
+    last_message = LastMessageSerializer(read_only=True)
+    unread_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Chat
+        fields = ('id', 'counterpart', 'order', 'last_message', 'last_activity', 'unread_count')
+
+    def get_counterpart(self, obj):
+        user_id = self.context['request'].user.pk
+        counterpart = obj.executor if obj.customer_id == user_id else obj.customer
+        return ChatCounterpartSerializer(counterpart, context=self.context).data
+
+    def get_unread_count(self, obj):
+        return self.context['unread_counts'].get(obj.pk, 0)
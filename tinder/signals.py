@@ -0,0 +1,195 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .authentication import invalidate_user
+from .images import acquire_image_blob, release_image_blob
+from .metrics import install_sql_timer
+from .models import (ArchivedChat, Chat, ChatMember, CustomUser, Message, MessageImage, Order, Proposal,
+                     Review)
+from . import archive, geo, inbox, leaderboard, proposals, ratings, unread, versions
+from .realtime import broadcast_message
+
+connection_created.connect(install_sql_timer)
+
+
+@receiver(post_save, sender=Chat)
+def create_chat_members(sender, instance, created, **kwargs):
+    if created:
+        ChatMember.objects.bulk_create([
+            ChatMember(chat=instance, user_id=instance.customer_id),
+            ChatMember(chat=instance, user_id=instance.executor_id),
+        ], ignore_conflicts=True)
+
+
+@receiver(post_save, sender=Message)
+def push_new_message(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(broadcast_message, instance))
+
+
+@receiver(post_save, sender=Message)
+def point_chat_at_message(sender, instance, created, **kwargs):
+    if created:
+        inbox.message_created(instance)
+
+
+@receiver(post_save, sender=Message)
+def count_unread_message(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(unread.message_created, instance.chat_id, instance.sender_id))
+
+
+@receiver(post_delete, sender=Chat)
+def clear_unread_counts(sender, instance, **kwargs):
+    transaction.on_commit(partial(unread.chat_deleted, instance))
+
+
+@receiver(post_save, sender=MessageImage)
+def reference_image_blob(sender, instance, created, **kwargs):
+    if created and instance.image and instance.blob_id is None:
+        acquire_image_blob(instance)
+
+
+@receiver(post_delete, sender=MessageImage)
+def release_image_reference(sender, instance, **kwargs):
+    if instance.blob_id is not None:
+        release_image_blob(instance.blob_id)
+
+
+@receiver(pre_save, sender=Order)
+def locate_order(sender, instance, **kwargs):
+    if instance.latitude is None or instance.longitude is None:
+        coordinates = geo.locate(instance.adress_link, instance.adress)
+        if coordinates:
+            instance.latitude, instance.longitude = coordinates
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    instance._previous_rating = None
+    if instance.pk is not None:
+        instance._previous_rating = (Review.objects.filter(pk=instance.pk)
+                                     .values_list('reviewee_id', 'rating').first())
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_rating', None)
+    if previous == (instance.reviewee_id, instance.rating):
+        return
+    if previous is not None:
+        ratings.apply_rating(previous[0], previous[1], -1)
+        transaction.on_commit(partial(leaderboard.update_rating, previous[0]))
+    ratings.apply_rating(instance.reviewee_id, instance.rating)
+    transaction.on_commit(partial(leaderboard.update_rating, instance.reviewee_id))
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    ratings.apply_rating(instance.reviewee_id, instance.rating, -1)
+    transaction.on_commit(partial(leaderboard.update_rating, instance.reviewee_id))
+
+
+@receiver(pre_save, sender=Proposal)
+def remember_previous_order(sender, instance, **kwargs):
+    instance._previous_order_id = None
+    if instance.pk is not None:
+        instance._previous_order_id = Proposal.objects.filter(pk=instance.pk).values_list('order_id', flat=True).first()
+
+
+@receiver(post_save, sender=Proposal)
+def count_proposal(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_order_id', None)
+    if created or previous != instance.order_id:
+        proposals.adjust_count(instance.order_id, 1)
+        if previous is not None:
+            proposals.adjust_count(previous, -1)
+
+
+@receiver(post_delete, sender=Proposal)
+def uncount_proposal(sender, instance, **kwargs):
+    proposals.adjust_count(instance.order_id, -1)
+
+
+@receiver(pre_save, sender=Order)
+def remember_previous_status(sender, instance, **kwargs):
+    instance._previous_status = None
+    if instance.pk is not None:
+        instance._previous_status = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(pre_save, sender=Order)
+def stamp_completion(sender, instance, **kwargs):
+    if instance.status != 'completed':
+        instance.completed_at = None
+    elif instance.completed_at is None or instance._previous_status != 'completed':
+        instance.completed_at = timezone.now()
+
+
+@receiver(post_save, sender=Order)
+def count_completed_order(sender, instance, **kwargs):
+    was_completed = getattr(instance, '_previous_status', None) == 'completed'
+    if was_completed != (instance.status == 'completed'):
+        transaction.on_commit(partial(leaderboard.order_completed, instance, -1 if was_completed else 1))
+
+
+@receiver(post_delete, sender=Order)
+def uncount_completed_order(sender, instance, **kwargs):
+    if instance.status == 'completed':
+        transaction.on_commit(partial(leaderboard.order_completed, instance, -1))
+
+
+@receiver(post_delete, sender=ArchivedChat)
+def release_archived_images(sender, instance, **kwargs):
+    transaction.on_commit(partial(archive.release_images, instance))
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def drop_cached_user(sender, instance, **kwargs):
+    # Drop it again after commit: a request running meanwhile may have
+    # cached the row as it was before this transaction.
+    invalidate_user(instance.pk)
+    transaction.on_commit(partial(invalidate_user, instance.pk))
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def bump_orders_version(sender, instance, **kwargs):
+    transaction.on_commit(partial(versions.bump_resource, 'orders'))
+
+
+# Orders list their proposal_count.
+@receiver(post_save, sender=Proposal)
+@receiver(post_delete, sender=Proposal)
+def bump_orders_version_for_proposal(sender, instance, **kwargs):
+    transaction.on_commit(partial(versions.bump_resource, 'orders'))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_reviews_version(sender, instance, **kwargs):
+    transaction.on_commit(partial(versions.bump_resource, 'reviews'))
+
+
+@receiver(post_save, sender=Chat)
+@receiver(post_delete, sender=Chat)
+def bump_chats_version(sender, instance, **kwargs):
+    transaction.on_commit(partial(versions.bump_chat, instance, 'chats', 'messages'))
+
+
+# Deleting a message is versioned by MessageDetailView; a post_delete
+# receiver would look up the chat once per row when a chat is deleted.
+@receiver(post_save, sender=Message)
+def bump_messages_version(sender, instance, **kwargs):
+    transaction.on_commit(partial(versions.bump_chat_id, instance.chat_id, 'chats', 'messages'))
+
+
+@receiver(post_save, sender=MessageImage)
+def bump_message_images_version(sender, instance, **kwargs):
+    transaction.on_commit(partial(versions.bump_chat_id, instance.message.chat_id, 'messages'))
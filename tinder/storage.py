@@ -0,0 +1,44 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names every file after the SHA-256 of its
+    content, e.g. ``chat_images/ab/ab12...ef.jpg``. Saving bytes that are
+    already stored writes nothing and returns the existing name.
+    """
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(os.path.dirname(name), self.content_digest(content), os.path.splitext(name)[1])
+        # Only safe while the ImageBlob row of this digest is locked (see
+        # MessageImage.save): otherwise the last reference to the file may
+        # be dropped, and the file deleted, right after this check.
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    @staticmethod
+    def content_digest(content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hashed_name(directory, digest, extension):
+        return os.path.join(directory, digest[:2], digest + extension.lower()).replace('\\', '/')
+
+    @staticmethod
+    def digest(name):
+        return os.path.splitext(os.path.basename(name))[0][:64]
+
+
+def chat_image_storage():
+    return ContentAddressedStorage()
@@ -0,0 +1,93 @@
+import datetime
+import io
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+
+from tinder import archive
+from tinder.models import ArchivedChat, Message, Order
+
+from .utils import RedisTestCase, client_for, make_chat, make_user
+
+
+class ArchiveTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        self.executor = make_user('executor@example.com', 'Executor')
+        self.chat = make_chat(self.customer, self.executor, status='completed')
+        for i in range(7):
+            Message.objects.create(chat=self.chat, sender=self.customer if i % 2 else self.executor,
+                                   text='message {}'.format(i))
+        self.client = client_for(self.customer)
+
+    def pages(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json())
+            url = pages[-1]['next']
+        return pages
+
+    def archive(self):
+        writer = archive.SegmentWriter()
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                return archive.archive_chat(self.chat, writer)
+        finally:
+            writer.close()
+
+    def test_pages_read_the_same_after_archiving(self):
+        url = '/messages/?chat={}&limit=3'.format(self.chat.pk)
+        before = [page['results'] for page in self.pages(url)]
+        self.assertEqual(self.archive(), 7)
+        self.assertFalse(Message.objects.filter(chat=self.chat).exists())
+        self.assertEqual([page['results'] for page in self.pages(url)], before)
+
+    def test_new_messages_merge_with_archived_ones(self):
+        self.archive()
+        Message.objects.create(chat=self.chat, sender=self.customer, text='after')
+        texts = [message['text'] for page in self.pages('/messages/?chat={}&limit=3'.format(self.chat.pk))
+                 for message in page['results']]
+        self.assertEqual(texts, ['after'] + ['message {}'.format(i) for i in reversed(range(7))])
+
+    def test_archive_twice(self):
+        self.archive()
+        Message.objects.create(chat=self.chat, sender=self.customer, text='after')
+        self.assertEqual(self.archive(), 1)
+        self.assertEqual(ArchivedChat.objects.filter(chat=self.chat).count(), 2)
+        self.assertEqual([message.text for message in archive.archived_messages(self.chat.pk)],
+                         ['message {}'.format(i) for i in range(7)] + ['after'])
+
+    def test_pages_read_only_the_parts_they_reach(self):
+        self.archive()
+        Message.objects.create(chat=self.chat, sender=self.customer, text='after')
+        self.archive()
+        older, newer = ArchivedChat.objects.filter(chat=self.chat).order_by('first_message_id')
+        url = '/messages/?chat={}&limit=1'.format(self.chat.pk)
+        with mock.patch('tinder.archive.read_part', wraps=archive.read_part) as read_part:
+            first = self.client.get(url).json()
+            self.assertEqual([message['text'] for message in first['results']], ['after'])
+            self.assertEqual(read_part.call_args_list[0].args[0], newer)
+
+            read_part.reset_mock()
+            cache.clear()
+            second = self.client.get(first['next']).json()
+            self.assertEqual([message['text'] for message in second['results']], ['message 6'])
+            self.assertEqual([call.args[0] for call in read_part.call_args_list], [older])
+
+    def test_outsider_sees_nothing(self):
+        self.archive()
+        outsider = client_for(make_user('outsider@example.com', 'Executor'))
+        self.assertEqual(outsider.get('/messages/?chat={}'.format(self.chat.pk)).json()['results'], [])
+
+    def test_command_archives_only_old_completed_orders(self):
+        recent = make_chat(self.customer, self.executor, status='completed')
+        Message.objects.create(chat=recent, sender=self.customer, text='recent')
+        Order.objects.filter(pk=self.chat.order_id).update(completed_at=timezone.now() - datetime.timedelta(days=100))
+        call_command('archive_messages', days=90, stdout=io.StringIO())
+        self.assertEqual(list(ArchivedChat.objects.values_list('chat_id', flat=True)), [self.chat.pk])
+        self.assertTrue(Message.objects.filter(chat=recent).exists())
@@ -0,0 +1,58 @@
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient
+from rest_framework import permissions
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tinder.views import OrderListView, UserProfileView
+
+from .utils import RedisTestCase, make_order, make_user
+
+
+class DenyAll(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return False
+
+
+class AsyncViewTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        make_order(self.customer)
+        self.headers = {'Authorization': 'Bearer {}'.format(AccessToken.for_user(self.customer))}
+
+    async def test_json_matches_the_sync_view(self):
+        response = await AsyncClient().get('/orders/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('Accept', response['Vary'])
+        self.assertIn('Authorization', response['Vary'])
+        self.assertEqual(response.content, (await self.sync_get(OrderListView, '/orders/')).content)
+
+    async def test_profile_matches_the_sync_view(self):
+        sync_response = await self.sync_get(UserProfileView, '/profile/')  # caches the user
+        response = await AsyncClient().get('/profile/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, sync_response.content)
+
+    async def sync_get(self, view_class, path):
+        request = APIRequestFactory().get(path, HTTP_AUTHORIZATION=self.headers['Authorization'])
+        response = await sync_to_async(view_class.as_view())(request)
+        return response.render()
+
+    async def test_other_renderers_go_to_the_sync_view(self):
+        response = await AsyncClient().get('/orders/', headers=dict(self.headers, Accept='text/html'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+    async def test_permission_classes_are_checked(self):
+        with mock.patch.object(OrderListView, 'permission_classes', [DenyAll]):
+            response = await AsyncClient().get('/orders/', headers=self.headers)
+        self.assertEqual(response.status_code, 403)
+
+    async def test_missing_token_is_unauthorized(self):
+        response = await AsyncClient().get('/orders/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
@@ -0,0 +1,35 @@
+from django.core.cache import cache
+
+from tinder.authentication import user_cache_key
+from tinder.models import CustomUser
+
+from .utils import RedisTestCase, client_for, make_user
+
+
+class CachedAuthenticationTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('customer@example.com')
+        self.client = client_for(self.user)
+
+    def test_cache_leaves_out_the_password(self):
+        response = self.client.get('/select-role/')
+        self.assertEqual(response.status_code, 200)
+        cached = cache.get(user_cache_key(self.user.pk))
+        self.assertEqual(cached['email'], 'customer@example.com')
+        self.assertNotIn('password', cached)
+        self.assertNotIn('password', self.client.get('/profile/').json())
+
+    def test_cached_user_is_authenticated_without_a_query(self):
+        self.client.get('/select-role/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/proposals/bulk/')
+        self.assertEqual(response.status_code, 405)
+
+    def test_update_does_not_write_back_cached_fields(self):
+        self.client.get('/select-role/')
+        CustomUser.objects.filter(pk=self.user.pk).update(rating_sum=9, rating_count=2)
+        response = self.client.patch('/select-role/', {'role': 'Executor'})
+        self.assertEqual(response.status_code, 200)
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual((user.role, user.rating_sum, user.rating_count), ('Executor', 9, 2))
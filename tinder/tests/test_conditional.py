@@ -0,0 +1,62 @@
+from django_redis import get_redis_connection
+
+from tinder.models import Message
+
+from .utils import RedisTestCase, client_for, make_chat, make_order, make_user
+
+
+class ConditionalListTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        self.executor = make_user('executor@example.com', 'Executor')
+        self.client = client_for(self.customer)
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get('/reviews/')
+        self.assertEqual(response.status_code, 200)
+        repeated = self.client.get('/reviews/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeated.status_code, 304)
+        self.assertEqual(repeated['ETag'], response['ETag'])
+
+    def test_write_changes_the_etag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_order(self.customer)
+        etag = self.client.get('/orders/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            make_order(self.customer)
+        response = self.client.get('/orders/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_per_user_versions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            chat = make_chat(self.customer, self.executor)
+        outsider = client_for(make_user('outsider@example.com', 'Executor'))
+        etags = [self.client.get('/messages/')['ETag'], outsider.get('/messages/')['ETag']]
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(chat=chat, sender=self.executor, text='hello')
+        self.assertEqual(self.client.get('/messages/', HTTP_IF_NONE_MATCH=etags[0]).status_code, 200)
+        self.assertEqual(outsider.get('/messages/', HTTP_IF_NONE_MATCH=etags[1]).status_code, 304)
+
+    def test_etag_depends_on_the_user(self):
+        etag = self.client.get('/reviews/')['ETag']
+        other = client_for(self.executor)
+        self.assertEqual(other.get('/reviews/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_from_before_a_redis_flush_does_not_match(self):
+        etag = self.client.get('/reviews/')['ETag']
+        get_redis_connection("default").flushall()
+        self.assertEqual(self.client.get('/reviews/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_write_in_the_same_second_is_not_hidden(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_order(self.customer)
+        first = self.client.get('/orders/')
+        self.assertFalse(first.has_header('Last-Modified'))
+        with self.captureOnCommitCallbacks(execute=True):
+            make_order(self.customer)
+        response = self.client.get('/orders/', HTTP_IF_NONE_MATCH=first['ETag'],
+                                   HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,61 @@
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ApartXCleaning.asgi import application
+from tinder.models import Message
+
+from .utils import RedisTestCase, make_chat, make_user
+
+
+class MessageConsumerTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        self.executor = make_user('executor@example.com', 'Executor')
+        self.chat = make_chat(self.customer, self.executor)
+        async_to_sync(get_channel_layer().flush)()
+
+    def connect(self, path='/ws/messages/', headers=None):
+        return WebsocketCommunicator(application, path, headers=headers)
+
+    def send_message(self, text):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(chat=self.chat, sender=self.customer, text=text)
+
+    async def test_member_receives_new_messages(self):
+        token = str(AccessToken.for_user(self.executor))
+        communicator = self.connect(headers=[(b'authorization', 'Bearer {}'.format(token).encode())])
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        message = await sync_to_async(self.send_message)('hello')
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['type'], 'message.created')
+        self.assertEqual(event['message']['id'], message.pk)
+        self.assertEqual(event['message']['text'], 'hello')
+        await communicator.disconnect()
+
+    async def test_token_in_query_string(self):
+        communicator = self.connect('/ws/messages/?token={}'.format(AccessToken.for_user(self.customer)))
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+    async def test_missing_or_bad_token_is_rejected(self):
+        for communicator in [self.connect(), self.connect('/ws/messages/?token=garbage'),
+                             self.connect(headers=[(b'authorization', b'Bearer garbage')])]:
+            connected, code = await communicator.connect()
+            self.assertFalse(connected)
+            self.assertEqual(code, 4401)
+
+    async def test_non_member_gets_no_events(self):
+        outsider = await sync_to_async(make_user)('outsider@example.com', 'Executor')
+        communicator = self.connect('/ws/messages/?token={}'.format(AccessToken.for_user(outsider)))
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await sync_to_async(self.send_message)('hello')
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
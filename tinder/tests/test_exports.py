@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from django.test import AsyncClient, SimpleTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tinder.exports import Encoder
+from tinder.models import Message
+
+from .utils import RedisTestCase, client_for, make_chat, make_order, make_user
+
+
+class CsvCellTests(SimpleTestCase):
+    def test_formula_prefixes_are_escaped(self):
+        encoder = Encoder(('text',), 'csv')
+        for text in ('=1+1', '+1', '-1', '@SUM(A1)', '\tcmd', '\rcmd'):
+            self.assertTrue(encoder.encode([(text,)]).lstrip('"').startswith("'"), repr(text))
+        self.assertEqual(encoder.encode([('hello',)]), 'hello\r\n')
+
+
+class ExportViewTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = make_user('admin@example.com')
+        self.admin.is_staff = True
+        self.admin.save()
+        self.customer = make_user('customer@example.com')
+        chat = make_chat(self.customer, make_user('executor@example.com', 'Executor'))
+        Message.objects.create(chat=chat, sender=self.customer, text='hello')
+
+    def get(self, path, **params):
+        response = client_for(self.admin).get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_wsgi_streams_synchronously(self):
+        response = client_for(self.admin).get('/exports/messages.ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.is_async)
+        self.assertIn('"text": "hello"', b''.join(response.streaming_content).decode())
+
+    async def test_asgi_streams_asynchronously(self):
+        headers = {'Authorization': 'Bearer {}'.format(AccessToken.for_user(self.admin))}
+        response = await AsyncClient().get('/exports/messages.ndjson', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertIn('"text": "hello"', b''.join([chunk async for chunk in response.streaming_content]).decode())
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_csv_spans_chunks(self):
+        orders = [make_order(self.customer, service='Order {}'.format(number)) for number in range(4)]
+        response = client_for(self.admin).get('/exports/orders.csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="orders.csv"')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        # make_chat's order comes first.
+        self.assertEqual([int(row['id']) for row in rows[1:]], [order.pk for order in orders])
+        self.assertEqual(rows[-1]['service'], 'Order 3')
+        self.assertEqual(rows[-1]['price'], '100.00')
+
+    def test_ndjson_rows(self):
+        lines = self.get('/exports/messages.ndjson').splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual(set(row), {'id', 'chat_id', 'sender_id', 'text', 'is_read', 'timestamp'})
+        self.assertEqual((row['sender_id'], row['is_read']), (self.customer.pk, False))
+
+    def test_since_and_until(self):
+        def deadline(day):
+            return datetime(2030, 1, day, 12, tzinfo=timezone.utc)
+
+        orders = [make_order(self.customer, deadline=deadline(day)) for day in (1, 2, 3)]
+        lines = self.get('/exports/orders.ndjson', since='2030-01-02', until='2030-01-03').splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [orders[1].pk])
+
+    def test_errors(self):
+        client = client_for(self.admin)
+        self.assertEqual(client.get('/exports/users.csv').status_code, 404)
+        self.assertEqual(client.get('/exports/orders.xml').status_code, 404)
+        self.assertEqual(client.get('/exports/orders.csv', {'since': 'yesterday'}).status_code, 400)
+        self.assertEqual(client_for(self.customer).get('/exports/orders.csv').status_code, 403)
@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from tinder.models import Review
+
+from .utils import RedisTestCase, client_for, make_order, make_user
+
+
+class OrderFilterTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        self.other_customer = make_user('other@example.com')
+        self.executor = make_user('executor@example.com', 'Executor')
+        now = timezone.now()
+        self.soon = make_order(self.customer, price=50, deadline=now + timedelta(days=1), service='Window cleaning')
+        self.later = make_order(self.customer, price=150, deadline=now + timedelta(days=3), status='in_progress',
+                                executor=self.executor)
+        self.latest = make_order(self.other_customer, price=100, deadline=now + timedelta(days=5),
+                                 status='completed', executor=self.executor, service='Laundry')
+        self.client = client_for(self.executor)
+
+    def ids(self, query):
+        response = self.client.get('/orders/', query)
+        self.assertEqual(response.status_code, 200)
+        return [order['id'] for order in response.json()['results']]
+
+    def test_status(self):
+        self.assertEqual(sorted(self.ids({'status': 'active'})), [self.soon.pk])
+        self.assertEqual(sorted(self.ids({'status__in': 'active,completed'})), [self.soon.pk, self.latest.pk])
+
+    def test_ranges(self):
+        self.assertEqual(sorted(self.ids({'price__gte': 100})), [self.later.pk, self.latest.pk])
+        self.assertEqual(sorted(self.ids({'price__gte': 60, 'price__lte': 120})), [self.latest.pk])
+        deadline = (timezone.now() + timedelta(days=2)).isoformat()
+        self.assertEqual(sorted(self.ids({'deadline__lte': deadline})), [self.soon.pk])
+        self.assertEqual(sorted(self.ids({'deadline__gte': deadline})), [self.later.pk, self.latest.pk])
+
+    def test_participants(self):
+        self.assertEqual(sorted(self.ids({'customer': self.customer.pk})), [self.soon.pk, self.later.pk])
+        self.assertEqual(sorted(self.ids({'executor': self.executor.pk})), [self.later.pk, self.latest.pk])
+        self.assertEqual(self.ids({'executor__isnull': 'true'}), [self.soon.pk])
+
+    def test_search(self):
+        self.assertEqual(sorted(self.ids({'search': 'cleaning'})), [self.soon.pk, self.later.pk])
+        self.assertEqual(self.ids({'search': 'laundry'}), [self.latest.pk])
+
+    def test_orderings(self):
+        self.assertEqual(self.ids({'ordering': 'price'}), [self.soon.pk, self.latest.pk, self.later.pk])
+        self.assertEqual(self.ids({'ordering': '-price'}), [self.later.pk, self.latest.pk, self.soon.pk])
+        self.assertEqual(self.ids({'ordering': 'deadline'}), [self.soon.pk, self.later.pk, self.latest.pk])
+        self.assertEqual(self.ids({'ordering': '-deadline', 'status': 'in_progress'}), [self.later.pk])
+
+    def test_ordering_pages_follow_the_ordering(self):
+        response = self.client.get('/orders/', {'ordering': 'price', 'limit': 2})
+        self.assertEqual([order['id'] for order in response.json()['results']], [self.soon.pk, self.latest.pk])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([order['id'] for order in response.json()['results']], [self.later.pk])
+
+    def test_invalid_filter_is_rejected(self):
+        self.assertEqual(self.client.get('/orders/', {'price__gte': 'cheap'}).status_code, 400)
+        self.assertEqual(self.client.get('/orders/', {'near': 'here'}).status_code, 400)
+
+
+class ReviewFilterTests(RedisTestCase):
+    def test_user_id(self):
+        customer = make_user('customer@example.com')
+        executors = [make_user('first@example.com', 'Executor'), make_user('second@example.com', 'Executor')]
+        order = make_order(customer)
+        reviews = [Review.objects.create(reviewer=customer, reviewee=executor, order=order, review_text='ok',
+                                         rating=5) for executor in executors]
+        response = client_for(customer).get('/reviews/', {'user_id': executors[1].pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([review['id'] for review in response.json()['results']], [reviews[1].pk])
@@ -0,0 +1,30 @@
+from django.test import override_settings
+
+from .utils import RedisTestCase, make_order, make_user
+
+
+def failing_geocoder(address):
+    raise TimeoutError('geocoder did not answer')
+
+
+def fixed_geocoder(address):
+    return 43.2, 76.9
+
+
+class LocateOrderTests(RedisTestCase):
+    def setUp(self):
+        self.customer = make_user('customer@example.com')
+
+    @override_settings(ORDER_GEOCODER='tinder.tests.test_geo.failing_geocoder')
+    def test_failing_geocoder_does_not_break_order_creation(self):
+        with self.assertLogs('tinder.geo', 'ERROR'):
+            order = make_order(self.customer)
+        order.refresh_from_db()
+        self.assertIsNone(order.latitude)
+        self.assertIsNone(order.longitude)
+
+    @override_settings(ORDER_GEOCODER='tinder.tests.test_geo.fixed_geocoder')
+    def test_geocoder_fills_missing_coordinates(self):
+        order = make_order(self.customer)
+        order.refresh_from_db()
+        self.assertEqual((order.latitude, order.longitude), (43.2, 76.9))
@@ -0,0 +1,115 @@
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from tinder.images import build_avatar_variants, build_blob_thumbnail
+from tinder.models import CustomUser, ImageBlob, Message, MessageImage
+from tinder.storage import chat_image_storage
+
+from .utils import RedisTestCase, client_for, make_chat, make_user, png
+
+
+class ImageBlobTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        self.chat = make_chat(self.customer, make_user('executor@example.com', 'Executor'))
+        self.message = Message.objects.create(chat=self.chat, sender=self.customer, text='photos')
+
+    def attach(self, color=(0, 0, 0)):
+        return MessageImage.objects.create(message=self.message, image=png(color))
+
+    def test_same_content_shares_one_blob(self):
+        with self.captureOnCommitCallbacks():
+            first, second = self.attach(), self.attach()
+            other = self.attach((255, 255, 255))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertNotEqual(first.blob_id, other.blob_id)
+        self.assertEqual(ImageBlob.objects.get(pk=first.blob_id).ref_count, 2)
+
+    def test_file_goes_with_the_last_reference(self):
+        with self.captureOnCommitCallbacks():
+            first, second = self.attach(), self.attach()
+        name, blob_id = first.image.name, first.blob_id
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(ImageBlob.objects.get(pk=blob_id).ref_count, 1)
+        self.assertTrue(chat_image_storage().exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(ImageBlob.objects.filter(pk=blob_id).exists())
+        self.assertFalse(chat_image_storage().exists(name))
+
+    def test_thumbnail(self):
+        with self.captureOnCommitCallbacks():
+            image = self.attach()
+        build_blob_thumbnail(image.blob_id)
+        thumbnail = ImageBlob.objects.get(pk=image.blob_id).thumbnail
+        self.assertTrue(thumbnail)
+        self.assertTrue(default_storage.exists(thumbnail))
+
+    def test_thumbnail_makes_message_lists_stale(self):
+        with self.captureOnCommitCallbacks():
+            image = self.attach()
+        client = client_for(self.customer)
+        response = client.get('/messages/')
+        self.assertIsNone(response.json()['results'][0]['images'][0]['thumbnail'])
+        build_blob_thumbnail(image.blob_id)
+        response = client.get('/messages/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['results'][0]['images'][0]['thumbnail'])
+
+    def test_upload_before_purge_keeps_the_file(self):
+        with self.captureOnCommitCallbacks():
+            image = self.attach()
+        name, blob_id = image.image.name, image.blob_id
+        with self.captureOnCommitCallbacks() as purge:
+            image.delete()
+        self.assertEqual(ImageBlob.objects.get(pk=blob_id).ref_count, 0)
+        # The same content is uploaded again before the purge runs.
+        with self.captureOnCommitCallbacks():
+            again = self.attach()
+        for callback in purge:
+            callback()
+        self.assertEqual(again.blob_id, blob_id)
+        self.assertEqual(ImageBlob.objects.get(pk=blob_id).ref_count, 1)
+        self.assertTrue(chat_image_storage().exists(name))
+
+
+class AvatarVariantTests(RedisTestCase):
+    def upload(self, email, color, name):
+        user = make_user(email)
+        user.avatar = png(color, name)
+        user.save()
+        build_avatar_variants(user.pk)
+        return CustomUser.objects.get(pk=user.pk).avatar_variants
+
+    def color(self, name):
+        with default_storage.open(name) as f:
+            return Image.open(f).convert('RGB').getpixel((0, 0))
+
+    def test_same_filename_from_two_users(self):
+        red = self.upload('red@example.com', (255, 0, 0), 'photo.jpg')
+        blue = self.upload('blue@example.com', (0, 0, 255), 'photo.png')
+        self.assertTrue(set(red.values()).isdisjoint(blue.values()))
+        for name in red.values():
+            self.assertGreater(self.color(name)[0], 200)
+        for name in blue.values():
+            self.assertGreater(self.color(name)[2], 200)
+
+    def test_new_avatar_replaces_only_own_variants(self):
+        other = self.upload('other@example.com', (0, 255, 0), 'photo.png')
+        user = make_user('user@example.com')
+        user.avatar = png((255, 0, 0), 'photo.png')
+        user.save()
+        build_avatar_variants(user.pk)
+        user = CustomUser.objects.get(pk=user.pk)
+        old = user.avatar_variants
+
+        user.avatar = png((0, 0, 255), 'photo.png')
+        user.save()
+        build_avatar_variants(user.pk)
+        new = CustomUser.objects.get(pk=user.pk).avatar_variants
+        self.assertTrue(all(default_storage.exists(name) for name in new.values()))
+        self.assertFalse(any(default_storage.exists(name) for name in old.values()))
+        self.assertTrue(all(default_storage.exists(name) for name in other.values()))
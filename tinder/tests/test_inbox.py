@@ -0,0 +1,35 @@
+from tinder.models import Chat, Message
+
+from .utils import RedisTestCase, client_for, make_chat, make_user
+
+
+class InboxTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        self.chat = make_chat(self.customer, make_user('executor@example.com', 'Executor'))
+        self.client = client_for(self.customer)
+
+    def send(self, text):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Message.objects.create(chat=self.chat, sender=self.customer, text=text)
+
+    def delete(self, message):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete('/messages/{}/'.format(message.pk))
+        self.assertEqual(response.status_code, 204)
+        return Chat.objects.get(pk=self.chat.pk)
+
+    def test_deleting_last_message_moves_activity_back(self):
+        first = self.send('first')
+        last = self.send('last')
+        self.assertEqual(Chat.objects.get(pk=self.chat.pk).last_activity, last.timestamp)
+
+        chat = self.delete(last)
+        self.assertEqual((chat.last_message_id, chat.last_activity), (first.pk, first.timestamp))
+
+    def test_deleting_only_message_falls_back_to_chat_creation(self):
+        message = self.send('only')
+        chat = self.delete(message)
+        self.assertIsNone(chat.last_message_id)
+        self.assertEqual(chat.last_activity, self.chat.created_at)
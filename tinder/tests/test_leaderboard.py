@@ -0,0 +1,102 @@
+from django_redis import get_redis_connection
+
+from tinder import leaderboard
+from tinder.models import CustomUser, Review
+
+from .utils import RedisTestCase, client_for, make_order, make_user
+
+
+class LeaderboardTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = self.make_user('customer@example.com', 'Customer', 'Almaty')
+        self.first = self.make_user('first@example.com', 'Executor', 'Almaty')
+        self.second = self.make_user('second@example.com', 'Executor', ' ASTANA')
+        self.third = self.make_user('third@example.com', 'Executor', 'almaty ')
+        self.redis = get_redis_connection("default")
+
+    def make_user(self, email, role, city):
+        user = make_user(email, role)
+        CustomUser.objects.filter(pk=user.pk).update(city=city)
+        return CustomUser.objects.get(pk=user.pk)
+
+    def complete(self, executor, count=1):
+        orders = []
+        for _ in range(count):
+            with self.captureOnCommitCallbacks(execute=True):
+                orders.append(make_order(self.customer, executor=executor, status='completed'))
+        return orders
+
+    def score(self, key, user):
+        return self.redis.zscore(key, user.pk)
+
+    def test_keys(self):
+        self.assertEqual(leaderboard.leaderboard_key('Executor', 'rating'), 'leaderboard:Executor:rating')
+        self.assertEqual(leaderboard.leaderboard_key('Executor', 'rating', ' Almaty '),
+                         'leaderboard:Executor:rating:almaty')
+
+    def test_missing_board_is_rebuilt_from_the_database(self):
+        self.complete(self.first, 2)
+        self.complete(self.second, 3)
+        self.complete(self.third)
+        self.redis.flushall()
+
+        self.assertEqual(leaderboard.top('Executor', 'completed_orders'),
+                         [self.second.pk, self.first.pk, self.third.pk])
+        self.assertEqual(self.score('leaderboard:Executor:completed_orders', self.second), 3)
+        self.assertEqual(leaderboard.top('Customer', 'completed_orders'), [self.customer.pk])
+
+    def test_city_boards(self):
+        self.complete(self.first, 2)
+        self.complete(self.second, 3)
+        self.complete(self.third)
+        self.assertEqual(leaderboard.top('Executor', 'completed_orders', 'ALMATY'), [self.first.pk, self.third.pk])
+        self.assertEqual(leaderboard.top('Executor', 'completed_orders', 'astana'), [self.second.pk])
+        self.assertEqual(leaderboard.top('Executor', 'completed_orders', 'Shymkent'), [])
+
+    def test_rating_board(self):
+        order = make_order(self.customer)
+        for executor, rating in [(self.first, 3), (self.third, 5)]:
+            with self.captureOnCommitCallbacks(execute=True):
+                Review.objects.create(reviewer=self.customer, reviewee=executor, order=order,
+                                      review_text='ok', rating=rating)
+        self.assertEqual(leaderboard.top('Executor', 'rating'), [self.third.pk, self.first.pk])
+
+    def test_order_completed_and_undone(self):
+        self.complete(self.third)
+        for role, city in [('Executor', None), ('Executor', 'Almaty'), ('Customer', None)]:
+            leaderboard.top(role, 'completed_orders', city)
+        orders = self.complete(self.first, 2)
+        key = 'leaderboard:Executor:completed_orders'
+        self.assertEqual(self.score(key, self.first), 2)
+        self.assertEqual(self.score(key + ':almaty', self.first), 2)
+        self.assertEqual(self.score('leaderboard:Customer:completed_orders', self.customer), 3)
+
+        orders[0].status = 'active'
+        with self.captureOnCommitCallbacks(execute=True):
+            orders[0].save()
+        self.assertEqual(self.score(key, self.first), 1)
+
+        orders[0].status = 'completed'
+        with self.captureOnCommitCallbacks(execute=True):
+            orders[0].save()
+        self.assertEqual(self.score(key, self.first), 2)
+
+        # Dropping to zero takes the user off the board, as a rebuild would.
+        with self.captureOnCommitCallbacks(execute=True):
+            orders[0].delete()
+            orders[1].status = 'active'
+            orders[1].save()
+        self.assertIsNone(self.score(key, self.first))
+        self.assertEqual(leaderboard.top('Executor', 'completed_orders'), [self.third.pk])
+
+    def test_updates_skip_missing_boards(self):
+        self.complete(self.first)
+        self.assertFalse(self.redis.exists('leaderboard:Executor:completed_orders'))
+
+    def test_user_list_ordering(self):
+        self.complete(self.first)
+        self.complete(self.third, 2)
+        response = client_for(self.customer).get('/users/', {'ordering': 'completed_orders', 'city': 'Almaty'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['id'] for user in response.json()], [self.third.pk, self.first.pk])
@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection as db_connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from tinder.mail import queue_mail, send_queued_mail
+from tinder.models import OutgoingEmail
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('SMTP is down')
+
+
+class OutsideTransactionBackend(EmailBackend):
+    # The atomic blocks TestCase itself opens; the worker must not add one.
+    test_depth = None
+
+    def send_messages(self, messages):
+        assert len(db_connection.atomic_blocks) == self.test_depth, 'sent while holding the outbox lock'
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_OUTBOX_RETRY_DELAY=30, EMAIL_OUTBOX_MAX_ATTEMPTS=5)
+class OutboxTests(TestCase):
+    def send(self, backend='django.core.mail.backends.locmem.EmailBackend'):
+        return send_queued_mail(get_connection(backend))
+
+    def test_sent_email_loses_its_body(self):
+        email = queue_mail('Login code', 'Your login code is 123456', ['user@example.com'])
+        OutsideTransactionBackend.test_depth = len(db_connection.atomic_blocks)
+        self.assertEqual(self.send('tinder.tests.test_mail.OutsideTransactionBackend'), 1)
+        self.assertEqual(mail.outbox[0].body, 'Your login code is 123456')
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.body), ('sent', ''))
+
+    def test_expired_email_is_not_sent(self):
+        email = queue_mail('Login code', 'Your login code is 123456', ['user@example.com'], expires_in=120)
+        OutgoingEmail.objects.filter(pk=email.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.send(), 0)
+        self.assertEqual(mail.outbox, [])
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.body), ('expired', ''))
+
+    def test_retry_past_expiry_gives_up(self):
+        email = queue_mail('Login code', 'Your login code is 123456', ['user@example.com'], expires_in=120)
+        for attempts, status in [(1, 'pending'), (2, 'pending'), (3, 'expired')]:
+            OutgoingEmail.objects.filter(pk=email.pk).update(send_after=timezone.now())
+            self.send('tinder.tests.test_mail.FailingBackend')
+            email.refresh_from_db()
+            self.assertEqual((email.attempts, email.status), (attempts, status))
+        self.assertEqual(email.body, '')
+
+    def test_claimed_email_is_not_sent_twice(self):
+        queue_mail('Hello', 'Hi', ['user@example.com'])
+        self.assertEqual(self.send(), 1)
+        self.assertEqual(self.send(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_lapsed_claim_is_picked_up_again(self):
+        email = queue_mail('Hello', 'Hi', ['user@example.com'])
+        OutgoingEmail.objects.filter(pk=email.pk).update(status='sending',
+                                                         send_after=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.send(), 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'sent')
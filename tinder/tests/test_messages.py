@@ -0,0 +1,60 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from tinder.models import ChatMember, Message, MessageImage
+
+from .utils import RedisTestCase, client_for, make_chat, make_user, png
+
+
+class MessageParticipantTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        self.executor = make_user('executor@example.com', 'Executor')
+        self.outsider = make_user('outsider@example.com', 'Executor')
+        self.chat = make_chat(self.customer, self.executor)
+        self.other_chat = make_chat(self.customer, self.outsider)
+        self.message = Message.objects.create(chat=self.chat, sender=self.customer, text='hello')
+        self.other_message = Message.objects.create(chat=self.other_chat, sender=self.outsider, text='hi')
+
+    def ids(self, client, query=''):
+        response = client.get('/messages/' + query)
+        self.assertEqual(response.status_code, 200)
+        return sorted(message['id'] for message in response.json()['results'])
+
+    def test_chat_creation_adds_both_members(self):
+        self.assertEqual(set(ChatMember.objects.filter(chat=self.chat).values_list('user_id', flat=True)),
+                         {self.customer.pk, self.executor.pk})
+
+    def test_list_holds_the_messages_of_the_users_chats(self):
+        self.assertEqual(self.ids(client_for(self.customer)), [self.message.pk, self.other_message.pk])
+        self.assertEqual(self.ids(client_for(self.executor)), [self.message.pk])
+        self.assertEqual(self.ids(client_for(self.outsider)), [self.other_message.pk])
+        self.assertEqual(self.ids(client_for(make_user('nobody@example.com'))), [])
+
+    def test_chat_filter(self):
+        client = client_for(self.customer)
+        self.assertEqual(self.ids(client, '?chat={}'.format(self.chat.pk)), [self.message.pk])
+        self.assertEqual(self.ids(client_for(self.outsider), '?chat={}'.format(self.chat.pk)), [])
+
+    def test_detail_is_limited_to_members(self):
+        path = '/messages/{}/'.format(self.message.pk)
+        self.assertEqual(client_for(self.executor).get(path).status_code, 200)
+        self.assertEqual(client_for(self.outsider).get(path).status_code, 404)
+        self.assertEqual(client_for(self.outsider).patch(path, {'is_read': True}, format='json').status_code, 404)
+
+    def test_images_are_prefetched(self):
+        MessageImage.objects.create(message=self.message, image=png((255, 0, 0)))
+        client = client_for(self.executor)
+        client.get('/messages/')  # caches the user
+
+        def queries():
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(client.get('/messages/').status_code, 200)
+            return len(context.captured_queries)
+
+        expected = queries()
+        for color in [(0, 255, 0), (0, 0, 255)]:
+            message = Message.objects.create(chat=self.chat, sender=self.executor, text='photo')
+            MessageImage.objects.create(message=message, image=png(color))
+        self.assertEqual(queries(), expected)
@@ -0,0 +1,40 @@
+from django.test import override_settings
+
+from tinder.metrics import DURATION_BUCKETS, registry, render
+
+from .utils import RedisTestCase, client_for, make_user
+
+
+class MetricsTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        registry.pending.clear()
+
+    def test_histogram_has_every_bucket_in_order(self):
+        labels = (('view', 'order-list'),)
+        registry.observe('apartx_http_request_duration_seconds', labels, 0.3)
+        registry.observe('apartx_http_request_duration_seconds', labels, 3)
+        registry.flush(force=True)
+        lines = [line for line in render().splitlines()
+                 if line.startswith('apartx_http_request_duration_seconds')]
+        buckets = [line.split(' ')[0].split('le="')[1].rstrip('"}') for line in lines if '_bucket' in line]
+        self.assertEqual(buckets, ['{}'.format(bucket) for bucket in DURATION_BUCKETS] + ['+Inf'])
+        counts = [float(line.split(' ')[1]) for line in lines if '_bucket' in line]
+        self.assertEqual(counts, [0, 0, 0, 0, 0, 0, 1, 1, 1, 2, 2, 2])
+        self.assertIn('apartx_http_request_duration_seconds_count{view="order-list"} 2.0', lines)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_requests_are_labelled_by_url_name(self):
+        client_for(make_user('user@example.com')).get('/messages/')
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('apartx_http_requests_total{view="message-list",method="GET",status="200"}',
+                      response.content.decode())
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_closed_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_wrong_token(self):
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer other').status_code, 403)
@@ -0,0 +1,27 @@
+from tinder.models import Order
+
+from .utils import RedisTestCase, make_order, make_user
+
+
+class ProtectedFieldsTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.order = make_order(make_user('customer@example.com'))
+
+    def test_save_leaves_protected_fields_alone(self):
+        Order.objects.filter(pk=self.order.pk).update(proposal_count=5)
+        self.order.service = 'Windows'
+        self.order.save()
+        self.assertEqual(Order.objects.values_list('service', 'proposal_count').get(), ('Windows', 5))
+
+    def test_explicit_update_fields(self):
+        self.order.service = 'Windows'
+        self.order.proposal_count = 3
+        self.order.save(update_fields=['proposal_count'])
+        self.assertEqual(Order.objects.values_list('service', 'proposal_count').get(), ('Cleaning', 3))
+
+    def test_deleted_row_is_inserted_again(self):
+        Order.objects.filter(pk=self.order.pk).delete()
+        self.order.service = 'Windows'
+        self.order.save()
+        self.assertEqual(Order.objects.values_list('pk', 'service').get(), (self.order.pk, 'Windows'))
@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from django_redis import get_redis_connection
+
+from tinder import otp
+
+from .utils import RedisTestCase
+
+
+class OTPTestsMixin:
+    def test_valid_code_is_consumed(self):
+        code = otp.issue('login', 'user@example.com', payload='data')
+        self.assertEqual(otp.verify('login', 'user@example.com', code), (otp.VALID, 'data'))
+        self.assertEqual(otp.verify('login', 'user@example.com', code), (otp.MISSING, None))
+
+    def test_wrong_code(self):
+        otp.issue('login', 'user@example.com')
+        self.assertEqual(otp.verify('login', 'user@example.com', 'wrong'), (otp.INVALID, None))
+
+    def test_codes_are_per_purpose(self):
+        code = otp.issue('register', 'user@example.com')
+        self.assertEqual(otp.verify('login', 'user@example.com', code), (otp.MISSING, None))
+
+    def test_expired_code_keeps_payload(self):
+        with mock.patch('tinder.otp.time.time', return_value=1000.0):
+            code = otp.issue('register', 'user@example.com', payload='data', ttl=86400)
+        with mock.patch('tinder.otp.time.time', return_value=2000.0):
+            self.assertEqual(otp.verify('register', 'user@example.com', code), (otp.EXPIRED, 'data'))
+
+    @override_settings(OTP_MAX_ATTEMPTS=3)
+    def test_too_many_wrong_codes_lock_the_email_out(self):
+        code = otp.issue('login', 'user@example.com')
+        for _ in range(2):
+            self.assertEqual(otp.verify('login', 'user@example.com', 'wrong')[0], otp.INVALID)
+        self.assertEqual(otp.verify('login', 'user@example.com', 'wrong')[0], otp.LOCKED)
+        self.assertEqual(otp.verify('login', 'user@example.com', code)[0], otp.LOCKED)
+        self.assertIsNone(otp.issue('login', 'user@example.com'))
+        self.assertIsNotNone(otp.issue('login', 'other@example.com'))
+
+    @override_settings(OTP_MAX_ATTEMPTS=3)
+    def test_new_code_does_not_reset_failed_attempts(self):
+        for _ in range(2):
+            otp.issue('login', 'user@example.com')
+            self.assertEqual(otp.verify('login', 'user@example.com', 'wrong')[0], otp.INVALID)
+        code = otp.issue('login', 'user@example.com')
+        self.assertEqual(otp.verify('login', 'user@example.com', 'wrong')[0], otp.LOCKED)
+        self.assertEqual(otp.verify('login', 'user@example.com', code)[0], otp.LOCKED)
+        self.assertIsNone(otp.issue('login', 'user@example.com'))
+
+    @override_settings(OTP_MAX_ATTEMPTS=3)
+    def test_right_code_clears_failed_attempts(self):
+        otp.issue('login', 'user@example.com')
+        otp.verify('login', 'user@example.com', 'wrong')
+        otp.verify('login', 'user@example.com', 'wrong')
+        code = otp.issue('login', 'user@example.com')
+        self.assertEqual(otp.verify('login', 'user@example.com', code)[0], otp.VALID)
+        otp.issue('login', 'user@example.com')
+        self.assertEqual(otp.verify('login', 'user@example.com', 'wrong')[0], otp.INVALID)
+
+    @override_settings(OTP_MAX_ATTEMPTS=3)
+    def test_email_case_does_not_matter(self):
+        code = otp.issue('login', 'User@Example.com')
+        otp.verify('login', 'user@example.com', 'wrong')
+        otp.verify('login', 'USER@example.com', 'wrong')
+        self.assertEqual(otp.verify('login', 'user@EXAMPLE.com', 'wrong')[0], otp.LOCKED)
+        self.assertEqual(otp.verify('login', 'user@example.com', code)[0], otp.LOCKED)
+
+
+class RedisOTPStoreTests(OTPTestsMixin, RedisTestCase):
+    @override_settings(OTP_MAX_ATTEMPTS=3, OTP_LOCKOUT=60)
+    def test_failures_expire_with_the_lockout_window(self):
+        otp.issue('login', 'user@example.com')
+        otp.verify('login', 'user@example.com', 'wrong')
+        self.assertEqual(get_redis_connection("default").ttl('otp:fail:login:user@example.com'), 60)
+
+
+@override_settings(OTP_BACKEND='tinder.otp.MemoryOTPStore')
+class MemoryOTPStoreTests(OTPTestsMixin, SimpleTestCase):
+    def setUp(self):
+        otp._load_store.cache_clear()
+
+    def tearDown(self):
+        otp._load_store.cache_clear()
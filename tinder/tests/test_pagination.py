@@ -0,0 +1,77 @@
+import datetime
+
+from django.test import RequestFactory, SimpleTestCase
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from tinder.models import Message
+from tinder.pagination import KeysetPagination, MessagePagination
+
+from .utils import RedisTestCase, client_for, make_chat, make_user
+
+
+class KeysetPaginationTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        self.executor = make_user('executor@example.com', 'Executor')
+        self.chat = make_chat(self.customer, self.executor)
+        # Pairs of messages share a timestamp, so the id has to break ties.
+        start = timezone.now() - datetime.timedelta(hours=1)
+        self.messages = [Message.objects.create(chat=self.chat, sender=self.customer, text=str(i))
+                         for i in range(7)]
+        for i, message in enumerate(self.messages):
+            Message.objects.filter(pk=message.pk).update(timestamp=start + datetime.timedelta(minutes=i // 2))
+        self.newest_first = [str(i) for i in reversed(range(7))]
+        self.client = client_for(self.customer)
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_next_links_walk_every_row_once(self):
+        page = self.get('/messages/?chat={}&limit=3'.format(self.chat.pk))
+        self.assertIsNone(page['previous'])
+        texts = [message['text'] for message in page['results']]
+        while page['next']:
+            page = self.get(page['next'])
+            texts += [message['text'] for message in page['results']]
+        self.assertEqual(texts, self.newest_first)
+
+    def test_previous_link_returns_the_page_before(self):
+        first = self.get('/messages/?chat={}&limit=3'.format(self.chat.pk))
+        second = self.get(first['next'])
+        back = self.get(second['previous'])
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_new_rows_dont_shift_later_pages(self):
+        first = self.get('/messages/?chat={}&limit=3'.format(self.chat.pk))
+        Message.objects.create(chat=self.chat, sender=self.executor, text='new')
+        second = self.get(first['next'])
+        self.assertEqual([message['text'] for message in second['results']], self.newest_first[3:6])
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/messages/?after=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class CursorTests(SimpleTestCase):
+    def test_cursor_keeps_microseconds(self):
+        paginator = MessagePagination()
+        paginator.fields = [Message._meta.get_field('timestamp'), Message._meta.get_field('id')]
+        timestamp = datetime.datetime(2023, 6, 1, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc)
+        cursor = paginator.encode_cursor(Message(id=5, timestamp=timestamp))
+        request = Request(RequestFactory().get('/', {'after': cursor}))
+        self.assertEqual(paginator.decode_cursor(request, 'after'), [timestamp, 5])
+
+    def test_cursor_with_wrong_arity_is_rejected(self):
+        paginator = KeysetPagination()
+        paginator.fields = [Message._meta.get_field('id')]
+        cursor = MessagePagination()
+        cursor.fields = [Message._meta.get_field('timestamp'), Message._meta.get_field('id')]
+        encoded = cursor.encode_cursor(Message(id=5, timestamp=timezone.now()))
+        with self.assertRaises(NotFound):
+            paginator.decode_cursor(Request(RequestFactory().get('/', {'after': encoded})), 'after')
@@ -0,0 +1,82 @@
+from tinder import proposals
+from tinder.models import Order, Proposal
+
+from .utils import RedisTestCase, client_for, make_order, make_user
+
+
+class ProposalTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        self.maid = make_user('maid@example.com', 'Executor')
+        self.other_maid = make_user('other@example.com', 'Executor')
+        self.orders = [make_order(self.customer) for _ in range(3)]
+
+    def proposal_counts(self):
+        return list(Order.objects.order_by('pk').values_list('proposal_count', flat=True))
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return sorted(item['id'] for item in response.json()['results'])
+
+    def test_list_shows_own_proposals_and_those_on_own_orders(self):
+        mine = Proposal.objects.create(order=self.orders[0], maid=self.maid)
+        theirs = Proposal.objects.create(order=self.orders[0], maid=self.other_maid)
+        elsewhere = Proposal.objects.create(order=make_order(make_user('else@example.com')), maid=self.other_maid)
+
+        self.assertEqual(self.ids(client_for(self.maid).get('/proposals/')), [mine.pk])
+        self.assertEqual(self.ids(client_for(self.customer).get('/proposals/')), [mine.pk, theirs.pk])
+        self.assertEqual(self.ids(client_for(self.other_maid).get('/proposals/')), [theirs.pk, elsewhere.pk])
+        self.assertEqual(self.ids(client_for(make_user('outsider@example.com')).get('/proposals/')), [])
+
+    def test_order_proposals(self):
+        mine = Proposal.objects.create(order=self.orders[0], maid=self.maid)
+        theirs = Proposal.objects.create(order=self.orders[0], maid=self.other_maid)
+        path = '/orders/{}/proposals/'.format(self.orders[0].pk)
+        self.assertEqual(self.ids(client_for(self.customer).get(path)), [mine.pk, theirs.pk])
+        self.assertEqual(self.ids(client_for(self.maid).get(path)), [mine.pk])
+
+    def test_single_proposals_keep_the_count(self):
+        client = client_for(self.maid)
+        response = client.post('/proposals/', {'order': self.orders[0].pk, 'maid': self.maid.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.proposal_counts(), [1, 0, 0])
+
+        duplicate = client.post('/proposals/', {'order': self.orders[0].pk, 'maid': self.maid.pk}, format='json')
+        self.assertEqual(duplicate.status_code, 400)
+
+        self.assertEqual(client.patch('/proposals/{}/'.format(response.json()['id']),
+                                      {'order': self.orders[1].pk}, format='json').status_code, 200)
+        self.assertEqual(self.proposal_counts(), [0, 1, 0])
+
+        self.assertEqual(client.delete('/proposals/{}/'.format(response.json()['id'])).status_code, 204)
+        self.assertEqual(self.proposal_counts(), [0, 0, 0])
+
+    def test_bulk_proposals(self):
+        client = client_for(self.maid)
+        Proposal.objects.create(order=self.orders[0], maid=self.maid)
+        requested = [self.orders[0].pk, self.orders[1].pk, 10 ** 6]
+        response = client.post('/proposals/bulk/', {'orders': requested}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([proposal['order'] for proposal in response.json()['proposals']],
+                         [self.orders[0].pk, self.orders[1].pk])
+        self.assertEqual(response.json()['missing_orders'], [10 ** 6])
+        self.assertEqual(self.proposal_counts(), [1, 1, 0])
+
+        # Repeating a submission changes nothing.
+        self.assertEqual(client.post('/proposals/bulk/', {'orders': requested}, format='json').status_code, 201)
+        self.assertEqual(Proposal.objects.filter(maid=self.maid).count(), 2)
+        self.assertEqual(self.proposal_counts(), [1, 1, 0])
+
+        client_for(self.other_maid).post('/proposals/bulk/', {'orders': [self.orders[1].pk]}, format='json')
+        self.assertEqual(self.proposal_counts(), [1, 2, 0])
+
+    def test_bulk_proposals_are_for_executors(self):
+        response = client_for(self.customer).post('/proposals/bulk/', {'orders': [self.orders[0].pk]}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Proposal.objects.exists())
+
+    def test_bulk_limit(self):
+        orders = list(range(1, proposals.BULK_LIMIT + 2))
+        response = client_for(self.maid).post('/proposals/bulk/', {'orders': orders}, format='json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,49 @@
+import io
+from importlib import import_module
+
+from django.apps import apps
+from django.core.management import call_command
+
+from tinder.models import CustomUser, Review
+
+from .utils import RedisTestCase, make_order, make_user
+
+backfill_ratings = import_module('tinder.migrations.0014_customuser_rating_aggregates').backfill_ratings
+
+
+class RatingAggregateTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        self.executor = make_user('executor@example.com', 'Executor')
+        self.order = make_order(self.customer)
+
+    def review(self, rating):
+        # objects.create skips the 1..5 validators, as old rows did.
+        return Review.objects.create(reviewer=self.customer, reviewee=self.executor, order=self.order,
+                                     review_text='ok', rating=rating)
+
+    def aggregates(self):
+        return CustomUser.objects.filter(pk=self.executor.pk).values(*CustomUser.RATING_FIELDS).get()
+
+    def expected(self):
+        return {'rating_sum': 1 + 5 + 4, 'rating_count': 3,
+                'stars_1': 1, 'stars_2': 0, 'stars_3': 0, 'stars_4': 1, 'stars_5': 1}
+
+    def test_out_of_range_ratings_count_as_nearest_star(self):
+        reviews = [self.review(rating) for rating in (-3, 9, 4)]
+        self.assertEqual(self.aggregates(), self.expected())
+        for review in reviews:
+            review.delete()
+        self.assertEqual(self.aggregates(), dict.fromkeys(CustomUser.RATING_FIELDS, 0))
+
+    def test_rebuild_and_backfill_agree(self):
+        for rating in (0, 6, 4):
+            self.review(rating)
+        CustomUser.objects.update(**dict.fromkeys(CustomUser.RATING_FIELDS, 0))
+        call_command('rebuild_ratings', stdout=io.StringIO())
+        self.assertEqual(self.aggregates(), self.expected())
+
+        CustomUser.objects.update(**dict.fromkeys(CustomUser.RATING_FIELDS, 0))
+        backfill_ratings(apps, None)
+        self.assertEqual(self.aggregates(), self.expected())
@@ -0,0 +1,71 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django_redis import get_redis_connection
+
+from tinder.models import CustomUser, Order, Review
+from tinder.routers import ReplicaRouter, RoutingState, current_state, pin_key, read_from_primary
+
+from .utils import client_for, make_order, make_user
+
+
+@skipUnless('replica_1' in settings.DATABASES, 'run with --settings=ApartXCleaning.settings_test_replica')
+class ReplicaRoutingTests(TransactionTestCase):
+    # Reads inside a transaction always go to the primary, so these tests
+    # can't run in TestCase's per-test transaction.
+    databases = {'default', *settings.REPLICA_DATABASES}
+
+    def setUp(self):
+        super().setUp()
+        get_redis_connection("default").flushall()
+        cache.clear()
+        self.user = self.make_replicated_user('customer@example.com')
+        self.client = client_for(self.user)
+
+    def make_replicated_user(self, email):
+        user = make_user(email)
+        CustomUser.objects.using('replica_1').bulk_create([CustomUser.objects.get(pk=user.pk)])
+        return user
+
+    def test_reads_go_to_the_replica(self):
+        order = Order.objects.using('replica_1').create(
+            service='Cleaning', price=100, customer_id=self.user.pk, adress='Almaty', deadline='2030-01-01T00:00Z')
+        self.assertFalse(Order.objects.filter(pk=order.pk).exists())
+        self.assertEqual(self.client.get('/orders/{}/'.format(order.pk)).status_code, 200)
+
+    def test_write_pins_the_user_to_the_primary(self):
+        order = make_order(self.user)
+        self.assertEqual(self.client.get('/orders/{}/'.format(order.pk)).status_code, 404)
+
+        response = self.client.patch('/select-role/', {'role': 'Executor'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(cache.get(pin_key(self.user.pk)))
+        self.assertEqual(self.client.get('/orders/{}/'.format(order.pk)).status_code, 200)
+
+        other = client_for(self.make_replicated_user('other@example.com'))
+        self.assertEqual(other.get('/orders/{}/'.format(order.pk)).status_code, 404)
+
+    def test_recent_write_reads_from_primary(self):
+        # The reviews version was bumped within READ_YOUR_WRITES_WINDOW, so
+        # the list view calls read_from_primary().
+        executor = make_user('executor@example.com', 'Executor')
+        review = Review.objects.create(reviewer=self.user, reviewee=executor, review_text='Great',
+                                       rating=5, order=make_order(self.user))
+        response = self.client.get('/reviews/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.json()['results']], [review.pk])
+
+    def test_read_from_primary(self):
+        router = ReplicaRouter()
+        state = RoutingState('replica_1')
+        token = current_state.set(state)
+        try:
+            self.assertEqual(router.db_for_read(Order), 'replica_1')
+            read_from_primary()
+            self.assertEqual(router.db_for_read(Order), 'default')
+            self.assertEqual(router.db_for_write(Order), 'default')
+            self.assertTrue(state.wrote)
+        finally:
+            current_state.reset(token)
@@ -0,0 +1,67 @@
+from django.db import connection
+
+from tinder.models import Message
+from tinder.search import fallback_search
+
+from .utils import RedisTestCase, client_for, make_chat, make_user
+
+
+class MessageSearchTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        self.executor = make_user('executor@example.com', 'Executor')
+        self.chat = make_chat(self.customer, self.executor)
+        self.client = client_for(self.customer)
+
+    def say(self, text, chat=None, sender=None):
+        return Message.objects.create(chat=chat or self.chat, sender=sender or self.customer, text=text)
+
+    def search(self, query):
+        response = self.client.get('/messages/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_fts5_triggers_exist(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'tinder_message'")
+            triggers = {row[0] for row in cursor.fetchall()}
+        self.assertEqual(triggers, {'tinder_message_fts_insert', 'tinder_message_fts_delete',
+                                    'tinder_message_fts_update'})
+
+    def test_matches_words_and_follows_edits(self):
+        message = self.say('Window cleaning on Friday')
+        self.say('Carpet only')
+        self.assertEqual([result['id'] for result in self.search('window friday')], [message.pk])
+        message.text = 'Balcony on Saturday'
+        message.save()
+        self.assertEqual(self.search('window'), [])
+        self.assertEqual([result['id'] for result in self.search('balcony')], [message.pk])
+        message.delete()
+        self.assertEqual(self.search('balcony'), [])
+
+    def test_snippet_is_escaped_and_marked(self):
+        self.say('<b>cleaning</b> & ironing')
+        snippet = self.search('cleaning')[0]['snippet']
+        self.assertIn('&lt;b&gt;<mark>cleaning</mark>&lt;/b&gt;', snippet)
+        self.assertIn('&amp;', snippet)
+
+    def test_fts5_syntax_is_not_interpreted(self):
+        self.say('cleaning NEAR tomorrow')
+        self.assertEqual(len(self.search('cleaning NEAR "')), 1)
+        self.assertEqual(self.search('**'), [])
+
+    def test_other_peoples_chats_are_excluded(self):
+        outsider = make_user('outsider@example.com')
+        other_chat = make_chat(outsider, self.executor)
+        self.say('cleaning secret', chat=other_chat, sender=outsider)
+        mine = self.say('cleaning mine')
+        self.assertEqual([result['id'] for result in self.search('cleaning')], [mine.pk])
+
+    def test_fallback_search(self):
+        outsider = make_user('outsider@example.com')
+        self.say('Window <cleaning>', chat=make_chat(outsider, self.executor), sender=outsider)
+        mine = self.say('Window <cleaning>')
+        results = fallback_search('default', self.customer.pk, 'WINDOW clean', limit=10)
+        self.assertEqual([message.pk for message in results], [mine.pk])
+        self.assertEqual(results[0].snippet, '<mark>Window</mark> &lt;<mark>clean</mark>ing&gt;')
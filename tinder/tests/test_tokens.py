@@ -0,0 +1,53 @@
+import io
+
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from tinder.tokens import RefreshToken
+
+from .utils import RedisTestCase, make_user
+
+
+class RefreshTokenTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('customer@example.com')
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post('/token/refresh/', {'refresh': str(token)}, format='json')
+
+    def test_rotation(self):
+        token = RefreshToken.for_user(self.user)
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        rotated = RefreshToken(response.json()['refresh'])
+        self.assertNotEqual(rotated['jti'], token['jti'])
+        self.assertEqual(rotated['user_id'], self.user.pk)
+        self.assertIn('access', response.json())
+        self.assertEqual(self.refresh(rotated).status_code, 200)
+
+    def test_replayed_token_is_rejected(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_verify_rejects_blacklisted_token(self):
+        token = RefreshToken.for_user(self.user)
+        response = self.client.post('/token/verify/', {'token': str(token)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        token.blacklist()
+        response = self.client.post('/token/verify/', {'token': str(token)}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(TOKEN_BLACKLIST_AUDIT=True)
+    def test_rotation_is_audited(self):
+        token = RefreshToken.for_user(self.user)
+        rotated = RefreshToken(self.refresh(token).json()['refresh'])
+        call_command('prune_token_blacklist', stdout=io.StringIO())
+
+        self.assertEqual(set(OutstandingToken.objects.values_list('jti', flat=True)),
+                         {token['jti'], rotated['jti']})
+        self.assertEqual(list(BlacklistedToken.objects.values_list('token__jti', flat=True)), [token['jti']])
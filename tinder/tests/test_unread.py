@@ -0,0 +1,86 @@
+from tinder import unread
+from tinder.models import ChatMember, Message
+
+from .utils import RedisTestCase, client_for, make_chat, make_user
+
+
+class UnreadCountTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        self.executor = make_user('executor@example.com', 'Executor')
+        self.chat = make_chat(self.customer, self.executor)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.message = Message.objects.create(chat=self.chat, sender=self.customer, text='hello')
+
+    def mark(self, is_read):
+        response = client_for(self.executor).patch('/messages/{}/'.format(self.message.pk), {'is_read': is_read})
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_message_counts_for_the_recipient_only(self):
+        self.assertEqual(unread.get_count(self.executor.pk, self.chat.pk), 1)
+        self.assertEqual(unread.get_count(self.customer.pk, self.chat.pk), 0)
+
+    def test_marking_read_and_unread_again(self):
+        self.mark(True)
+        self.assertEqual(unread.get_count(self.executor.pk, self.chat.pk), 0)
+        self.mark(False)
+        self.assertEqual(unread.get_count(self.executor.pk, self.chat.pk), 1)
+        self.mark(False)
+        self.assertEqual(unread.get_count(self.executor.pk, self.chat.pk), 1)
+
+    def test_deleting_unread_message(self):
+        response = client_for(self.customer).delete('/messages/{}/'.format(self.message.pk))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(unread.get_counts(self.executor.pk), {})
+
+
+class ChatReadTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.customer = make_user('customer@example.com')
+        self.executor = make_user('executor@example.com', 'Executor')
+        self.chat = make_chat(self.customer, self.executor)
+        self.client = client_for(self.executor)
+        self.messages = []
+        for sender, text in [(self.customer, 'one'), (self.executor, 'mine'), (self.customer, 'two'),
+                             (self.customer, 'three')]:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.messages.append(Message.objects.create(chat=self.chat, sender=sender, text=text))
+
+    def read(self, message, chat=None):
+        return self.client.post('/chats/{}/read/'.format((chat or self.chat).pk), {'message_id': message.pk},
+                                format='json')
+
+    def read_flags(self):
+        return list(Message.objects.order_by('pk').values_list('is_read', flat=True))
+
+    def chat_unread_count(self):
+        return self.client.get('/chats/').json()['results'][0]['unread_count']
+
+    def test_marks_incoming_messages_up_to_the_watermark(self):
+        self.assertEqual(self.chat_unread_count(), 3)
+        response = self.read(self.messages[2])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'read_up_to': self.messages[2].pk, 'unread_count': 1})
+        self.assertEqual(self.read_flags(), [True, False, True, False])
+        self.assertEqual(ChatMember.objects.get(chat=self.chat, user=self.executor).read_up_to, self.messages[2].pk)
+        self.assertEqual(unread.get_count(self.executor.pk, self.chat.pk), 1)
+        self.assertEqual(self.chat_unread_count(), 1)
+
+    def test_watermark_never_moves_back(self):
+        self.read(self.messages[3])
+        response = self.read(self.messages[0])
+        self.assertEqual(response.json(), {'read_up_to': self.messages[3].pk, 'unread_count': 0})
+        self.assertEqual(ChatMember.objects.get(chat=self.chat, user=self.executor).read_up_to, self.messages[3].pk)
+
+    def test_message_of_another_chat_is_rejected(self):
+        other_chat = make_chat(self.customer, self.executor)
+        other = Message.objects.create(chat=other_chat, sender=self.customer, text='elsewhere')
+        self.assertEqual(self.read(other).status_code, 400)
+        self.assertEqual(self.read_flags(), [False, False, False, False, False])
+
+    def test_non_member_gets_404(self):
+        self.client = client_for(make_user('outsider@example.com', 'Executor'))
+        self.assertEqual(self.read(self.messages[0]).status_code, 404)
+        self.assertEqual(self.read_flags(), [False, False, False, False])
@@ -0,0 +1,49 @@
+import io
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.utils import timezone
+from django_redis import get_redis_connection
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tinder.models import Chat, CustomUser, Order
+
+
+class RedisTestCase(TestCase):
+    """A TestCase that starts from an empty (fake) Redis."""
+
+    def setUp(self):
+        super().setUp()
+        get_redis_connection("default").flushall()
+        cache.clear()
+
+
+def make_user(email, role='Customer'):
+    user = CustomUser.objects.create_user(email, 'password')
+    user.role = role
+    user.save()
+    return user
+
+
+def make_order(customer, **fields):
+    fields = dict({'service': 'Cleaning', 'price': 100, 'adress': 'Almaty', 'deadline': timezone.now()}, **fields)
+    return Order.objects.create(customer=customer, **fields)
+
+
+def make_chat(customer, executor, **order_fields):
+    return Chat.objects.create(order=make_order(customer, **order_fields), customer=customer, executor=executor)
+
+
+def client_for(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION='Bearer {}'.format(AccessToken.for_user(user)))
+    return client
+
+
+def png(color=(0, 0, 0), name='image.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
@@ -0,0 +1,90 @@
+import json
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from django_redis import get_redis_connection
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import BlacklistMixin
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from rest_framework_simplejwt.utils import datetime_to_epoch
+
+# Blacklisted refresh tokens live in Redis as token:blacklist:<jti> keys that
+# expire together with the token, so lookups and inserts stay O(1) however
+# many tokens have been rotated. With TOKEN_BLACKLIST_AUDIT on, issued and
+# blacklisted tokens are also queued on AUDIT_QUEUE and written to the
+# token_blacklist tables by the prune_token_blacklist command.
+AUDIT_QUEUE = 'token:blacklist:audit'
+
+
+def blacklist_key(jti):
+    return 'token:blacklist:{}'.format(jti)
+
+
+def is_blacklisted(jti):
+    return bool(get_redis_connection("default").exists(blacklist_key(jti)))
+
+
+def remaining_lifetime(token):
+    return max(token['exp'] - datetime_to_epoch(token.current_time), 1)
+
+
+def queue_audit(token, blacklisted):
+    record = {
+        'jti': token[api_settings.JTI_CLAIM],
+        'user_id': token.get(api_settings.USER_ID_CLAIM),
+        'token': str(token),
+        'created_at': token.get('iat'),
+        'expires_at': token['exp'],
+        'blacklisted': blacklisted,
+    }
+    get_redis_connection("default").rpush(AUDIT_QUEUE, json.dumps(record))
+
+
+class RefreshToken(BaseRefreshToken):
+    """
+    Refresh token that keeps its blacklist in Redis instead of the
+    OutstandingToken/BlacklistedToken tables.
+    """
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        """
+        Blacklist the token until it expires. Returns False if it already
+        was, which lets a refresh detect that a concurrent request rotated
+        the same token first.
+        """
+        conn = get_redis_connection("default")
+        added = conn.set(blacklist_key(self.payload[api_settings.JTI_CLAIM]), 1,
+                         ex=remaining_lifetime(self), nx=True)
+        if added and settings.TOKEN_BLACKLIST_AUDIT:
+            queue_audit(self, blacklisted=True)
+        return bool(added)
+
+    def rotate(self):
+        """
+        Turn the token into its replacement, blacklisting it first when
+        BLACKLIST_AFTER_ROTATION is on; with TOKEN_BLACKLIST_AUDIT both are
+        queued for audit. Returns False, leaving the token as it was, if it
+        was already blacklisted.
+        """
+        if api_settings.BLACKLIST_AFTER_ROTATION and not self.blacklist():
+            return False
+        self.set_jti()
+        self.set_exp()
+        self.set_iat()
+        if settings.TOKEN_BLACKLIST_AUDIT:
+            queue_audit(self, blacklisted=False)
+        return True
+
+    @classmethod
+    def for_user(cls, user):
+        # Skip BlacklistMixin.for_user, which inserts an OutstandingToken
+        # row for every login.
+        token = super(BlacklistMixin, cls).for_user(user)
+        if settings.TOKEN_BLACKLIST_AUDIT:
+            queue_audit(token, blacklisted=False)
+        return token
@@ -0,0 +1,76 @@
+from django_redis import get_redis_connection
+
+from .aredis import get_async_redis
+from .models import ChatMember
+
+# Unread counters live in one Redis hash per user: unread:<user_id> maps
+# chat id -> number of messages the user hasn't read yet. Fields are removed
+# when they drop to zero, so HGETALL returns only chats with unread messages.
+
+# HINCRBY that never goes below zero and drops the field when it reaches it.
+DECREMENT_SCRIPT = """
+local value = redis.call('HINCRBY', KEYS[1], ARGV[1], -tonumber(ARGV[2]))
+if value <= 0 then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    return 0
+end
+return value
+"""
+
+
+def unread_key(user_id):
+    return 'unread:{}'.format(user_id)
+
+
+def recipients(chat_id, sender_id):
+    return ChatMember.objects.filter(chat_id=chat_id).exclude(user_id=sender_id).values_list('user_id', flat=True)
+
+
+def message_created(chat_id, sender_id):
+    """Count a new message of ``sender_id`` as unread for the other members of the chat."""
+    conn = get_redis_connection("default")
+    pipe = conn.pipeline(transaction=False)
+    for user_id in recipients(chat_id, sender_id):
+        pipe.hincrby(unread_key(user_id), chat_id, 1)
+    pipe.execute()
+
+
+def message_read(chat_id, sender_id):
+    conn = get_redis_connection("default")
+    for user_id in recipients(chat_id, sender_id):
+        conn.eval(DECREMENT_SCRIPT, 1, unread_key(user_id), chat_id, 1)
+
+
+# A message marked unread again counts like a new one.
+message_unread = message_created
+
+
+def chat_deleted(chat):
+    conn = get_redis_connection("default")
+    pipe = conn.pipeline(transaction=False)
+    for user_id in {chat.customer_id, chat.executor_id}:
+        pipe.hdel(unread_key(user_id), chat.pk)
+    pipe.execute()
+
+
+def set_count(user_id, chat_id, count):
+    conn = get_redis_connection("default")
+    if count > 0:
+        conn.hset(unread_key(user_id), chat_id, count)
+    else:
+        conn.hdel(unread_key(user_id), chat_id)
+
+
+def get_count(user_id, chat_id):
+    value = get_redis_connection("default").hget(unread_key(user_id), chat_id)
+    return int(value) if value else 0
+
+
+def get_counts(user_id):
+    counts = get_redis_connection("default").hgetall(unread_key(user_id))
+    return {int(chat_id): int(count) for chat_id, count in counts.items()}
+
+
+async def aget_counts(user_id):
+    counts = await get_async_redis().hgetall(unread_key(user_id))
+    return {int(chat_id): int(count) for chat_id, count in counts.items()}
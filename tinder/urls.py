@@ -2,9 +2,13 @@ from django.urls import path
 from .views import (RegisterView, ConfirmRegisterView, RequestLoginView,
                     ConfirmLoginView, RoleSelectionView, CustomUserListView,
                     CustomUserDetailView, OrderListView, OrderDetailView,
-                    ProposalListView, ProposalDetailView, ReviewListView,
+                    OrderProposalListView, ProposalListView, ProposalBulkCreateView,
+                    ProposalDetailView, ReviewListView,
                     ReviewDetailView, UserProfileView, ChatListView,
-                    ChatDetailView, MessageListView, MessageDetailView)
+                    ChatDetailView, ChatReadView, InboxView, MessageListView, MessageDetailView,
+                    MessageSearchView, ExportView)
+from . import async_views
+from .metrics import metrics_view
 from rest_framework_simplejwt.views import (
     TokenRefreshView,
     TokenVerifyView,
@@ -20,15 +24,22 @@ urlpatterns = [
     path('select-role/', RoleSelectionView.as_view(), name='select-role'),
     path('users/', CustomUserListView.as_view(), name='user-list'),
     path('users/<int:pk>/', CustomUserDetailView.as_view(), name='user-detail'),
-    path('orders/', OrderListView.as_view(), name='order-list'),
+    path('orders/', async_views.read_async(async_views.order_list, OrderListView.as_view()), name='order-list'),
     path('orders/<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
+    path('orders/<int:pk>/proposals/', OrderProposalListView.as_view(), name='order-proposals'),
     path('proposals/', ProposalListView.as_view(), name='proposal-list'),
+    path('proposals/bulk/', ProposalBulkCreateView.as_view(), name='proposal-bulk'),
     path('proposals/<int:pk>/', ProposalDetailView.as_view(), name='proposal-detail'),
     path('reviews/', ReviewListView.as_view(), name='review-list'),
     path('reviews/<int:pk>/', ReviewDetailView.as_view(), name='review-detail'),
-    path('profile/', UserProfileView.as_view(), name='user_profile'),
-    path('chats/', ChatListView.as_view()),
-    path('chats/<int:pk>/', ChatDetailView.as_view()),
-    path('messages/', MessageListView.as_view()),
-    path('messages/<int:pk>/', MessageDetailView.as_view()),
+    path('profile/', async_views.read_async(async_views.profile, UserProfileView.as_view()), name='user_profile'),
+    path('chats/', async_views.read_async(async_views.chat_list, ChatListView.as_view()), name='chat-list'),
+    path('chats/<int:pk>/', ChatDetailView.as_view(), name='chat-detail'),
+    path('chats/<int:pk>/read/', ChatReadView.as_view(), name='chat-read'),
+    path('inbox/', InboxView.as_view(), name='inbox'),
+    path('messages/', async_views.read_async(async_views.message_list, MessageListView.as_view()), name='message-list'),
+    path('messages/<int:pk>/', MessageDetailView.as_view(), name='message-detail'),
+    path('messages/search/', MessageSearchView.as_view(), name='message-search'),
+    path('exports/<str:name>.<str:fmt>', ExportView.as_view(), name='export'),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,100 @@
+import secrets
+import time
+
+from django_redis import get_redis_connection
+
+from .aredis import get_async_redis
+from .models import ChatMember
+
+# Each cacheable list has a version hash in Redis: version:<resource> for
+# lists everyone sees the same rows of, version:<resource>:<user_id> for
+# per-user ones. The hash holds a counter bumped on every write to the
+# resource and the time of that write. Conditional GETs compare these
+# instead of querying the database. A hash that doesn't exist yet (or was
+# lost with a Redis flush) is created with a random counter, so it never
+# repeats a version an earlier ETag was built from.
+
+
+def version_key(resource, user_id=None):
+    if user_id is None:
+        return 'version:{}'.format(resource)
+    return 'version:{}:{}'.format(resource, user_id)
+
+
+def bump(*keys):
+    now = time.time()
+    pipe = get_redis_connection("default").pipeline(transaction=False)
+    for key in keys:
+        pipe.hsetnx(key, 'version', secrets.randbits(62))
+        pipe.hincrby(key, 'version', 1)
+        pipe.hset(key, 'modified', now)
+    pipe.execute()
+
+
+def bump_resource(resource):
+    bump(version_key(resource))
+
+
+def bump_chat(chat, *resources):
+    """Bump the per-user ``resources`` of both members of ``chat``."""
+    bump_users((chat.customer_id, chat.executor_id), *resources)
+
+
+def bump_chat_id(chat_id, *resources):
+    """``bump_chat`` for a chat that isn't loaded; looks up its members."""
+    bump_users(ChatMember.objects.filter(chat_id=chat_id).values_list('user_id', flat=True), *resources)
+
+
+def bump_users(user_ids, *resources):
+    bump(*(version_key(resource, user_id) for resource in resources for user_id in user_ids))
+
+
+def get_versions(keys):
+    """``(version, modified)`` per key, seeding the keys that don't exist."""
+    conn = get_redis_connection("default")
+    pipe = conn.pipeline(transaction=False)
+    for key in keys:
+        pipe.hmget(key, 'version', 'modified')
+    replies = pipe.execute()
+    missing = _missing(keys, replies)
+    if missing:
+        pipe = conn.pipeline(transaction=False)
+        _seed(pipe, missing)
+        _merge(replies, missing, pipe.execute())
+    return _parse_versions(replies)
+
+
+async def aget_versions(keys):
+    conn = get_async_redis()
+    pipe = conn.pipeline(transaction=False)
+    for key in keys:
+        pipe.hmget(key, 'version', 'modified')
+    replies = await pipe.execute()
+    missing = _missing(keys, replies)
+    if missing:
+        pipe = conn.pipeline(transaction=False)
+        _seed(pipe, missing)
+        _merge(replies, missing, await pipe.execute())
+    return _parse_versions(replies)
+
+
+def _missing(keys, replies):
+    return [(index, key) for index, (key, reply) in enumerate(zip(keys, replies)) if not reply[0]]
+
+
+def _seed(pipe, missing):
+    # HSETNX, so a bump or another reader that got there first wins.
+    now = time.time()
+    for _, key in missing:
+        pipe.hsetnx(key, 'version', secrets.randbits(62))
+        pipe.hsetnx(key, 'modified', now)
+        pipe.hmget(key, 'version', 'modified')
+
+
+def _merge(replies, missing, seeded):
+    for (index, _), reply in zip(missing, seeded[2::3]):
+        replies[index] = reply
+
+
+def _parse_versions(replies):
+    return [(int(version), float(modified)) for version, modified in replies]
@@ -1,25 +1,34 @@
-from rest_framework import permissions, status, exceptions, generics, response, viewsets
+from rest_framework import permissions, status, exceptions, generics, response, viewsets, filters
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
-from django_redis import get_redis_connection
+from django_filters.rest_framework import DjangoFilterBackend
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from django.core.handlers.asgi import ASGIRequest
 from django.conf import settings
-from django.core.mail import send_mail
+from django.db import transaction
 from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 
-from random import randint
+from functools import partial
 import json
 import os
 
 from .serializers import (RegisterSerializer, ConfirmSerializer,
                           LoginConfirmSerializer, LoginRequestSerializer, RoleSelectionSerializer,
-                          OrderSerializer, ProposalSerializer, ReviewSerializer,
-                          CustomUserSerializer, ChatSerializer, MessageSerializer,
-                          MessageImageSerializer)
-from .models import (CustomUser, Order, Proposal, Review, 
-                     Chat, Message, MessageImage)
+                          OrderSerializer, ProposalSerializer, ProposalBulkSerializer, ReviewSerializer,
+                          CustomUserSerializer, ChatSerializer, ChatReadSerializer, InboxSerializer,
+                          MessageSerializer, MessageImageSerializer, MessageSearchResultSerializer)
+from .models import (ArchivedChat, CustomUser, Order, Proposal, Review,
+                     Chat, ChatMember, Message, MessageImage)
+from .filters import OrderFilter
+from .images import build_avatar_variants, run_after_commit
+from .conditional import ConditionalListMixin
+from .mail import queue_mail
+from .pagination import (InboxPagination, KeysetPagination, MessagePagination, OrderProposalPagination,
+                         SearchPagination)
+from .tokens import RefreshToken
+from . import archive, exports, inbox, leaderboard, otp, proposals, routers, search, unread, versions
 
 
 class IsOppositeRole(permissions.BasePermission):
@@ -43,16 +52,14 @@ class RegisterView(generics.GenericAPIView):
         last_name = serializer.validated_data['last_name']
         phone_number = serializer.validated_data['phone_number']
         avatar = request.FILES.get('avatar')
-        print(avatar)
         
         if avatar:
-            temp_avatar = default_storage.save('tmp/{}'.format(avatar.name), ContentFile(avatar.read()))
+            temp_avatar = default_storage.save('tmp/{}'.format(avatar.name), avatar)
             img_url = os.path.join(settings.MEDIA_URL, temp_avatar)
 
         else:
             return Response({"message": "The avatar is missing."}, status=status.HTTP_400_BAD_REQUEST)
 
-        conn = get_redis_connection("default")
         user_info = {
             'email': email,
             'password': password,
@@ -61,10 +68,11 @@ class RegisterView(generics.GenericAPIView):
             'avatar': img_url,
             'phone_number': phone_number
         }
-        confirmation_code = str(randint(100000, 999999))
-        conn.set(email, json.dumps(user_info), ex=86400)
-        conn.set(email + '_confirmation_code', confirmation_code, ex=120)
-        send_mail('Confirmation code', 'Your confirmation code is {}'.format(confirmation_code), settings.EMAIL_HOST_USER, [email], fail_silently=False)
+        confirmation_code = otp.issue('register', email, payload=json.dumps(user_info), ttl=86400)
+        if confirmation_code is None:
+            return Response({"error": "Too many attempts. Please try again later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        queue_mail('Confirmation code', 'Your confirmation code is {}'.format(confirmation_code), [email],
+                   expires_in=settings.OTP_CODE_TTL)
         
         return Response({"message": "Confirmation code has been sent to your email."}, status=status.HTTP_200_OK)
 
@@ -81,25 +89,25 @@ class ConfirmRegisterView(generics.GenericAPIView):
         serializer.is_valid(raise_exception=True)
         email = serializer.validated_data['email']
         code = serializer.validated_data['code']
-        conn = get_redis_connection("default")
-        user_info_json = conn.get(email)
+        result, user_info_json = otp.verify('register', email, code)
 
-        if user_info_json is None:
+        if result == otp.MISSING:
             return Response({"error": "No registration in progress for this email."}, status=status.HTTP_400_BAD_REQUEST)
 
-        stored_code = conn.get(email + '_confirmation_code')
+        if result == otp.LOCKED:
+            return Response({"error": "Too many attempts. Please try again later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
 
-        if not stored_code:
+        if result == otp.EXPIRED:
             return Response({"error": "Confirmation code expired. Please register again."}, status=status.HTTP_400_BAD_REQUEST)
 
-        if str(int(stored_code)) != code:
+        if result != otp.VALID:
             return Response({"error": "Confirmation code does not match. Please try again."}, status=status.HTTP_400_BAD_REQUEST)
 
         user_info = json.loads(user_info_json)
         
         temp_path = os.path.join(settings.MEDIA_ROOT, 'tmp/{}'.format(os.path.basename(user_info['avatar'])))
         new_path = os.path.join(settings.MEDIA_ROOT, 'user/avatar/{}'.format(os.path.basename(user_info['avatar'])))
-        print(temp_path, new_path, user_info['avatar'])
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
         os.rename(temp_path, new_path)
 
         user_info['avatar'] = 'user/avatar/{}'.format(os.path.basename(user_info['avatar']))
@@ -108,13 +116,15 @@ class ConfirmRegisterView(generics.GenericAPIView):
                                               first_name=user_info['first_name'],
                                               last_name=user_info['last_name'], avatar=user_info['avatar'],
                                               phone_number=user_info['phone_number'])
+        run_after_commit(build_avatar_variants, user.pk)
+        # The request carried no token to pin by; the new user's next reads
+        # must not go to a replica that hasn't seen them yet.
+        routers.pin_primary(user.pk)
         refresh = RefreshToken.for_user(user)
         token = {
             'refresh': str(refresh),
             'access': str(refresh.access_token),
         }
-        conn.delete(email)
-        conn.delete(email + '_confirmation_code')
 
         return Response({"message": "Your account has been successfully created.", "token": token}, status=status.HTTP_201_CREATED)
 
@@ -136,10 +146,10 @@ class RequestLoginView(generics.GenericAPIView):
         except CustomUser.DoesNotExist:
             return Response({"error": "User does not exist."}, status=status.HTTP_400_BAD_REQUEST)
 
-        conn = get_redis_connection("default")
-        login_code = str(randint(100000, 999999))
-        conn.set(email + '_login_code', login_code, ex=120)
-        send_mail('Login code', 'Your login code is {}'.format(login_code), settings.EMAIL_HOST_USER, [email], fail_silently=False)
+        login_code = otp.issue('login', email)
+        if login_code is None:
+            return Response({"error": "Too many attempts. Please try again later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        queue_mail('Login code', 'Your login code is {}'.format(login_code), [email], expires_in=settings.OTP_CODE_TTL)
 
         return Response({"message": "Login code has been sent to your email."}, status=status.HTTP_200_OK)
 
@@ -154,13 +164,15 @@ class ConfirmLoginView(generics.GenericAPIView):
         email = serializer.validated_data['email']
         code = serializer.validated_data['code']
 
-        conn = get_redis_connection("default")
-        stored_code = conn.get(email + '_login_code')
+        result, _ = otp.verify('login', email, code)
 
-        if not stored_code:
+        if result == otp.LOCKED:
+            return Response({"error": "Too many attempts. Please try again later."}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+        if result in (otp.MISSING, otp.EXPIRED):
             return Response({"error": "Login code expired. Please try logging in again."}, status=status.HTTP_400_BAD_REQUEST)
 
-        if str(int(stored_code)) != code:
+        if result != otp.VALID:
             return Response({"error": "Login code does not match. Please try again."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
@@ -174,9 +186,6 @@ class ConfirmLoginView(generics.GenericAPIView):
             'access': str(refresh.access_token),
         }
 
-        # Deleting the code after successful login
-        conn.delete(email + '_login_code')
-
         return Response({"message": "Logged in successfully.", "token": token}, status=status.HTTP_200_OK)
 
 
@@ -185,7 +194,13 @@ class RoleSelectionView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # request.user may come from the auth cache; save the current row.
+        return CustomUser.objects.get(pk=self.request.user.pk)
+
+    def perform_update(self, serializer):
+        previous = (serializer.instance.role, serializer.instance.city)
+        user = serializer.save()
+        leaderboard.sync_user(user, *previous)
 
 
 class CustomUserListView(generics.ListCreateAPIView):
@@ -193,22 +208,54 @@ class CustomUserListView(generics.ListCreateAPIView):
     serializer_class = CustomUserSerializer
     permission_classes = [permissions.IsAuthenticated, IsOppositeRole]
 
+    def get_listed_role(self):
+        return 'Executor' if self.request.user.role == 'Customer' else 'Customer'
+
     def get_queryset(self):
-        user = self.request.user
-        if user.role == 'Customer':
-            return CustomUser.objects.filter(role='Executor')
-        return CustomUser.objects.filter(role='Customer')
+        return CustomUser.objects.filter(role=self.get_listed_role())
+
+    def list(self, request, *args, **kwargs):
+        metric = request.query_params.get('ordering')
+        if metric not in leaderboard.METRICS:
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 100)
+        except ValueError:
+            limit = 50
+        ids = leaderboard.top(self.get_listed_role(), metric, request.query_params.get('city'), limit)
+        users = self.get_queryset().in_bulk(ids)
+        serializer = self.get_serializer([users[pk] for pk in ids if pk in users], many=True)
+        return Response(serializer.data)
 
 class CustomUserDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = [permissions.IsAuthenticated, IsOppositeRole]
 
+    def perform_update(self, serializer):
+        previous = (serializer.instance.role, serializer.instance.city)
+        user = serializer.save()
+        leaderboard.sync_user(user, *previous)
+        if 'avatar' in self.request.FILES:
+            run_after_commit(build_avatar_variants, user.pk)
+
 
-class OrderListView(generics.ListCreateAPIView):
+class OrderListView(ConditionalListMixin, generics.ListCreateAPIView):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    version_resources = ('orders',)
+    cache_responses = True
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filterset_class = OrderFilter
+    search_fields = ['service']
+    keyset_orderings = {
+        'deadline': ('deadline', 'id'),
+        '-deadline': ('-deadline', '-id'),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+    }
 
 
 class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -218,9 +265,49 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 class ProposalListView(generics.ListCreateAPIView):
-    queryset = Proposal.objects.all()
+    """The user's own proposals and the ones made on their orders, not everyone's."""
+    serializer_class = ProposalSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        return Proposal.objects.filter(Q(maid=user) | Q(order__customer=user))
+
+
+class ProposalBulkCreateView(generics.GenericAPIView):
+    serializer_class = ProposalBulkSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Proposal.objects.none()
+
+    def post(self, request, *args, **kwargs):
+        if request.user.role != 'Executor':
+            return Response({"error": "Only executors can propose on orders."}, status=status.HTTP_403_FORBIDDEN)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        requested = serializer.validated_data['orders']
+        order_ids = proposals.submit(request.user.pk, requested)
+        submitted = Proposal.objects.filter(maid=request.user, order_id__in=order_ids).order_by('order_id')
+        return Response({
+            'proposals': ProposalSerializer(submitted, many=True).data,
+            'missing_orders': sorted(set(requested) - set(order_ids)),
+        }, status=status.HTTP_201_CREATED)
+
+
+class OrderProposalListView(generics.ListAPIView):
+    """All proposals on an order for its customer; an executor sees only their own."""
     serializer_class = ProposalSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderProposalPagination
+
+    def get_queryset(self):
+        order = get_object_or_404(Order.objects.only('customer_id'), pk=self.kwargs['pk'])
+        queryset = Proposal.objects.filter(order_id=order.pk)
+        if order.customer_id != self.request.user.pk:
+            queryset = queryset.filter(maid=self.request.user)
+        return queryset
 
 
 class ProposalDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -229,9 +316,12 @@ class ProposalDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
 
-class ReviewListView(generics.ListCreateAPIView):
+class ReviewListView(ConditionalListMixin, generics.ListCreateAPIView):
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    version_resources = ('reviews',)
+    cache_responses = True
 
     def get_queryset(self):
         queryset = Review.objects.all()
@@ -255,20 +345,34 @@ class UserProfileView(APIView):
         return Response(serializer.data)
 
     def put(self, request):
-        serializer = CustomUserSerializer(request.user, data=request.data)
+        # request.user may come from the auth cache; save the current row.
+        user = CustomUser.objects.get(pk=request.user.pk)
+        serializer = CustomUserSerializer(user, data=request.data)
         if serializer.is_valid():
+            previous = (user.role, user.city)
             serializer.save()
+            leaderboard.sync_user(user, *previous)
+            if 'avatar' in request.FILES:
+                run_after_commit(build_avatar_variants, user.pk)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ChatListView(generics.ListCreateAPIView):
+class ChatListView(ConditionalListMixin, generics.ListCreateAPIView):
     serializer_class = ChatSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    user_version_resources = ('chats',)
 
     def get_queryset(self):
         user = self.request.user
         return Chat.objects.filter(Q(customer=user) | Q(executor=user))
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method == 'GET':
+            context['unread_counts'] = unread.get_counts(self.request.user.pk)
+        return context
+
 
 class ChatDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ChatSerializer
@@ -279,13 +383,99 @@ class ChatDetailView(generics.RetrieveUpdateDestroyAPIView):
         return Chat.objects.filter(Q(customer=user) | Q(executor=user))
 
 
-class MessageListView(generics.ListCreateAPIView):
-    serializer_class = MessageSerializer
+class InboxView(generics.ListAPIView):
+    """
+    The user's chats, most recently active first, each with the other
+    member, the order, the last message and the unread count: one SQL query
+    and one Redis read per page.
+    """
+    serializer_class = InboxSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = InboxPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Message.objects.filter(chat__customer=user) | Message.objects.filter(chat__executor=user)
+        return (Chat.objects.filter(Q(customer=user) | Q(executor=user))
+                .select_related('customer', 'executor', 'order', 'last_message'))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['unread_counts'] = unread.get_counts(self.request.user.pk)
+        return context
+
+
+class ChatReadView(generics.GenericAPIView):
+    serializer_class = ChatReadSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return ChatMember.objects.filter(user=self.request.user).select_related('chat')
+
+    def post(self, request, pk, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        message_id = serializer.validated_data['message_id']
+        member = get_object_or_404(self.get_queryset(), chat_id=pk)
+
+        if not Message.objects.filter(chat_id=pk, id=message_id).exists():
+            return Response({"error": "Message does not belong to this chat."}, status=status.HTTP_400_BAD_REQUEST)
+
+        incoming = Message.objects.filter(chat_id=pk).exclude(sender=request.user)
+        with transaction.atomic():
+            advanced = ChatMember.objects.filter(pk=member.pk, read_up_to__lt=message_id).update(read_up_to=message_id)
+            if advanced:
+                incoming.filter(id__lte=message_id, is_read=False).update(is_read=True)
+        unread_count = incoming.filter(is_read=False).count()
+        unread.set_count(request.user.pk, pk, unread_count)
+        if advanced:
+            versions.bump_chat(member.chat, 'chats', 'messages')
+
+        return Response({"read_up_to": max(member.read_up_to, message_id), "unread_count": unread_count},
+                        status=status.HTTP_200_OK)
+
+
+class MessageListView(ConditionalListMixin, generics.ListCreateAPIView):
+    """
+    Messages of the user's chats, or of one with ``?chat=<id>``. The older
+    messages of an archived chat are read back from the archive and merged
+    into the pages.
+    """
+    serializer_class = MessageSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MessagePagination
+    user_version_resources = ('messages',)
+
+    def get_queryset(self):
+        chats = ChatMember.objects.filter(user=self.request.user).values('chat_id')
+        queryset = Message.objects.filter(chat__in=chats).prefetch_related('images__blob')
+        chat_id = self.get_chat_id()
+        if chat_id is not None:
+            queryset = queryset.filter(chat_id=chat_id)
+        return queryset
+
+    def get_chat_id(self):
+        try:
+            return int(self.request.query_params['chat'])
+        except (KeyError, ValueError):
+            return None
+
+    def is_archived_chat(self):
+        chat_id = self.get_chat_id()
+        return chat_id is not None and ArchivedChat.objects.filter(
+            chat_id=chat_id, chat__members__user=self.request.user).exists()
+
+    def get_archived_rows(self, cursor, descending):
+        # Messages get ids in timestamp order, so the cursor's id says which
+        # archive parts can hold the rows past it.
+        return archive.archived_messages(self.get_chat_id(), newest_first=descending[0],
+                                         past_id=cursor[-1] if cursor is not None else None)
+
+    def paginate_queryset(self, queryset):
+        if self.request.method == 'GET' and self.is_archived_chat():
+            rows = self.paginator.paginate_with_rows(queryset, self.get_archived_rows, self.request, view=self)
+            archive.attach_images(rows)
+            return rows
+        return super().paginate_queryset(queryset)
 
 
 class MessageDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -293,5 +483,69 @@ class MessageDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        return Message.objects.filter(chat__customer=user) | Message.objects.filter(chat__executor=user)
+        chats = ChatMember.objects.filter(user=self.request.user).values('chat_id')
+        return Message.objects.filter(chat__in=chats).prefetch_related('images__blob')
+
+    def perform_update(self, serializer):
+        was_read = serializer.instance.is_read
+        message = serializer.save()
+        if message.is_read and not was_read:
+            unread.message_read(message.chat_id, message.sender_id)
+        elif was_read and not message.is_read:
+            unread.message_unread(message.chat_id, message.sender_id)
+
+    def perform_destroy(self, instance):
+        if not instance.is_read:
+            unread.message_read(instance.chat_id, instance.sender_id)
+        last_message_id = Chat.objects.filter(pk=instance.chat_id).values_list('last_message_id', flat=True).first()
+        was_last = last_message_id == instance.pk
+        instance.delete()
+        if was_last:
+            inbox.refresh_last_message(instance.chat_id)
+        transaction.on_commit(partial(versions.bump_chat_id, instance.chat_id, 'chats', 'messages'))
+
+
+class MessageSearchView(generics.GenericAPIView):
+    """``?q=`` full-text search over the messages of the user's chats, best match first."""
+    serializer_class = MessageSearchResultSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = SearchPagination
+    max_query_length = 200
+
+    def get_queryset(self):
+        return Message.objects.none()
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()[:self.max_query_length]
+        if len(query) < 2:
+            return Response({"error": "Search query must be at least 2 characters long."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        offset, limit = self.paginator.get_window(request)
+        results = self.paginator.paginate_rows(search.search_messages(request.user.pk, query, limit, offset))
+        return self.get_paginated_response(self.get_serializer(results, many=True).data)
+
+
+class ExportView(APIView):
+    """Streams every ``orders``/``reviews``/``messages`` row as NDJSON or CSV, optionally within ``?since=&until=``."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, name, fmt):
+        export = exports.EXPORTS.get(name)
+        if export is None or fmt not in exports.FORMATS:
+            return Response({"error": "Unknown export."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            since, until = (exports.parse_bound(request.query_params[key]) if request.query_params.get(key) else None
+                            for key in ('since', 'until'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # Under ASGI an async iterator lets each chunk go out as it's
+        # encoded; a sync one would be collected into one body first. WSGI
+        # servers need the sync one to stream at all.
+        queryset = export.get_queryset(since, until)
+        if isinstance(request._request, ASGIRequest):
+            chunks = exports.astream(queryset, export, fmt)
+        else:
+            chunks = exports.stream_queryset(queryset, export, fmt)
+        response = StreamingHttpResponse(chunks, content_type=exports.FORMATS[fmt])
+        response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(name, fmt)
+        return response